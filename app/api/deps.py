@@ -1,49 +1,67 @@
+import time
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core import security
-from app.db import database, models
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db import database, models, schemas
 
-# Ensure this matches the Token URL in your main.py
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
+# Ensure this matches the Token URL in auth.py
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+# --- AUTH CACHE ---
+# token -> user id (skips the JWT decode) and user id -> user snapshot (skips the query).
+# Entries never outlive the token's own expiry, and user rows drop out on any change.
+token_cache = TTLCache(maxsize=10_000, ttl=settings.AUTH_CACHE_TTL_SECONDS)
+user_cache = TTLCache(maxsize=10_000, ttl=settings.AUTH_CACHE_TTL_SECONDS)
+
+def invalidate_user(user_id: int) -> None:
+    user_cache.delete(user_id)
 
-    print(f"\n🔐 DEBUG: Checking Token: {token[:15]}...") # Print first 15 chars
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _user_changed(mapper, connection, target):
+    invalidate_user(target.id)
+
+def _decode_user_id(token: str, credentials_exception: HTTPException) -> int:
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
 
     try:
         # Decode the token
         payload = jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM])
-        user_id: str = payload.get("sub")
+        user_id = int(payload.get("sub"))
+    except (JWTError, TypeError, ValueError):
+        # Bad signature, expired, or no numeric 'sub' field
+        raise credentials_exception
 
-        print(f"🔐 DEBUG: Token Decoded. User ID inside is: '{user_id}' (Type: {type(user_id)})")
+    ttl = min(settings.AUTH_CACHE_TTL_SECONDS, payload.get("exp", 0) - time.time())
+    if ttl > 0:
+        token_cache.set(token, user_id, ttl=ttl)
+    return user_id
 
-        if user_id is None:
-            print("❌ DEBUG: Token has no 'sub' field.")
-            raise credentials_exception
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(database.get_async_db)) -> schemas.User:
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
 
-    except JWTError as e:
-        print(f"❌ DEBUG: Token Signature Failed! Error: {e}")
-        # This confirms if the Key is mismatched
-        raise credentials_exception
+    user_id = _decode_user_id(token, credentials_exception)
 
-    # Validate DB User
-    try:
-        # We try to convert to int, just in case
-        user = db.query(models.User).filter(models.User.id == int(user_id)).first()
-    except ValueError:
-        print(f"❌ DEBUG: User ID '{user_id}' is not a number.")
-        raise credentials_exception
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
 
-    if user is None:
-        print(f"❌ DEBUG: User ID {user_id} not found in DB.")
+    # Validate DB User (the session only opens a connection on this cache miss)
+    db_user = (await db.execute(select(models.User).filter(models.User.id == user_id))).scalar_one_or_none()
+    if db_user is None:
         raise credentials_exception
 
-    print(f"✅ DEBUG: User Authorized: {user.email}")
-    return user
\ No newline at end of file
+    user = schemas.User.model_validate(db_user)
+    user_cache.set(user_id, user)
+    return user
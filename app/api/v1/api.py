@@ -1,8 +1,9 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import properties, auth
+from app.api.v1.endpoints import properties, auth, searches
 
 api_router = APIRouter()
 
 # Connect the endpoints
 api_router.include_router(properties.router, prefix="/properties", tags=["properties"])
-api_router.include_router(auth.router, prefix="/auth", tags=["auth"]) # critical code
\ No newline at end of file
+api_router.include_router(auth.router, prefix="/auth", tags=["auth"]) # critical code
+api_router.include_router(searches.router, prefix="/searches", tags=["saved searches"])
\ No newline at end of file
@@ -1,71 +1,488 @@
+from datetime import datetime
 from typing import List, Optional
-import random
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Query
-from sqlalchemy.orm import Session
-from app.db import database, models, schemas
+import json
+import tempfile
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, File, Header, UploadFile, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import and_, event, inspect, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from app.core import ai_search, alerts, images, outbox, response_cache, responses, risk, similarity, valuation
+from app.db import bulk_import, changes, database, export, facets, fulltext, geo, models, schemas
+from app.db.query_counter import query_budget
 
 router = APIRouter()
 
-# --- 1. UPLOAD IMAGE (Returns a working absolute URL) ---
+# --- DERIVED DATA INVALIDATION ---
+# Detail responses are tagged "property:<id>"; list responses "properties:all",
+# or "properties:owner:<id>" (+ "properties:owned") when filtered by owner.
+# A committed write drops the listing's detail and only the lists it can appear
+# in, and tells the valuation snapshot and the similarity index which rows to reload.
+_UNKNOWN_OWNER = object()
+
+def _list_tags(owner_id: Optional[int]) -> List[str]:
+    return [f"properties:owner:{owner_id}", "properties:owned"] if owner_id else ["properties:all"]
+
+def invalidate_properties(property_ids=(), owner_ids=(), refresh_snapshots: bool = True) -> None:
+    tags = {"properties:all"}
+    tags.update(f"property:{pid}" for pid in property_ids)
+    for owner_id in owner_ids:
+        if owner_id is _UNKNOWN_OWNER:
+            tags.add("properties:owned")
+        elif owner_id:
+            tags.add(f"properties:owner:{owner_id}")
+    response_cache.cache.invalidate(*tags)
+    if refresh_snapshots:
+        valuation.engine.mark_changed(property_ids)
+        similarity.index.mark_changed(property_ids)
+
+def _risk_rescored(property_ids) -> None:
+    # The risk job writes with Core UPDATEs (no ORM events); only scores changed
+    invalidate_properties(property_ids, [_UNKNOWN_OWNER], refresh_snapshots=False)
+
+@event.listens_for(Session, "after_flush")
+def _collect_property_writes(session, flush_context):
+    # Ids are known after the flush; invalidation waits for the commit so no
+    # reader can re-cache the old rows in between
+    touched = session.info.setdefault("touched_properties", (set(), set()))
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.Property):
+            touched[0].add(obj.id)
+            history = inspect(obj).attrs.owner_id.history
+            touched[1].update(history.added or [obj.owner_id])
+            touched[1].update(history.deleted or ())
+        elif isinstance(obj, models.PropertyImage):
+            # Don't lazy-load the parent just to learn its owner (not allowed under AsyncSession)
+            parent = inspect(obj).attrs.property.loaded_value
+            touched[0].add(obj.property_id)
+            touched[1].add(parent.owner_id if isinstance(parent, models.Property) else _UNKNOWN_OWNER)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_property_writes(session):
+    touched = session.info.pop("touched_properties", None)
+    if touched:
+        invalidate_properties(*touched)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_property_writes(session):
+    session.info.pop("touched_properties", None)
+
+_property_list = TypeAdapter(List[schemas.Property])
+_property_detail = TypeAdapter(schemas.Property)
+
+# --- 1. UPLOAD IMAGE (Streams to disk, returns a URL served from /uploads) ---
 @router.post("/upload")
 async def upload_image(file: UploadFile = File(...)):
-    # Returns a random high-quality house image for the demo
-    # ensuring the URL is absolute (starts with http) to avoid broken images
-    random_id = random.randint(1, 1000)
-    return {"url": f"https://images.unsplash.com/photo-1600596542815-2a4d9fdb88b8?auto=format&fit=crop&w=800&q=80&sig={random_id}"}
-
-# --- 2. GET PROPERTIES (With "My Listings" Filter) ---
-@router.get("/", response_model=List[schemas.Property])
-def read_properties(
+    # url is the 1600px web variant; thumbnail_url / original_url are returned too.
+    # Identical photos are stored once (files are named by their SHA-256).
+    return await images.save_upload(file)
+
+# --- 2. GET PROPERTIES (With "My Listings" Filter + Search) ---
+SORT_OPTIONS = ("id", "price_asc", "price_desc")  # keyset-paginated; "distance" (with lat/lng) uses skip
+
+def _filter_properties(
+        stmt,
+        owner_id: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        city: Optional[str] = None,
+        suburb: Optional[str] = None,
+        bedrooms: Optional[int] = None,
+        bathrooms: Optional[float] = None,
+        property_type: Optional[str] = None,
+        listing_status: Optional[str] = None,
+):
+    """
+    Applies the structured search filters to a select(). Equality filters line up
+    with the composite indexes on models.Property, bedrooms/bathrooms are minimums.
+    """
+    query = stmt
+    if owner_id:
+        query = query.filter(models.Property.owner_id == owner_id)
+    if city:
+        query = query.filter(models.Property.city == city)
+    if suburb:
+        query = query.filter(models.Property.suburb == suburb)
+    if property_type:
+        query = query.filter(models.Property.property_type == property_type)
+    if listing_status:
+        query = query.filter(models.Property.listing_status == listing_status)
+    if min_price is not None:
+        query = query.filter(models.Property.price >= min_price)
+    if max_price is not None:
+        query = query.filter(models.Property.price <= max_price)
+    if bedrooms is not None:
+        query = query.filter(models.Property.bedrooms >= bedrooms)
+    if bathrooms is not None:
+        query = query.filter(models.Property.bathrooms >= bathrooms)
+    return query
+
+def _select_properties():
+    # Images are loaded for the whole page in one extra SELECT ... IN query,
+    # instead of one lazy load per row while the response is serialized
+    return select(models.Property).options(selectinload(models.Property.images))
+
+def _paginate_properties(query, sort: str, after_id: Optional[int], after_price: Optional[float], skip: int, limit: int):
+    """
+    Keyset pagination: the client sends the id (and price, when sorting by price)
+    of the last row it saw, so page N costs the same index seek as page 1.
+    Falls back to OFFSET paging when no cursor is given.
+    """
+    if sort not in SORT_OPTIONS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORT_OPTIONS)}")
+
+    price, pk = models.Property.price, models.Property.id
+
+    if sort == "id":
+        if after_id is not None:
+            query = query.filter(pk > after_id)
+        query = query.order_by(pk)
+    else:
+        if after_id is not None:
+            if after_price is None:
+                raise HTTPException(status_code=400, detail="after_price is required with after_id when sorting by price")
+            if sort == "price_asc":
+                query = query.filter(or_(price > after_price, and_(price == after_price, pk > after_id)))
+            else:
+                query = query.filter(or_(price < after_price, and_(price == after_price, pk > after_id)))
+        query = query.order_by(price.asc() if sort == "price_asc" else price.desc(), pk)
+
+    if after_id is None and skip:
+        query = query.offset(skip)
+    return query.limit(limit)
+
+# Field projection for compact views (e.g. the search grid): fields=id,title,price,suburb,thumbnail
+# selects only those columns, and "thumbnail" (first photo, 400px variant) replaces the image list.
+PROJECTABLE_FIELDS = ("id",) + tuple(name for name in schemas.Property.model_fields if name != "id") + ("thumbnail",)
+
+def _parse_fields(fields: Optional[str]) -> Optional[tuple]:
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(PROJECTABLE_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in PROJECTABLE_FIELDS if name in requested)  # canonical order, one cache key
+
+def _select_fields(projection: tuple):
+    # id and price are always selected for the keyset cursor headers, and only output when requested
+    columns = {"id": models.Property.id, "price": models.Property.price}
+    for name in projection:
+        if name == "thumbnail":
+            columns[name] = (
+                select(models.PropertyImage.image_url)
+                .where(models.PropertyImage.property_id == models.Property.id)
+                .order_by(models.PropertyImage.id)
+                .limit(1)
+                .scalar_subquery()
+            )
+        elif name == "distance_km":
+            columns["latitude"], columns["longitude"] = models.Property.latitude, models.Property.longitude
+        elif name not in ("images", "snippet", "similarity"):
+            columns[name] = getattr(models.Property, name)
+    return select(*(column.label(name) for name, column in columns.items()))
+
+def _distance_km(origin: Optional[tuple], lat: Optional[float], lng: Optional[float]) -> Optional[float]:
+    if origin is None or lat is None or lng is None:
+        return None
+    return round(geo.haversine_km(origin[0], origin[1], lat, lng), 3)
+
+async def _project_rows(db: AsyncSession, rows, projection: tuple, origin: Optional[tuple] = None) -> List[dict]:
+    images_by_property = {}
+    if "images" in projection and rows:
+        stmt = (
+            select(models.PropertyImage.id, models.PropertyImage.image_url, models.PropertyImage.property_id)
+            .where(models.PropertyImage.property_id.in_([row["id"] for row in rows]))
+            .order_by(models.PropertyImage.id)
+        )
+        for image in (await db.execute(stmt)).mappings():
+            images_by_property.setdefault(image["property_id"], []).append({"id": image["id"], "image_url": image["image_url"]})
+
+    projected = []
+    for row in rows:
+        item = {}
+        for name in projection:
+            if name == "images":
+                item[name] = images_by_property.get(row["id"], [])
+            elif name == "thumbnail":
+                item[name] = images.thumbnail_url(row[name]) if row[name] else None
+            elif name == "distance_km":
+                item[name] = _distance_km(origin, row["latitude"], row["longitude"])
+            else:
+                item[name] = row.get(name)  # snippet only exists for q= searches
+        projected.append(item)
+    return projected
+
+@router.get("/", response_model=List[schemas.Property], dependencies=[Depends(query_budget(2))])
+async def read_properties(
+        request: Request,
         skip: int = 0,
-        limit: int = 100,
+        limit: int = Query(100, ge=1, le=500),
         owner_id: Optional[int] = None, # <--- NEW FILTER PARAMETER
-        db: Session = Depends(database.get_db)
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        city: Optional[str] = None,
+        suburb: Optional[str] = None,
+        bedrooms: Optional[int] = Query(None, description="Minimum bedrooms"),
+        bathrooms: Optional[float] = Query(None, description="Minimum bathrooms"),
+        property_type: Optional[str] = None,
+        listing_status: Optional[str] = None,
+        q: Optional[str] = Query(None, description="Keyword search over title and description"),
+        sort: Optional[str] = Query(None, description="id | price_asc | price_desc | distance (default: relevance with q, distance with lat/lng, else id)"),
+        after_id: Optional[int] = Query(None, description="Keyset cursor: id of the last row of the previous page"),
+        after_price: Optional[float] = Query(None, description="Keyset cursor: price of the last row (price sorts only)"),
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,title,price,suburb,thumbnail"),
+        bbox: Optional[str] = Query(None, description="Map viewport: min_lng,min_lat,max_lng,max_lat"),
+        lat: Optional[float] = Query(None, ge=-90, le=90, description="Search origin latitude"),
+        lng: Optional[float] = Query(None, ge=-180, le=180, description="Search origin longitude"),
+        radius_km: Optional[float] = Query(None, gt=0, le=500, description="Only listings within this distance of lat/lng"),
+        db: AsyncSession = Depends(database.get_async_read_db)
 ):
-    query = db.query(models.Property)
+    projection = _parse_fields(fields)
+    if (lat is None) != (lng is None):
+        raise HTTPException(status_code=400, detail="lat and lng must be given together")
+    origin = (lat, lng) if lat is not None else None
+    if origin is None and (radius_km is not None or sort == "distance"):
+        raise HTTPException(status_code=400, detail="radius_km and sort=distance need lat and lng")
+    try:
+        box = geo.parse_bbox(bbox) if bbox else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    # If owner_id is passed (e.g., from Dashboard), only show their properties
-    if owner_id:
-        query = query.filter(models.Property.owner_id == owner_id)
+    key = response_cache.make_key(
+        "properties:list", skip=skip, limit=limit, owner_id=owner_id, min_price=min_price, max_price=max_price,
+        city=city, suburb=suburb, bedrooms=bedrooms, bathrooms=bathrooms, property_type=property_type,
+        listing_status=listing_status, q=q, sort=sort, after_id=after_id, after_price=after_price, fields=projection,
+        bbox=box, origin=origin, radius_km=radius_km,
+    )
+    entry = response_cache.cache.get(key)
+    if entry is not None:
+        return response_cache.respond(request, entry)
+    generation = response_cache.cache.generation
 
-    properties = query.offset(skip).limit(limit).all()
-    return properties
+    query = _filter_properties(
+        _select_properties() if projection is None else _select_fields(projection),
+        owner_id=owner_id,
+        min_price=min_price,
+        max_price=max_price,
+        city=city,
+        suburb=suburb,
+        bedrooms=bedrooms,
+        bathrooms=bathrooms,
+        property_type=property_type,
+        listing_status=listing_status,
+    )
+    if box is not None:
+        query = geo.within_bbox(query, box, db.bind)
+    if radius_km is not None:
+        query = geo.within_radius(query, lat, lng, radius_km, db.bind)
+
+    if not q:
+        sort = sort or ("distance" if origin else "id")
+    if sort == "distance":
+        # Nearest first (OFFSET paging); the R*Tree / bbox filters above keep the candidate set small
+        if q:
+            query = fulltext.apply_text_search(query, q, db.bind, order_by_rank=False)
+        query = query.order_by(geo.squared_distance(lat, lng), models.Property.id).offset(skip).limit(limit)
+    elif not q:
+        query = _paginate_properties(query, sort, after_id, after_price, skip, limit)
+    else:
+        # Full-text match: BM25 relevance order (OFFSET paging), or any explicit sort (keyset paging)
+        query = fulltext.apply_text_search(query, q, db.bind, order_by_rank=sort is None)
+        if sort is None:
+            query = query.order_by(models.Property.id).offset(skip).limit(limit)
+        else:
+            query = _paginate_properties(query, sort, after_id, after_price, skip, limit)
+    result = await db.execute(query)
+
+    if projection is not None:
+        page = result.mappings().all()
+        last = (page[-1]["id"], page[-1]["price"]) if page else None
+        body = responses.dumps(await _project_rows(db, page, projection, origin))
+    else:
+        if not q:
+            page = result.scalars().all()
+        else:
+            page = []
+            for prop, snippet in result.all():
+                prop.snippet = snippet
+                page.append(prop)
+        for prop in page:
+            prop.distance_km = _distance_km(origin, prop.latitude, prop.longitude)
+        last = (page[-1].id, page[-1].price) if page else None
+        body = _property_list.dump_json(_property_list.validate_python(page, from_attributes=True))
+
+    # Hand the next cursor back in headers so the response body stays a plain list
+    headers = {}
+    if len(page) == limit:
+        if sort in (None, "distance"):
+            headers["X-Next-Skip"] = str(skip + limit)
+        else:
+            headers["X-Next-After-Id"] = str(last[0])
+            if sort != "id":
+                headers["X-Next-After-Price"] = str(last[1])
+
+    entry = response_cache.cache.put(key, body, _list_tags(owner_id), generation, headers=headers)
+    return response_cache.respond(request, entry)
+
+# --- 2b. FACET COUNTS (declared before /{property_id} so "facets" isn't taken for an id) ---
+@router.get("/facets", dependencies=[Depends(query_budget(1))])
+async def read_facets(
+        request: Request,
+        city: Optional[str] = None,
+        suburb: Optional[str] = None,
+        property_type: Optional[str] = None,
+        listing_status: Optional[str] = None,
+        bedrooms: Optional[int] = Query(None, description="Minimum bedrooms"),
+        price_bucket: Optional[int] = Query(None, description="Lower edge of a price bucket, as returned in facets.price"),
+        owner_id: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        bathrooms: Optional[float] = Query(None, description="Minimum bathrooms"),
+        db: AsyncSession = Depends(database.get_async_read_db)
+):
+    """
+    Listing counts per city, suburb, type, status, bedrooms and price bucket.
+    Each facet is counted with all filters except its own.
+    """
+    if price_bucket is not None and price_bucket not in facets.PRICE_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"price_bucket must be one of {', '.join(map(str, facets.PRICE_BUCKETS))}")
+
+    key = response_cache.make_key(
+        "properties:facets", city=city, suburb=suburb, property_type=property_type, listing_status=listing_status,
+        bedrooms=bedrooms, price_bucket=price_bucket, owner_id=owner_id, min_price=min_price, max_price=max_price,
+        bathrooms=bathrooms,
+    )
+    entry = response_cache.cache.get(key)
+    if entry is not None:
+        return response_cache.respond(request, entry)
+    generation = response_cache.cache.generation
+
+    filters = {"city": city, "suburb": suburb, "property_type": property_type, "listing_status": listing_status,
+               "bedrooms": bedrooms, "price": price_bucket}
+    # Filters outside the summary's columns are answered from the listings themselves
+    def _refine(stmt):
+        return _filter_properties(stmt, owner_id=owner_id, min_price=min_price, max_price=max_price, bathrooms=bathrooms)
+    refine = _refine if any(value is not None for value in (owner_id, min_price, max_price, bathrooms)) else None
+    use_summary = refine is None and facets.is_supported(db.bind)
+
+    rows = (await db.execute(facets.facet_query(filters, use_summary, refine))).all()
+    body = responses.dumps(facets.format_counts(rows, use_summary))
+    entry = response_cache.cache.put(key, body, _list_tags(owner_id), generation)
+    return response_cache.respond(request, entry)
+
+# --- 2c. EXPORT (streamed in batches, constant memory; declared before /{property_id}) ---
+@router.get("/export")
+async def export_properties(
+        format: str = Query("ndjson", description="csv | ndjson"),
+        owner_id: Optional[int] = None,
+        modified_since: Optional[datetime] = Query(None, description="Only listings changed at or after this time (UTC)"),
+        modified_before: Optional[datetime] = Query(None, description="Only listings changed before this time (UTC)"),
+        batch_size: int = Query(export.BATCH_SIZE, ge=100, le=20000),
+):
+    if format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    # A sync generator: Starlette pulls each batch in the threadpool, and stops the cursor if the client goes away
+    chunks = export.stream_listings(format, owner_id, modified_since, modified_before, batch_size)
+    filename = f"listings-{models.utcnow():%Y%m%d-%H%M%S}.{format}"
+    return StreamingResponse(chunks, media_type=export.MEDIA_TYPES[format],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+# --- 2d. CHANGE FEED (client sync; declared before /{property_id}) ---
+@router.get("/changes", dependencies=[Depends(query_budget(3))])
+async def read_changes(
+        since: int = Query(0, ge=0, description="cursor from the previous response (0: everything)"),
+        limit: int = Query(200, ge=1, le=500),  # one selectin batch of images per page
+        owner_id: Optional[int] = None,
+        db: AsyncSession = Depends(database.get_async_read_db)
+):
+    """
+    Listings inserted, updated or deleted after `since`, oldest change first.
+    Store the returned cursor and pass it as `since` next time; has_more means
+    there is another page right away.
+    """
+    if not changes.is_supported(db.bind):
+        raise HTTPException(status_code=501, detail="The change feed needs SQLite or PostgreSQL (trigger-maintained)")
+
+    rows = (await db.execute(changes.changes_query(since, limit + 1, owner_id))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows and since:
+        latest = (await db.execute(changes.latest_seq_query())).scalar() or 0
+        if since > latest:
+            raise HTTPException(status_code=410, detail="cursor is ahead of the change feed (database reset?): sync again from since=0")
+
+    live = [row.property_id for row in rows if not row.deleted]
+    found = {}
+    if live:
+        stmt = _select_properties().filter(models.Property.id.in_(live))
+        found = {prop.id: prop for prop in (await db.execute(stmt)).scalars()}
+    inserted, updated, deleted = [], [], []
+    for row in rows:
+        prop = found.get(row.property_id)
+        if prop is None:
+            deleted.append(row.property_id)
+        else:
+            (inserted if row.created_seq > since else updated).append(prop)
+
+    dump = lambda props: _property_list.dump_python(_property_list.validate_python(props, from_attributes=True), mode="json")
+    return {
+        "cursor": rows[-1].seq if rows else since,
+        "has_more": has_more,
+        "inserted": dump(inserted),
+        "updated": dump(updated),
+        "deleted": deleted,
+    }
 
 # --- 3. CREATE PROPERTY (Assign to User 1) ---
 @router.post("/", response_model=schemas.Property)
-def create_property(property: schemas.PropertyCreate, db: Session = Depends(database.get_db)):
+async def create_property(property: schemas.PropertyCreate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(database.get_async_db)):
 
-    # Generate random Risk Score
-    ai_risk_score = random.randint(5, 35)
+    # Preliminary risk score from the listing's own data (rules only, no I/O);
+    # the background job completes it with the price vs. suburb median factor
+    fields = property.model_dump(exclude={"images"})
+    risk.apply([fields])
 
     # Create Property with owner_id = 1 (Simulating "You")
     db_property = models.Property(
-        **property.dict(exclude={"images"}),
-        risk_score=ai_risk_score,
+        **fields,
         owner_id=1  # <--- ASSIGN TO SELLER (YOU)
     )
 
-    db.add(db_property)
-    db.commit()
-    db.refresh(db_property)
-
-    # Handle Images
-    if property.images:
-        for img in property.images:
-            db_image = models.PropertyImage(property_id=db_property.id, image_url=img['image_url'])
-            db.add(db_image)
-        db.commit()
+    # Handle Images (same transaction, one commit)
+    db_property.images = [
+        models.PropertyImage(image_url=img['image_url']) for img in property.images or []
+    ]
 
+    db.add(db_property)
+    await db.commit()
+    background_tasks.add_task(risk.rescore_pending_in_background, _risk_rescored)
+    # Saved searches it matches (in-memory index), queued and e-mailed off the request path
+    background_tasks.add_task(alerts.enqueue_in_background, [{**fields, "id": db_property.id}])
     return db_property
 
 # --- 4. GET ONE PROPERTY ---
-@router.get("/{property_id}", response_model=schemas.Property)
-def read_property(property_id: int, db: Session = Depends(database.get_db)):
-    db_property = db.query(models.Property).filter(models.Property.id == property_id).first()
+async def _get_property(db: AsyncSession, property_id: int, with_images: bool = True) -> models.Property:
+    stmt = _select_properties() if with_images else select(models.Property)
+    db_property = (await db.execute(stmt.filter(models.Property.id == property_id))).scalar_one_or_none()
     if db_property is None:
         raise HTTPException(status_code=404, detail="Property not found")
     return db_property
 
+@router.get("/{property_id}", response_model=schemas.Property, dependencies=[Depends(query_budget(2))])
+async def read_property(property_id: int, request: Request, db: AsyncSession = Depends(database.get_async_read_db)):
+    key = response_cache.make_key("properties:detail", property_id=property_id)
+    entry = response_cache.cache.get(key)
+    if entry is None:
+        generation = response_cache.cache.generation
+        db_property = await _get_property(db, property_id)
+        body = _property_detail.dump_json(_property_detail.validate_python(db_property, from_attributes=True))
+        entry = response_cache.cache.put(key, body, [f"property:{property_id}"], generation)
+    return response_cache.respond(request, entry)
+
 # --- 5. CONTACT ENDPOINT ---
 class ContactRequest(schemas.BaseModel):
     name: str
@@ -73,23 +490,140 @@ class ContactRequest(schemas.BaseModel):
     phone: str
     message: str
 
-@router.post("/{property_id}/contact")
-def contact_seller(property_id: int, contact: ContactRequest, db: Session = Depends(database.get_db)):
-    return {"status": "success", "message": "Inquiry sent!"}
+@router.post("/{property_id}/contact", dependencies=[Depends(query_budget(2))])
+async def contact_seller(
+        property_id: int,
+        contact: ContactRequest,
+        client_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+        db: AsyncSession = Depends(database.get_async_db)
+):
+    # One INSERT into the outbox; the e-mail is sent by the outbox worker, off the request path
+    fields = contact.model_dump()
+    key = outbox.idempotency_key(property_id, fields, client_key)
+    try:
+        inquiry_id = (await db.execute(outbox.enqueue_statement(property_id, key, fields))).scalar_one_or_none()
+        await db.commit()
+    except IntegrityError:  # same inquiry submitted again: report the one already queued
+        await db.rollback()
+        inquiry_id = (await db.execute(select(models.Inquiry.id).where(models.Inquiry.idempotency_key == key))).scalar_one()
+    if inquiry_id is None:
+        raise HTTPException(status_code=404, detail="Property not found")
+
+    outbox.worker.wake()
+    return {"status": "success", "message": "Inquiry sent!", "inquiry_id": inquiry_id}
 
 # --- 6. REPORT ENDPOINT ---
 @router.get("/{property_id}/report")
-def generate_report(property_id: int, db: Session = Depends(database.get_db)):
-    db_property = db.query(models.Property).filter(models.Property.id == property_id).first()
-    if db_property is None:
-        raise HTTPException(status_code=404, detail="Property not found")
+async def generate_report(property_id: int, db: AsyncSession = Depends(database.get_async_read_db)):
+    db_property = await _get_property(db, property_id, with_images=False)
+
+    # Comparables + suburb stats from the in-memory snapshot (NumPy, so off the event loop)
+    subject = {name: getattr(db_property, name) for name in valuation.SUBJECT_FIELDS}
+    appraisal = await run_in_threadpool(valuation.engine.appraise, subject)
 
     return {
         "property_id": db_property.id,
         "risk_score": db_property.risk_score,
-        "valuation": {"estimated_value": db_property.price * 0.95, "market_trend": "Rising"},
+        "valuation": appraisal,
         "legal_checks": [
             {"check": "Title Deed", "status": "PASSED", "details": "Verified."},
             {"check": "Encumbrances", "status": "PASSED", "details": "Clean."}
         ]
-    }
\ No newline at end of file
+    }
+
+# --- 6b. SIMILAR LISTINGS ("homes like this one") ---
+@router.get("/{property_id}/similar", response_model=List[schemas.Property])
+async def read_similar_properties(
+        property_id: int,
+        request: Request,
+        k: int = Query(8, ge=1, le=50),
+        db: AsyncSession = Depends(database.get_async_read_db)
+):
+    key = response_cache.make_key("properties:similar", property_id=property_id, k=k)
+    entry = response_cache.cache.get(key)
+    if entry is not None:
+        return response_cache.respond(request, entry)
+    generation = response_cache.cache.generation
+
+    # Nearest listings from the memory-mapped feature index (NumPy, so off the event loop)
+    try:
+        neighbours = await run_in_threadpool(similarity.index.similar, property_id, k)
+    except similarity.IndexNotReady as e:  # just started: the index is still loading in the background
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    if neighbours is None:
+        raise HTTPException(status_code=404, detail="Property not found")
+
+    page = []
+    if neighbours:
+        stmt = _select_properties().filter(models.Property.id.in_([pid for pid, _ in neighbours]))
+        found = {prop.id: prop for prop in (await db.execute(stmt)).scalars()}
+        for pid, score in neighbours:
+            prop = found.get(pid)
+            if prop is not None:  # deleted since the index last refreshed
+                prop.similarity = score
+                page.append(prop)
+    body = _property_list.dump_json(_property_list.validate_python(page, from_attributes=True))
+    # Any write can change who the nearest listings are
+    entry = response_cache.cache.put(key, body, [f"property:{property_id}", "properties:all"], generation)
+    return response_cache.respond(request, entry)
+
+# --- 7. AI SEARCH (Natural language -> indexed query) ---
+@router.post("/search", response_model=List[schemas.Property])
+async def search_properties(
+        response: Response,
+        query: str = "",
+        limit: int = Query(100, ge=1, le=500),
+        after_id: Optional[int] = None,
+        db: AsyncSession = Depends(database.get_async_read_db)
+):
+    # Parsing is async (cache / local rules / coalesced model call), so nothing waits on OpenAI in a thread
+    filters = await ai_search.interpret_search_query_async(query)
+    if query and all(value is None for value in filters.values()):
+        # Nothing in the query was understood: no match, rather than the whole inventory
+        response.headers["X-Search-Filters"] = "{}"
+        return []
+
+    stmt = _filter_properties(
+        _select_properties(),
+        min_price=filters.get("min_price"),
+        max_price=filters.get("max_price"),
+        city=filters.get("city"),
+        suburb=filters.get("suburb"),
+        bedrooms=filters.get("bedrooms"),
+        property_type=filters.get("property_type"),
+    )
+    properties = (await db.execute(_paginate_properties(stmt, "id", after_id, None, 0, limit))).scalars().all()
+
+    response.headers["X-Search-Filters"] = json.dumps(filters)
+    if len(properties) == limit:
+        response.headers["X-Next-After-Id"] = str(properties[-1].id)
+    return properties
+
+# --- 8. BULK IMPORT (CSV / NDJSON body) ---
+@router.post("/import")
+async def import_properties(
+        request: Request,
+        background_tasks: BackgroundTasks,
+        format: Optional[str] = Query(None, description="csv | ndjson (default: from Content-Type)"),
+        owner_id: int = 1,  # same "You" simulation as create_property
+        batch_size: int = Query(bulk_import.BATCH_SIZE, ge=1, le=50000),
+):
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    if fmt not in bulk_import.FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+
+    # Spool the body in chunks (memory up to 8 MB, then disk), then import in the threadpool
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        new_ids = []
+        report = await run_in_threadpool(bulk_import.import_file, spool, fmt, owner_id, batch_size, new_ids)
+
+    # Core inserts bypass the ORM events, so drop the affected lists here
+    invalidate_properties(owner_ids=[owner_id])
+    background_tasks.add_task(risk.rescore_pending_in_background, _risk_rescored)
+    # Saved searches they match, queued after the response as for create_property
+    if new_ids:
+        background_tasks.add_task(alerts.enqueue_ids_in_background, new_ids)
+    return report
\ No newline at end of file
@@ -0,0 +1,54 @@
+import secrets
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core import ai_search, alerts
+from app.db import database, models, schemas
+
+router = APIRouter()
+
+# Saved searches belong to an e-mail address, like inquiries (buyers need no
+# account); the token returned when saving one is what reads or deletes it.
+# New matching listings are e-mailed by app/core/alerts.py.
+
+async def _get_search(db: AsyncSession, search_id: int, token: str) -> models.SavedSearch:
+    search = (await db.execute(select(models.SavedSearch).where(models.SavedSearch.id == search_id))).scalar_one_or_none()
+    if search is None or not secrets.compare_digest(search.token, token):
+        raise HTTPException(status_code=404, detail="Saved search not found")
+    return search
+
+# --- 1. SAVE A SEARCH ---
+@router.post("/", response_model=schemas.SavedSearchCreated)
+async def create_saved_search(search: schemas.SavedSearchCreate, db: AsyncSession = Depends(database.get_async_db)):
+    fields = search.model_dump()
+    filters = {name: fields[name] for name in alerts.FILTER_FIELDS}
+    if search.query and all(value is None for value in filters.values()):
+        # Same parser as POST /properties/search, so alerts match what the buyer searched for
+        parsed = await ai_search.interpret_search_query_async(search.query)
+        filters = {name: parsed.get(name) for name in alerts.FILTER_FIELDS}
+    if all(value in (None, "") for value in filters.values()):
+        raise HTTPException(status_code=400, detail="A saved search needs at least one filter")
+
+    db_search = models.SavedSearch(
+        email=search.email, name=search.name, query=search.query, token=secrets.token_urlsafe(16), **filters
+    )
+    db.add(db_search)
+    await db.commit()
+    alerts.index.add(db_search)
+    return db_search
+
+# --- 2. READ ONE ---
+@router.get("/{search_id}", response_model=schemas.SavedSearch)
+async def read_saved_search(search_id: int, token: str, db: AsyncSession = Depends(database.get_async_db)):
+    return await _get_search(db, search_id, token)
+
+# --- 3. DELETE (unsubscribe) ---
+@router.delete("/{search_id}")
+async def delete_saved_search(search_id: int, token: str, db: AsyncSession = Depends(database.get_async_db)):
+    search = await _get_search(db, search_id, token)
+    # SQLite doesn't enforce the ON DELETE CASCADE, so its alerts go explicitly
+    await db.execute(delete(models.SearchAlert).where(models.SearchAlert.saved_search_id == search_id))
+    await db.delete(search)
+    await db.commit()
+    alerts.index.remove(search_id)
+    return {"status": "success", "message": "Saved search deleted"}
@@ -1,12 +1,54 @@
 # app/core/ai_search.py
-import openai
+import asyncio
+import logging
 import json
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Optional
+from pydantic import ValidationError
 from app.core.config import settings
+from app.core import metrics
+from app.core.cache import TTLCache
+from app.core.search_parser import normalize_query, parse_query
+from app.db.schemas import SearchFilters
 
-client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+if TYPE_CHECKING:
+    import openai
+
+# Upper bound for one model round trip, and for parallel model calls per worker
+AI_TIMEOUT_SECONDS = 8.0
+AI_MAX_CONCURRENCY = 8
+
+# Clients (and the openai package, the slowest import in the app) are loaded on
+# first use, so the local parser works without an API key and workers boot fast
+client: Optional["openai.OpenAI"] = None
+async_client: Optional["openai.AsyncOpenAI"] = None
+
+def _get_client() -> "openai.OpenAI":
+    global client
+    if client is None:
+        import openai
+        client = openai.OpenAI(api_key=settings.OPENAI_API_KEY, timeout=AI_TIMEOUT_SECONDS)
+    return client
+
+def _get_async_client() -> "openai.AsyncOpenAI":
+    global async_client
+    if async_client is None:
+        import openai
+        async_client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY, timeout=AI_TIMEOUT_SECONDS)
+    return async_client
+
+async def close_clients() -> None:
+    """Closes the HTTP pools of the clients built so far (app shutdown)."""
+    global client, async_client
+    if client is not None:
+        client.close()
+        client = None
+    if async_client is not None:
+        await async_client.close()
+        async_client = None
 
 SYSTEM_PROMPT = """
-You are a real estate search assistant for Zimbabwe. 
+You are a real estate search assistant for Zimbabwe.
 Convert the user's natural language query into a JSON object with these fields:
 - min_price (integer, USD)
 - max_price (integer, USD)
@@ -22,27 +64,195 @@ Rules:
 4. Return ONLY raw JSON. No markdown formatting.
 """
 
+# Below this share of understood words the local parser hands over to the LLM
+LOCAL_CONFIDENCE_THRESHOLD = 0.75
+
+logger = logging.getLogger(__name__)
+
+# Parsed filters keyed by the normalized query ("3 Bed house, Avondale" == "3 bed house avondale")
+query_cache = TTLCache(maxsize=2048, ttl=60 * 60)
+
+metrics.register_gauge(
+    "ai_search_cache_hit_ratio", "Share of search queries answered from the parsed-query cache",
+    lambda: query_cache.hits / ((query_cache.hits + query_cache.misses) or 1),
+)
+metrics.register_gauge("ai_search_cache_entries", "Parsed queries currently cached", lambda: len(query_cache))
+
+def _messages(query: str) -> list:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": query}
+    ]
+
+def _ask_openai(query: str) -> dict:
+    response = _get_client().chat.completions.create(
+        model="gpt-3.5-turbo", # Cost-effective for students
+        messages=_messages(query),
+        temperature=0, # Deterministic results
+    )
+
+    content = response.choices[0].message.content
+    return json.loads(content)
+
+async def _ask_openai_async(query: str) -> dict:
+    response = await _get_async_client().chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=_messages(query),
+        temperature=0,
+    )
+
+    content = response.choices[0].message.content
+    return json.loads(content)
+
+# Swappable so tests (and offline dev) can run without OpenAI
+llm_parser: Callable[[str], dict] = _ask_openai
+async_llm_parser: Callable[[str], Awaitable[dict]] = _ask_openai_async
+
+def set_llm_parser(
+        parser: Callable[[str], dict],
+        async_parser: Optional[Callable[[str], Awaitable[dict]]] = None,
+) -> None:
+    """
+    Replaces the LLM call, e.g. set_llm_parser(lambda q: {...}) in tests.
+    Without an async_parser the sync one is run in a worker thread for the async path.
+    """
+    global llm_parser, async_llm_parser
+    llm_parser = parser
+    if async_parser is None:
+        async def async_parser(query: str) -> dict:
+            return await asyncio.to_thread(parser, query)
+    async_llm_parser = async_parser
+    query_cache.clear()
+
+_warned_no_key = False
+
+def _llm_configured(parser: Callable) -> bool:
+    """False when the parser is the OpenAI one and there is no API key (logged once per worker)."""
+    global _warned_no_key
+    if parser not in (_ask_openai, _ask_openai_async) or settings.OPENAI_API_KEY:
+        return True
+    if not _warned_no_key:
+        _warned_no_key = True
+        logger.warning("OPENAI_API_KEY is not set: searches the local rules don't understand are not sent to the model")
+    return False
+
+def _clean(filters) -> dict:
+    """
+    A parser's output in the SearchFilters shape: values are coerced ("3" -> 3),
+    and the ones that don't fit ("bedrooms": "three", a negative price) are
+    dropped (None), like unknown keys.
+    """
+    if not isinstance(filters, dict):
+        return {}
+    clean = {}
+    for name in SearchFilters.model_fields:
+        value = filters.get(name)
+        if isinstance(value, str):
+            value = value.strip() or None
+        if value is not None:
+            try:
+                value = getattr(SearchFilters.model_validate({name: value}), name)
+            except ValidationError:
+                value = None
+            if isinstance(value, (int, float)) and value < 0:
+                value = None
+        clean[name] = value
+    return clean
+
+def _local_lookup(query: str):
+    """Cache, then rules. Returns (cache_key, filters, needs_llm)."""
+    key = normalize_query(query)
+    cached = query_cache.get(key)
+    if cached is not None:
+        metrics.ai_queries.inc(("cache",))
+        return key, dict(cached), False
+
+    filters, confidence = parse_query(query)
+    if confidence >= LOCAL_CONFIDENCE_THRESHOLD:
+        metrics.ai_queries.inc(("rules",))
+        query_cache.set(key, filters)
+        return key, dict(filters), False
+    return key, filters, True
+
 def interpret_search_query(query: str) -> dict:
     """
     Takes a natural language string, returns a dictionary of filters.
+    Order: cache -> local rule-based parser -> LLM (only when the rules are unsure).
     """
     if not query:
         return {}
 
+    key, filters, needs_llm = _local_lookup(query)
+    if not needs_llm:
+        return filters
+    if not _llm_configured(llm_parser):
+        metrics.ai_queries.inc(("rules",))
+        return _partial(filters)
+
+    started = time.perf_counter()
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo", # Cost-effective for students
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": query}
-            ],
-            temperature=0, # Deterministic results
-        )
-
-        content = response.choices[0].message.content
-        filters = json.loads(content)
+        llm_filters = _clean(llm_parser(query))
+    except Exception:
+        metrics.ai_queries.inc(("error",))
+        logger.warning("LLM search parsing failed, using local rules", exc_info=True)
+        # Fallback: whatever the rules understood (not cached, so we retry the LLM next time)
+        return _partial(filters)
+
+    metrics.ai_latency.observe(time.perf_counter() - started)
+    metrics.ai_queries.inc(("llm",))
+    query_cache.set(key, llm_filters)
+    return dict(llm_filters)
+
+# --- ASYNC PATH ---
+# One in-flight model call per normalized query; concurrent identical searches await it
+_inflight: Dict[str, "asyncio.Future"] = {}
+_limiter: Optional[tuple] = None  # (event loop, semaphore)
+
+def _semaphore() -> asyncio.Semaphore:
+    global _limiter
+    loop = asyncio.get_running_loop()
+    if _limiter is None or _limiter[0] is not loop:
+        _limiter = (loop, asyncio.Semaphore(AI_MAX_CONCURRENCY))
+    return _limiter[1]
+
+async def _call_llm_async(key: str, query: str) -> dict:
+    async with _semaphore():
+        started = time.perf_counter()
+        filters = _clean(await asyncio.wait_for(async_llm_parser(query), timeout=AI_TIMEOUT_SECONDS))
+        metrics.ai_latency.observe(time.perf_counter() - started)
+    metrics.ai_queries.inc(("llm",))
+    query_cache.set(key, filters)
+    return filters
+
+async def interpret_search_query_async(query: str) -> dict:
+    """
+    Non-blocking version of interpret_search_query for async endpoints.
+    Model calls are bounded by AI_MAX_CONCURRENCY and coalesced (single-flight).
+    """
+    if not query:
+        return {}
+
+    key, filters, needs_llm = _local_lookup(query)
+    if not needs_llm:
         return filters
-    except Exception as e:
-        print(f"AI Error: {e}")
-        # Fallback: simple keyword matching could go here
-        return {}
\ No newline at end of file
+    if not _llm_configured(async_llm_parser):
+        metrics.ai_queries.inc(("rules",))
+        return _partial(filters)
+
+    future = _inflight.get(key)
+    if future is None:
+        future = asyncio.ensure_future(_call_llm_async(key, query))
+        _inflight[key] = future
+        future.add_done_callback(lambda _: _inflight.pop(key, None))
+
+    try:
+        # shield: one caller disconnecting must not cancel the shared call
+        return dict(await asyncio.shield(future))
+    except Exception:
+        metrics.ai_queries.inc(("error",))
+        logger.warning("LLM search parsing failed, using local rules", exc_info=True)
+        return _partial(filters)
+
+def _partial(filters: dict) -> dict:
+    """What the rules understood, or {} when that is nothing."""
+    return filters if any(value is not None for value in filters.values()) else {}
@@ -0,0 +1,331 @@
+# app/core/alerts.py
+"""
+Saved-search alerts: a buyer saves a search (the filters interpret_search_query
+returns) and is e-mailed when a new listing matches it.
+
+A new listing never re-runs the saved searches. Each worker keeps them in an
+in-memory predicate index:
+- buckets keyed by (city, suburb, property_type), None meaning "any", so a
+  listing only probes the 8 buckets built from its own values or None
+- inside a bucket, searches are sorted by min_price: the ones with
+  min_price <= price are a prefix (binary search), and max_price and the
+  bedrooms minimum are one vectorized comparison over that prefix
+Matching a listing against 100k saved searches takes well under a millisecond.
+
+New listings are matched once their transaction has committed, in a
+background task after the response (create_property passes the listing,
+bulk imports the new ids), and the matches are queued in search_alerts.
+Matches for searches deleted through another worker (still in this
+worker's index until the next rebuild) are dropped at that point, so they
+can't fail the insert for everyone else. Delivery is the inquiry outbox's
+(claimed batches, backoff, at-least-once) on its own worker thread, with
+ALERTS_SENDER "file" (NDJSON to ALERTS_FILE) or "smtp".
+
+Searches saved through this worker are indexed at once. Ones saved through
+other workers are loaded every SAVED_SEARCH_REFRESH_SECONDS (rows above the
+last id seen), and the index is rebuilt every SAVED_SEARCH_REBUILD_SECONDS,
+which also drops searches deleted elsewhere. Alerts whose search or listing
+is gone by delivery time are not sent.
+
+CLI:
+    python -m app.core.alerts           # deliver every due alert, then exit
+    python -m app.core.alerts --watch   # run the worker until Ctrl-C
+"""
+import argparse
+import logging
+import threading
+import time
+from datetime import datetime
+from email.message import EmailMessage
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import numpy as np
+from sqlalchemy import case, insert, null, select
+from app.core import outbox
+from app.core.config import settings
+from app.db import database, models
+
+logger = logging.getLogger(__name__)
+
+FILTER_FIELDS = ("min_price", "max_price", "city", "suburb", "bedrooms", "property_type")
+LISTING_FIELDS = ("id", "price", "bedrooms", "city", "suburb", "property_type")
+_IN_CHUNK = 500  # ids per IN (...)
+
+# --- 1. PREDICATE INDEX ---
+def _bucket_key(search: dict) -> tuple:
+    # Empty strings mean "any", as in _filter_properties
+    return (search["city"] or None, search["suburb"] or None, search["property_type"] or None)
+
+def _bounds(search: dict) -> Tuple[float, float, int]:
+    low = search["min_price"] if search["min_price"] is not None else -np.inf
+    high = search["max_price"] if search["max_price"] is not None else np.inf
+    return low, high, search["bedrooms"] or 0
+
+class _Bucket:
+    """The searches sharing one (city, suburb, property_type) key, as arrays sorted by min_price."""
+    __slots__ = ("searches", "_arrays")
+
+    def __init__(self):
+        self.searches: Dict[int, Tuple[float, float, int]] = {}  # id -> (min_price, max_price, bedrooms)
+        self._arrays = None  # rebuilt by the first match after a change
+
+    def put(self, search_id: int, bounds: Tuple[float, float, int]) -> None:
+        self.searches[search_id] = bounds
+        self._arrays = None
+
+    def discard(self, search_id: int) -> None:
+        self.searches.pop(search_id, None)
+        self._arrays = None
+
+    def match(self, price: float, bedrooms: int) -> np.ndarray:
+        if self._arrays is None:
+            ids = np.fromiter(self.searches, dtype=np.int64, count=len(self.searches))
+            bounds = np.array(list(self.searches.values()), dtype=np.float64).reshape(-1, 3)
+            order = np.argsort(bounds[:, 0], kind="stable")
+            self._arrays = (ids[order], *(np.ascontiguousarray(bounds[order, i]) for i in range(3)))
+        ids, low, high, beds = self._arrays
+        end = int(np.searchsorted(low, price, side="right"))
+        return ids[:end][(high[:end] >= price) & (beds[:end] <= bedrooms)]
+
+class _Table:
+    """Buckets by key, and which bucket each search is in."""
+    __slots__ = ("buckets", "keys")
+
+    def __init__(self):
+        self.buckets: Dict[tuple, _Bucket] = {}
+        self.keys: Dict[int, tuple] = {}
+
+    def put(self, search: dict) -> None:
+        search_id, key = search["id"], _bucket_key(search)
+        previous = self.keys.get(search_id)
+        if previous is not None and previous != key:
+            self.discard(search_id)
+        self.buckets.setdefault(key, _Bucket()).put(search_id, _bounds(search))
+        self.keys[search_id] = key
+
+    def discard(self, search_id: int) -> None:
+        key = self.keys.pop(search_id, None)
+        if key is not None:
+            bucket = self.buckets[key]
+            bucket.discard(search_id)
+            if not bucket.searches:
+                del self.buckets[key]
+
+class SavedSearchIndex:
+    def __init__(self, bind=None, refresh_seconds: float = 30.0, rebuild_seconds: float = 3600.0):
+        self._bind = bind
+        self.refresh_seconds = refresh_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        self._table = _Table()
+        self._max_id = 0
+        self._loaded_at: Optional[float] = None
+        self._built_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._table.keys)
+
+    def add(self, search) -> None:
+        """Indexes a search saved through this worker (a models.SavedSearch or a dict with id and FILTER_FIELDS)."""
+        if not isinstance(search, dict):
+            search = {name: getattr(search, name) for name in ("id",) + FILTER_FIELDS}
+        with self._lock:
+            self._table.put(search)
+
+    def remove(self, search_id: int) -> None:
+        with self._lock:
+            self._table.discard(search_id)
+
+    def refresh(self, force: bool = False) -> None:
+        """Loads searches saved elsewhere (new ids), or everything again when the rebuild is due."""
+        now = time.monotonic()
+        if not force and self._loaded_at is not None and now - self._loaded_at < self.refresh_seconds:
+            return
+        if not self._refreshing.acquire(blocking=False):
+            return  # another thread is on it; match with what we have
+        try:
+            rebuild = force or self._built_at is None or now - self._built_at >= self.rebuild_seconds
+            columns = [getattr(models.SavedSearch, name) for name in ("id",) + FILTER_FIELDS]
+            stmt = select(*columns).where(models.SavedSearch.id > (0 if rebuild else self._max_id)).order_by(models.SavedSearch.id)
+            # Primary, not the replica: a lagging replica could hide a search below the last id seen
+            with (self._bind or database.engine).connect() as connection:
+                rows = connection.execute(stmt).mappings().all()
+
+            if rebuild:
+                # Built aside and swapped in, so matching never waits for a full load
+                table = _Table()
+                for row in rows:
+                    table.put(row)
+                with self._lock:
+                    self._table, self._max_id = table, rows[-1]["id"] if rows else 0
+                self._built_at = now
+                logger.info("Saved-search index: %d searches in %d buckets (%.0f ms)",
+                            len(table.keys), len(table.buckets), (time.monotonic() - now) * 1000)
+            elif rows:
+                with self._lock:
+                    for row in rows:
+                        self._table.put(row)
+                    self._max_id = max(self._max_id, rows[-1]["id"])
+            self._loaded_at = now
+        finally:
+            self._refreshing.release()
+
+    def match(self, listing: dict) -> List[int]:
+        """Ids of the saved searches a listing satisfies (a dict with LISTING_FIELDS)."""
+        price, bedrooms = float(listing["price"]), listing.get("bedrooms") or 0
+        city, suburb, ptype = listing.get("city") or None, listing.get("suburb") or None, listing.get("property_type") or None
+        keys = {(c, s, t) for c in (city, None) for s in (suburb, None) for t in (ptype, None)}
+        with self._lock:
+            buckets = self._table.buckets
+            found = [buckets[key].match(price, bedrooms) for key in keys if key in buckets]
+        return np.sort(np.concatenate(found)).tolist() if found else []
+
+index = SavedSearchIndex(
+    refresh_seconds=settings.SAVED_SEARCH_REFRESH_SECONDS,
+    rebuild_seconds=settings.SAVED_SEARCH_REBUILD_SECONDS,
+)
+
+# --- 2. ENQUEUE (after the listings are committed) ---
+def _saved_search_ids(connection, search_ids: set) -> set:
+    """
+    The ones still saved. FOR KEY SHARE on PostgreSQL, so none can be deleted
+    before the alerts referencing it are committed.
+    """
+    wanted, found = sorted(search_ids), set()
+    for i in range(0, len(wanted), _IN_CHUNK):
+        stmt = (select(models.SavedSearch.id).where(models.SavedSearch.id.in_(wanted[i:i + _IN_CHUNK]))
+                .with_for_update(read=True, key_share=True))
+        found.update(connection.execute(stmt).scalars())
+    return found
+
+def enqueue(listings: Iterable[dict], bind=None) -> int:
+    """
+    Matches new listings against the saved searches and queues one alert per
+    match; returns how many. Best effort: a failure is logged, never raised
+    into the write that created the listings.
+    """
+    try:
+        index.refresh()
+        matches = [(search_id, listing["id"]) for listing in listings for search_id in index.match(listing)]
+        if not matches:
+            return 0
+        matched = {search_id for search_id, _ in matches}
+        with (bind or database.engine).begin() as connection:
+            saved = _saved_search_ids(connection, matched)
+            now = models.utcnow()
+            rows = [
+                {"saved_search_id": search_id, "property_id": property_id, "status": "pending",
+                 "attempts": 0, "next_attempt_at": now, "created_at": now}
+                for search_id, property_id in matches if search_id in saved
+            ]
+            if rows:
+                connection.execute(insert(models.SearchAlert.__table__), rows)
+        for search_id in matched - saved:  # deleted through another worker
+            index.remove(search_id)
+        return len(rows)
+    except Exception:
+        logger.exception("Queuing saved-search alerts failed")
+        return 0
+
+def enqueue_ids(property_ids: List[int], bind=None) -> int:
+    """enqueue() for listings known by id (bulk imports), read back in chunks."""
+    columns = [getattr(models.Property, name) for name in LISTING_FIELDS]
+    queued = 0
+    for i in range(0, len(property_ids), _IN_CHUNK):
+        with (bind or database.engine).connect() as connection:
+            rows = connection.execute(select(*columns).where(models.Property.id.in_(property_ids[i:i + _IN_CHUNK]))).mappings().all()
+        queued += enqueue(rows, bind)
+    return queued
+
+def enqueue_in_background(listings: List[dict]) -> None:
+    """BackgroundTasks entry point: queue the alerts, then wake the delivery worker."""
+    if enqueue(listings):
+        worker.wake()
+
+def enqueue_ids_in_background(property_ids: List[int]) -> None:
+    if enqueue_ids(property_ids):
+        worker.wake()
+
+# --- 3. DELIVERY (the outbox's, with alert messages) ---
+class Alert(NamedTuple):
+    id: int
+    saved_search_id: int
+    search_name: Optional[str]
+    email: Optional[str]
+    token: Optional[str]
+    property_id: int
+    property_title: Optional[str]  # NULL when the listing or the search is gone: not sent
+    price: Optional[float]
+    bedrooms: Optional[int]
+    suburb: Optional[str]
+    city: Optional[str]
+    property_type: Optional[str]
+    attempts: int
+    created_at: datetime
+
+    @property
+    def idempotency_key(self) -> str:
+        return f"alert:{self.saved_search_id}:{self.property_id}"
+
+def _claimed_alerts(token: str):
+    alert, search, listing = models.SearchAlert, models.SavedSearch, models.Property
+    return (
+        select(alert.id, alert.saved_search_id, search.name.label("search_name"), search.email, search.token,
+               alert.property_id, case((search.id.is_(None), null()), else_=listing.title).label("property_title"),
+               listing.price, listing.bedrooms, listing.suburb, listing.city, listing.property_type,
+               alert.attempts, alert.created_at)
+        .outerjoin(search, search.id == alert.saved_search_id)
+        .outerjoin(listing, listing.id == alert.property_id)
+        .where(alert.claimed_by == token)
+        .order_by(alert.id)
+    )
+
+class SMTPAlertSender(outbox.SMTPSender):
+    """One e-mail per alert to the buyer who saved the search, over one connection per batch."""
+    def _recipient(self, message: Alert) -> Optional[str]:
+        return message.email
+
+    @staticmethod
+    def _compose(message: Alert) -> EmailMessage:
+        email = EmailMessage()
+        email["From"] = settings.SMTP_FROM
+        email["To"] = message.email
+        email["Subject"] = f"New listing for {message.search_name or 'your saved search'}: {message.property_title}"
+        email["Message-ID"] = f"<{message.idempotency_key.replace(':', '.')}@smartestate>"
+        email.set_content(
+            f"{message.property_title}\n"
+            f"{message.property_type} in {message.suburb}, {message.city}: "
+            f"{message.bedrooms} bedrooms, {message.price:,.0f}\n"
+            f"Listing #{message.property_id}\n\n"
+            f"To stop these alerts, delete saved search #{message.saved_search_id} (token {message.token}).\n"
+        )
+        return email
+
+SENDERS = {"file": lambda: outbox.FileSender(settings.ALERTS_FILE), "smtp": SMTPAlertSender}
+ALERTS = outbox.Queue("search-alerts", models.SearchAlert, _claimed_alerts, Alert, SENDERS, "ALERTS_SENDER")
+
+worker = outbox.OutboxWorker(ALERTS)
+
+# --- 4. CLI ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deliver queued saved-search alerts")
+    parser.add_argument("--watch", action="store_true", help="Keep running and deliver new alerts as they are queued")
+    args = parser.parse_args()
+
+    database.init_db()
+    if args.watch:
+        print(f"🔔 Delivering saved-search alerts via {settings.ALERTS_SENDER} (Ctrl-C to stop)...")
+        worker.wake()
+        try:
+            while True:
+                threading.Event().wait(3600)
+        except KeyboardInterrupt:
+            worker.stop()
+    else:
+        print(f"🔔 Delivering {outbox.pending_count(queue=ALERTS)} pending alerts via {settings.ALERTS_SENDER}...")
+        sender = outbox.get_sender(queue=ALERTS)
+        try:
+            result = outbox.drain(sender, queue=ALERTS)
+        finally:
+            sender.close()
+        print(f"✅ Sent {result['sent']}, retrying {result['retrying']}, failed {result['failed']}")
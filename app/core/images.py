@@ -0,0 +1,143 @@
+# app/core/images.py
+"""
+Image upload pipeline: stream to disk, dedupe by content hash, build
+resized variants in a process pool (Pillow is CPU bound and would block
+the event loop).
+
+Files are named after their SHA-256, so a URL never changes content and
+can be cached forever by browsers and CDNs.
+"""
+import asyncio
+import hashlib
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+from fastapi import HTTPException, UploadFile
+from fastapi.staticfiles import StaticFiles
+
+UPLOAD_DIR = Path("./uploads")
+UPLOAD_URL_PREFIX = "/uploads"
+
+CHUNK_SIZE = 1024 * 1024             # 1 MB per read/write
+MAX_UPLOAD_BYTES = 15 * 1024 * 1024  # 15 MB
+
+ALLOWED_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+}
+
+# name -> longest edge in pixels
+VARIANTS = {
+    "thumb": 400,
+    "web": 1600,
+}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=max(1, min(4, (os.cpu_count() or 2) - 1)))
+    return _pool
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def _variant_path(digest: str, name: str) -> Path:
+    return UPLOAD_DIR / f"{digest}_{name}.jpg"
+
+def _urls(digest: str, ext: str) -> dict:
+    return {
+        "url": f"{UPLOAD_URL_PREFIX}/{digest}_web.jpg",
+        "thumbnail_url": f"{UPLOAD_URL_PREFIX}/{digest}_thumb.jpg",
+        "original_url": f"{UPLOAD_URL_PREFIX}/{digest}{ext}",
+    }
+
+def thumbnail_url(image_url: str) -> str:
+    """The 400px variant of an uploaded photo; other URLs are returned unchanged."""
+    if image_url.startswith(UPLOAD_URL_PREFIX + "/") and image_url.endswith("_web.jpg"):
+        return image_url[: -len("_web.jpg")] + "_thumb.jpg"
+    return image_url
+
+# --- 1. PROCESS POOL WORKER ---
+def build_variants(source: str, digest: str, upload_dir: str) -> None:
+    """Runs in a worker process. Raises if the file is not a readable image."""
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as img:
+        img.verify()
+
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        for name, size in VARIANTS.items():
+            target = Path(upload_dir) / f"{digest}_{name}.jpg"
+            if target.exists():
+                continue
+            variant = img.copy()
+            variant.thumbnail((size, size))
+            tmp = target.with_suffix(".tmp")
+            variant.save(tmp, "JPEG", quality=82, optimize=True, progressive=True)
+            os.replace(tmp, target)
+
+# --- 2. STREAMING SAVE ---
+async def save_upload(file: UploadFile) -> dict:
+    ext = ALLOWED_TYPES.get(file.content_type or "")
+    if ext is None:
+        raise HTTPException(status_code=415, detail="Only JPEG, PNG or WebP images are allowed")
+
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = UPLOAD_DIR / f".incoming-{uuid.uuid4().hex}"
+    sha = hashlib.sha256()
+    size = 0
+    loop = asyncio.get_running_loop()
+
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="Image is larger than 15 MB")
+                sha.update(chunk)
+                await loop.run_in_executor(None, out.write, chunk)
+
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty file")
+
+        digest = sha.hexdigest()
+        original = UPLOAD_DIR / f"{digest}{ext}"
+        duplicate = original.exists() and all(_variant_path(digest, name).exists() for name in VARIANTS)
+        if duplicate:
+            return {**_urls(digest, ext), "sha256": digest, "duplicate": True}
+
+        os.replace(tmp_path, original)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+    try:
+        await loop.run_in_executor(_get_pool(), build_variants, str(original), digest, str(UPLOAD_DIR))
+    except Exception:
+        original.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail="File is not a valid image")
+
+    return {**_urls(digest, ext), "sha256": digest, "duplicate": False}
+
+# --- 3. STATIC SERVING ---
+class UploadStaticFiles(StaticFiles):
+    """
+    StaticFiles already answers ETag / If-None-Match, Last-Modified and Range
+    requests; content-addressed names let us add a year-long immutable cache.
+    """
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 206, 304):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
@@ -0,0 +1,9 @@
+# app/core/log_config.py
+import logging
+from app.core.config import settings
+
+# key=value lines: readable in a terminal, easy to parse for log shippers
+LOG_FORMAT = "%(asctime)s level=%(levelname)s logger=%(name)s msg=%(message)s"
+
+def setup_logging(level: str = settings.LOG_LEVEL) -> None:
+    logging.basicConfig(level=level.upper(), format=LOG_FORMAT)
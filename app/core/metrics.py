@@ -0,0 +1,190 @@
+# app/core/metrics.py
+"""
+In-process metrics exported in the Prometheus text format on /metrics.
+
+Collected:
+- HTTP requests per route (count + latency histogram)
+- SQL statements and time, in total and per route (SQLAlchemy engine events)
+- AI search latency and where answers came from (cache / rules / llm)
+- requests refused by admission control (app/core/ratelimit.py)
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+from sqlalchemy import event
+
+# Seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, labels: Tuple = (), amount: float = 1.0) -> None:
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.buckets = name, help, buckets
+        # labels -> [bucket counts..., +Inf count, sum]
+        self.values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, labels: Tuple = ()) -> None:
+        with _lock:
+            row = self.values.get(labels)
+            if row is None:
+                row = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[bisect_left(self.buckets, value)] += 1
+            row[-1] += value
+
+# --- 1. METRIC FAMILIES ---
+HTTP_LABELS = ("method", "route", "status")
+http_requests = Counter("http_requests_total", "HTTP requests handled")
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency")
+http_sql_statements = Counter("http_request_sql_statements_total", "SQL statements run while serving a route")
+http_sql_seconds = Counter("http_request_sql_seconds_total", "Time spent in SQL while serving a route")
+
+db_statements = Counter("db_statements_total", "SQL statements executed")
+db_latency = Histogram("db_statement_duration_seconds", "SQL statement latency")
+
+ai_queries = Counter("ai_search_queries_total", "Search queries interpreted, by source (cache, rules, llm, error)")
+ai_latency = Histogram("ai_search_llm_duration_seconds", "Latency of LLM calls for search parsing")
+
+admission_rejected = Counter("http_admission_rejected_total", "Requests refused before their route (429 rate_limited, 503 over_capacity)")
+
+_LABELS = {
+    http_requests.name: HTTP_LABELS,
+    http_latency.name: ("method", "route"),
+    http_sql_statements.name: ("method", "route"),
+    http_sql_seconds.name: ("method", "route"),
+    ai_queries.name: ("source",),
+    admission_rejected.name: ("reason", "rule"),
+}
+
+# Extra gauges read at scrape time, e.g. cache sizes: name -> (help, callable)
+_gauges: Dict[str, tuple] = {}
+
+def register_gauge(name: str, help: str, read) -> None:
+    _gauges[name] = (help, read)
+
+# --- 2. SQL INSTRUMENTATION ---
+class _RequestSQL:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+_request_sql: ContextVar[Optional[_RequestSQL]] = ContextVar("request_sql", default=None)
+
+def instrument_engine(engine) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        db_statements.inc()
+        db_latency.observe(elapsed)
+        stats = _request_sql.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+
+# --- 3. HTTP MIDDLEWARE ---
+def _route_label(scope) -> str:
+    """
+    The route template, e.g. /api/v1/properties/{property_id}. Rebuilt from the
+    path and its path params, since routes of included routers (and mounts)
+    only know their own, unprefixed path.
+    """
+    if scope.get("route") is None:
+        return "unmatched"  # 404s must not create one series per random URL
+    segments = scope["path"].split("/")
+    for name, value in scope.get("path_params", {}).items():
+        value = str(value)
+        for i in range(len(segments) - 1, -1, -1):
+            if segments[i] == value:
+                segments[i] = "{" + name + "}"
+                break
+        else:
+            if "/" in value:
+                # {path:path} style params (static files) span several segments
+                prefix = scope["path"][: len(scope["path"]) - len(value)]
+                return prefix + "{" + name + "}"
+    return "/".join(segments)
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        stats = _RequestSQL()
+        token = _request_sql.set(stats)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _request_sql.reset(token)
+            elapsed = time.perf_counter() - started
+            route = _route_label(scope)
+            method = scope["method"]
+            http_requests.inc((method, route, str(status_code)))
+            http_latency.observe(elapsed, (method, route))
+            if stats.count:
+                http_sql_statements.inc((method, route), stats.count)
+                http_sql_seconds.inc((method, route), stats.seconds)
+
+# --- 4. EXPOSITION ---
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _fmt_labels(names: Tuple, values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def render() -> str:
+    lines = []
+    with _lock:
+        for metric in (http_requests, http_sql_statements, http_sql_seconds, db_statements, ai_queries, admission_rejected):
+            lines += [f"# HELP {metric.name} {metric.help}", f"# TYPE {metric.name} counter"]
+            names = _LABELS.get(metric.name, ())
+            for labels, value in sorted(metric.values.items()):
+                lines.append(f"{metric.name}{_fmt_labels(names, labels)} {value:g}")
+
+        for metric in (http_latency, db_latency, ai_latency):
+            lines += [f"# HELP {metric.name} {metric.help}", f"# TYPE {metric.name} histogram"]
+            names = _LABELS.get(metric.name, ())
+            for labels, row in sorted(metric.values.items()):
+                cumulative = 0
+                for bound, count in zip(metric.buckets + ("+Inf",), row[:-1]):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    lines.append(f"{metric.name}_bucket{_fmt_labels(names, labels, le)} {cumulative}")
+                lines.append(f"{metric.name}_sum{_fmt_labels(names, labels)} {row[-1]:g}")
+                lines.append(f"{metric.name}_count{_fmt_labels(names, labels)} {cumulative}")
+
+    for name, (help, read) in sorted(_gauges.items()):
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {read():g}"]
+    return "\n".join(lines) + "\n"
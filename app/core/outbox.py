@@ -0,0 +1,347 @@
+# app/core/outbox.py
+"""
+Inquiry outbox: contact_seller only inserts a row into inquiry_outbox in its
+own transaction; a background worker delivers pending rows in batches.
+Saved-search alerts (app/core/alerts.py) are a second Queue over the same
+delivery code.
+
+Delivery is at-least-once:
+- a worker claims a batch by stamping it with a token and a lease
+  (next_attempt_at); if the worker dies, the lease expires and the rows are
+  claimed again
+- a failed message is retried with exponential backoff plus jitter, and marked
+  failed after OUTBOX_MAX_ATTEMPTS
+- every message carries its idempotency key (the e-mail Message-ID for SMTP)
+  so a receiver can drop the rare duplicate
+
+Senders are pluggable (OUTBOX_SENDER): "file" appends NDJSON to OUTBOX_FILE
+(development / tests), "smtp" sends one e-mail per inquiry over one SMTP
+connection per batch.
+
+CLI:
+    python -m app.core.outbox           # deliver everything due, then exit
+    python -m app.core.outbox --watch   # run the worker until Ctrl-C
+"""
+import abc
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import smtplib
+import threading
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Callable, Dict, List, NamedTuple, Optional
+from sqlalchemy import bindparam, exists, func, insert, literal, select, update
+from app.core.config import settings
+from app.db import database, models
+
+logger = logging.getLogger(__name__)
+
+class Message(NamedTuple):
+    id: int
+    idempotency_key: str
+    property_id: int
+    property_title: Optional[str]
+    seller_email: Optional[str]
+    name: str
+    email: str
+    phone: str
+    message: str
+    attempts: int
+    created_at: datetime
+
+# --- 1. ENQUEUE (request path) ---
+def idempotency_key(property_id: int, contact: dict, client_key: Optional[str] = None) -> str:
+    """
+    The client's Idempotency-Key when given, else a hash of the inquiry and the
+    day, so a double-submitted form is stored once.
+    """
+    if client_key:
+        return f"{property_id}:{client_key}"
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (property_id, contact["email"], contact["message"], models.utcnow().date()):
+        digest.update(str(part).encode() + b"\0")
+    return f"{property_id}:{digest.hexdigest()}"
+
+def enqueue_statement(property_id: int, key: str, contact: dict):
+    """
+    INSERT ... SELECT ... WHERE EXISTS (listing): one statement that queues the
+    inquiry only if the listing exists. RETURNING gives the id (None -> 404).
+    """
+    now = models.utcnow()
+    values = {"property_id": property_id, "idempotency_key": key, **contact,
+              "status": "pending", "attempts": 0, "next_attempt_at": now, "created_at": now}
+    inquiry = models.Inquiry
+    row = select(*(literal(value, getattr(inquiry, name).type).label(name) for name, value in values.items()))
+    row = row.where(exists().where(models.Property.id == property_id))
+    return insert(inquiry).from_select(list(values), row).returning(inquiry.id)
+
+# --- 2. SENDERS ---
+class Sender(abc.ABC):
+    """Delivers a batch. Returns {message id: None on success, else an error string}."""
+    @abc.abstractmethod
+    def send(self, messages: List[Message]) -> Dict[int, Optional[str]]:
+        ...
+
+    def close(self) -> None:
+        pass
+
+class FileSender(Sender):
+    """Appends one JSON line per inquiry; one write + fsync per batch."""
+    def __init__(self, path: str = None):
+        self.path = path or settings.OUTBOX_FILE
+
+    def send(self, messages: List[Message]) -> Dict[int, Optional[str]]:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        lines = "".join(
+            json.dumps({**message._asdict(), "created_at": message.created_at.isoformat()}) + "\n"
+            for message in messages
+        )
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        return {message.id: None for message in messages}
+
+class SMTPSender(Sender):
+    """One e-mail per inquiry to the listing's owner, over one connection per batch."""
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=30)
+        if settings.SMTP_STARTTLS:
+            smtp.starttls()
+        if settings.SMTP_USER:
+            smtp.login(settings.SMTP_USER, settings.SMTP_PASSWORD or "")
+        return smtp
+
+    def _recipient(self, message: Message) -> Optional[str]:
+        return message.seller_email
+
+    @staticmethod
+    def _compose(message: Message) -> EmailMessage:
+        email = EmailMessage()
+        email["From"] = settings.SMTP_FROM
+        email["To"] = message.seller_email
+        email["Reply-To"] = message.email
+        email["Subject"] = f"New inquiry: {message.property_title}"
+        email["Message-ID"] = f"<{message.idempotency_key.replace(':', '.')}@smartestate>"
+        email.set_content(
+            f"{message.name} ({message.email}, {message.phone}) asked about "
+            f"listing #{message.property_id}:\n\n{message.message}\n"
+        )
+        return email
+
+    def send(self, messages: List[Message]) -> Dict[int, Optional[str]]:
+        results = {}
+        with self._connect() as smtp:  # connection errors fail (and retry) the whole batch
+            for message in messages:
+                if not self._recipient(message):
+                    results[message.id] = "listing has no seller e-mail"
+                    continue
+                try:
+                    smtp.send_message(self._compose(message))
+                    results[message.id] = None
+                except smtplib.SMTPRecipientsRefused as e:
+                    results[message.id] = f"recipient refused: {e.recipients}"
+        return results
+
+SENDERS = {"file": FileSender, "smtp": SMTPSender}
+
+# --- 3. QUEUES ---
+class Queue(NamedTuple):
+    """
+    A table with the delivery columns of models.Inquiry (status, attempts,
+    next_attempt_at, claimed_by, last_error, sent_at), the select that reads
+    the rows claimed with a token, and the senders for its messages. A message
+    whose property_title comes back NULL is undeliverable (listing deleted).
+    """
+    name: str
+    model: type
+    claimed: Callable[[str], object]
+    message: type
+    senders: Dict[str, Callable[[], Sender]]
+    sender_setting: str
+
+def _claimed_inquiries(token: str):
+    inquiry = models.Inquiry
+    return (
+        select(inquiry.id, inquiry.idempotency_key, inquiry.property_id,
+               models.Property.title.label("property_title"), models.User.email.label("seller_email"),
+               inquiry.name, inquiry.email, inquiry.phone, inquiry.message, inquiry.attempts, inquiry.created_at)
+        .outerjoin(models.Property, models.Property.id == inquiry.property_id)
+        .outerjoin(models.User, models.User.id == models.Property.owner_id)
+        .where(inquiry.claimed_by == token)
+        .order_by(inquiry.id)
+    )
+
+INQUIRIES = Queue("inquiry-outbox", models.Inquiry, _claimed_inquiries, Message, SENDERS, "OUTBOX_SENDER")
+
+def get_sender(name: str = None, queue: Queue = INQUIRIES) -> Sender:
+    name = name or getattr(settings, queue.sender_setting)
+    if name not in queue.senders:
+        raise ValueError(f"{queue.sender_setting} must be one of {', '.join(queue.senders)}")
+    return queue.senders[name]()
+
+# --- 4. DELIVERY ---
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff with "equal jitter", so a failed spike doesn't retry in lockstep."""
+    delay = min(settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), settings.OUTBOX_RETRY_MAX_SECONDS)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def _claim(bind, batch_size: int, queue: Queue = INQUIRIES) -> tuple:
+    inquiry = queue.model
+    now = models.utcnow()
+    token = uuid.uuid4().hex
+    due = (inquiry.status == "pending", inquiry.next_attempt_at <= now)
+    with bind.begin() as connection:
+        # Re-checking `due` in the UPDATE keeps two workers from claiming the same rows
+        ids = select(inquiry.id).where(*due).order_by(inquiry.id).limit(batch_size)
+        connection.execute(
+            update(inquiry).where(inquiry.id.in_(ids.scalar_subquery()), *due)
+            .values(claimed_by=token, next_attempt_at=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS))
+        )
+    with bind.connect() as connection:
+        return token, [queue.message(**row) for row in connection.execute(queue.claimed(token)).mappings()]
+
+def _record(bind, token: str, messages: list, results: Dict[int, Optional[str]], queue: Queue = INQUIRIES) -> dict:
+    inquiry = queue.model
+    now = models.utcnow()
+    sent = [message.id for message in messages if message.id in results and results[message.id] is None]
+    retries = []
+    for message in messages:
+        if message.id in sent:
+            continue
+        attempts = message.attempts + 1
+        gave_up = attempts >= settings.OUTBOX_MAX_ATTEMPTS or message.property_title is None
+        retries.append({
+            "b_id": message.id,
+            "b_status": "failed" if gave_up else "pending",
+            "b_attempts": attempts,
+            "b_next": now + timedelta(seconds=backoff_seconds(attempts)),
+            "b_error": results.get(message.id) or "no result from sender",
+        })
+
+    with bind.begin() as connection:
+        # Only rows this worker still holds (claimed_by == token) are updated
+        if sent:
+            connection.execute(
+                update(inquiry).where(inquiry.id.in_(sent), inquiry.claimed_by == token)
+                .values(status="sent", sent_at=now, attempts=inquiry.attempts + 1, claimed_by=None, last_error=None)
+            )
+        if retries:
+            connection.execute(
+                update(inquiry).where(inquiry.id == bindparam("b_id"), inquiry.claimed_by == token)
+                .values(status=bindparam("b_status"), attempts=bindparam("b_attempts"),
+                        next_attempt_at=bindparam("b_next"), last_error=bindparam("b_error"), claimed_by=None),
+                retries,
+            )
+    failed = sum(1 for row in retries if row["b_status"] == "failed")
+    return {"sent": len(sent), "retrying": len(retries) - failed, "failed": failed}
+
+def deliver_batch(sender: Sender, bind=None, batch_size: int = None, queue: Queue = INQUIRIES) -> dict:
+    """Claims up to batch_size due messages, sends them and records the outcome."""
+    bind = bind or database.engine
+    token, messages = _claim(bind, batch_size or settings.OUTBOX_BATCH_SIZE, queue)
+    if not messages:
+        return {"claimed": 0, "sent": 0, "retrying": 0, "failed": 0}
+
+    deliverable = [message for message in messages if message.property_title is not None]
+    results = {message.id: "listing no longer exists" for message in messages if message.property_title is None}
+    if deliverable:
+        try:
+            results.update(sender.send(deliverable))
+        except Exception as e:
+            logger.warning("%s batch of %d failed: %s", queue.name, len(deliverable), e)
+            results.update({message.id: f"{type(e).__name__}: {e}" for message in deliverable})
+    return {"claimed": len(messages), **_record(bind, token, messages, results, queue)}
+
+def drain(sender: Sender, bind=None, batch_size: int = None, queue: Queue = INQUIRIES) -> dict:
+    """Delivers batches until nothing is due."""
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    totals = {"claimed": 0, "sent": 0, "retrying": 0, "failed": 0}
+    while True:
+        result = deliver_batch(sender, bind, batch_size, queue)
+        for name in totals:
+            totals[name] += result[name]
+        if result["claimed"] < batch_size:
+            return totals
+
+def pending_count(bind=None, queue: Queue = INQUIRIES) -> int:
+    with (bind or database.engine).connect() as connection:
+        return connection.scalar(select(func.count()).where(queue.model.status == "pending"))
+
+# --- 5. BACKGROUND WORKER ---
+class OutboxWorker:
+    """
+    One daemon thread per process and queue, started on the first wake(). New
+    messages wake it at once; otherwise it polls every OUTBOX_POLL_SECONDS for
+    due retries. Messages arriving while a batch is being sent are picked up by
+    the next one, so a spike turns into a few large batches rather than many small ones.
+    """
+    def __init__(self, queue: Queue = INQUIRIES):
+        self.queue = queue
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def wake(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name=self.queue.name, daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def stop(self, timeout: float = 10) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            self._wake.set()
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        sender = get_sender(queue=self.queue)
+        try:
+            while not self._stop.is_set():
+                self._wake.clear()
+                try:
+                    result = drain(sender, queue=self.queue)
+                    if result["claimed"]:
+                        logger.info("%s: %d sent, %d to retry, %d failed",
+                                    self.queue.name, result["sent"], result["retrying"], result["failed"])
+                except Exception:
+                    logger.exception("%s delivery failed", self.queue.name)
+                self._wake.wait(settings.OUTBOX_POLL_SECONDS)
+        finally:
+            sender.close()
+
+worker = OutboxWorker()
+
+# --- 6. CLI ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deliver queued inquiries")
+    parser.add_argument("--watch", action="store_true", help="Keep running and deliver new inquiries as they arrive")
+    args = parser.parse_args()
+
+    database.init_db()
+    if args.watch:
+        print(f"📬 Delivering inquiries via {settings.OUTBOX_SENDER} (Ctrl-C to stop)...")
+        worker.wake()
+        try:
+            while True:
+                threading.Event().wait(3600)
+        except KeyboardInterrupt:
+            worker.stop()
+    else:
+        print(f"📬 Delivering {pending_count()} pending inquiries via {settings.OUTBOX_SENDER}...")
+        sender = get_sender()
+        try:
+            result = drain(sender)
+        finally:
+            sender.close()
+        print(f"✅ Sent {result['sent']}, retrying {result['retrying']}, failed {result['failed']}")
@@ -0,0 +1,263 @@
+# app/core/ratelimit.py
+"""
+Admission control: token-bucket rate limits and per-route concurrency caps,
+checked before a request reaches its route.
+
+Every route costs tokens (RULES, default 1). Each request takes its cost from
+the client IP's bucket and, when it carries a valid bearer token, from the
+user's bucket too: all or nothing, so a refused request costs nothing.
+Buckets refill continuously up to their burst size. An empty bucket answers
+429 with Retry-After set to the time until the cost is available again.
+
+The buckets live in a small memory-mapped file (RATE_LIMIT_FILE), a hash
+table of (key hash, tokens, last update) slots guarded by flock, so all the
+uvicorn workers of a host enforce one limit and a check costs microseconds.
+Hosts behind a load balancer each keep their own. Behind a proxy, set
+RATE_LIMIT_TRUSTED_PROXIES so IP buckets are keyed on the client address from
+X-Forwarded-For instead of the proxy's.
+
+Expensive routes also have a per-worker concurrency cap. Past it, requests
+are shed at once with 503 and Retry-After: 1 instead of queueing behind
+bcrypt or the model and starving the cheap reads sharing the worker.
+"""
+import hashlib
+import ipaddress
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from jose import JWTError, jwt
+from app.core import metrics, responses, security
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: buckets are per worker
+    fcntl = None
+
+class Rule(NamedTuple):
+    name: str
+    method: str
+    path: str  # regex, matched against the whole path
+    cost: float
+    max_concurrency: Optional[int] = None  # in flight per worker
+
+_API = re.escape(settings.API_V1_STR)
+
+# First match wins. Costs are relative to a cached listing read (1)
+RULES = (
+    # bcrypt: as many as its threads, the rest are shed rather than queued
+    Rule("auth", "POST", _API + r"/auth/(token|signup)", 50, settings.BCRYPT_MAX_CONCURRENCY),
+    Rule("ai_search", "POST", _API + r"/properties/search", 20, 16),  # may call the model
+    Rule("saved_search", "POST", _API + r"/searches/?", 20, 16),  # parses its query like a search
+    Rule("import", "POST", _API + r"/properties/import", 100, 2),
+    Rule("export", "GET", _API + r"/properties/export", 100, 2),
+    Rule("upload", "POST", _API + r"/properties/upload", 10, 8),  # image decoding and resizing
+    Rule("report", "GET", _API + r"/properties/\d+/(report|similar)", 2),
+)
+DEFAULT_RULE = Rule("default", "*", "", 1)
+# Never limited: probes, scrapes, CORS preflights and static photos
+EXEMPT_PREFIXES = ("/health/", "/metrics", "/uploads/")
+
+_COMPILED = [(rule, re.compile(rule.path)) for rule in RULES]
+
+def rule_for(method: str, path: str) -> Optional[Rule]:
+    """The rule a request falls under, or None when it is exempt."""
+    if method == "OPTIONS" or path.startswith(EXEMPT_PREFIXES):
+        return None
+    for rule, pattern in _COMPILED:
+        if rule.method == method and pattern.fullmatch(path):
+            return rule
+    return DEFAULT_RULE
+
+# --- 1. SHARED TOKEN BUCKETS ---
+class SharedBuckets:
+    """
+    Token buckets in a memory-mapped file shared by the processes of a host.
+    A key hashes to a slot and probes PROBE slots after it; when none holds
+    the key, it takes an empty slot or evicts the one idle the longest
+    (a bucket idle that long has refilled anyway).
+    """
+    SLOT = struct.Struct("<Qdd")  # key hash (0 = empty), tokens, last update (unix seconds)
+    PROBE = 8
+
+    def __init__(self, path: str, slots: int = 65536):
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()  # flock doesn't exclude threads sharing the descriptor
+        self._fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+
+    def _open(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = self.slots * self.SLOT.size
+        if os.fstat(fd).st_size != size:
+            os.ftruncate(fd, size)  # new file, or RATE_LIMIT_SLOTS changed: start empty
+        self._map, self._fd = mmap.mmap(fd, size), fd
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if self._map is None:
+                self._open()
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        # Stable across processes, unlike hash(); never 0 (the empty marker)
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    def _find(self, key_hash: int, now: float, burst: float, rate: float) -> Tuple[int, float]:
+        """(slot, tokens available now) for a key; a key without a slot starts full."""
+        start = key_hash % self.slots
+        free, oldest, oldest_at = None, None, math.inf
+        for i in range(self.PROBE):
+            slot = (start + i) % self.slots
+            stored_hash, tokens, updated = self.SLOT.unpack_from(self._map, slot * self.SLOT.size)
+            if stored_hash == key_hash:
+                return slot, min(burst, tokens + max(now - updated, 0.0) * rate)
+            if stored_hash == 0:
+                if free is None:
+                    free = slot
+            elif updated < oldest_at:
+                oldest, oldest_at = slot, updated
+        return (free if free is not None else oldest), burst
+
+    def take(self, charges: List[Tuple[str, float, float, float]]) -> float:
+        """
+        Takes `cost` from each (key, cost, burst, per_second) bucket, or from
+        none of them. Returns 0 when taken, else the seconds until it could be.
+        """
+        now = time.time()
+        hashes = [self._hash(key) for key, _, _, _ in charges]
+        with self._locked():
+            found, wait = [], 0.0
+            for key_hash, (_, cost, burst, rate) in zip(hashes, charges):
+                cost = min(cost, burst)  # else it could never be admitted
+                slot, tokens = self._find(key_hash, now, burst, rate)
+                if tokens < cost:
+                    wait = max(wait, (cost - tokens) / rate)
+                found.append((slot, key_hash, tokens - cost))
+            if wait:
+                return wait
+            for slot, key_hash, tokens in found:
+                self.SLOT.pack_into(self._map, slot * self.SLOT.size, key_hash, tokens, now)
+        return 0.0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                os.close(self._fd)
+                self._map = self._fd = None
+
+buckets = SharedBuckets(settings.RATE_LIMIT_FILE, settings.RATE_LIMIT_SLOTS)
+
+# --- 2. WHO IS ASKING ---
+_TRUSTED_PROXIES = [ipaddress.ip_network(entry.strip(), strict=False)
+                    for entry in settings.RATE_LIMIT_TRUSTED_PROXIES.split(",") if entry.strip()]
+_token_users = TTLCache(maxsize=10_000, ttl=60)
+
+def _trusted(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _TRUSTED_PROXIES)
+
+def client_ip(scope) -> str:
+    """
+    The address a request's IP bucket is keyed on. From a trusted proxy, the
+    X-Forwarded-For hops are walked right to left past the trusted ones: the
+    first other hop was appended by a proxy, whatever the client sent before it.
+    """
+    client = scope.get("client")
+    host = client[0] if client else "unknown"
+    if not _TRUSTED_PROXIES or not _trusted(host):
+        return host
+    forwarded = b",".join(value for name, value in scope["headers"] if name == b"x-forwarded-for")
+    for hop in reversed(forwarded.decode("latin-1").split(",")):
+        hop = hop.strip()
+        if not hop:
+            continue
+        host = hop
+        if not _trusted(hop):
+            break
+    return host
+
+def _user_id(authorization: str) -> Optional[int]:
+    """The user of a valid bearer token (signature and expiry checked), else None."""
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    user_id = _token_users.get(token)
+    if user_id is None:
+        try:
+            user_id = int(jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM])["sub"])
+        except (JWTError, KeyError, TypeError, ValueError):
+            return None
+        _token_users.set(token, user_id)
+    return user_id
+
+# --- 3. MIDDLEWARE ---
+class AdmissionMiddleware:
+    def __init__(self, app, store: SharedBuckets = None):
+        self.app = app
+        self.store = store or buckets
+        self.in_flight: Dict[str, int] = {}
+
+    async def _reject(self, scope, receive, send, status_code: int, retry_after: float, rule: Rule) -> None:
+        reason = "rate_limited" if status_code == 429 else "over_capacity"
+        metrics.admission_rejected.inc((reason, rule.name))
+        detail = "Too many requests" if status_code == 429 else "Server busy, try again shortly"
+        response = responses.ORJSONResponse(
+            {"detail": detail}, status_code=status_code, headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+        await response(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        rule = rule_for(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if rule is None or not settings.RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        # Shed first: a request refused for capacity must not spend tokens
+        if rule.max_concurrency is not None and self.in_flight.get(rule.name, 0) >= rule.max_concurrency:
+            await self._reject(scope, receive, send, 503, 1, rule)
+            return
+
+        charges = [(f"ip:{client_ip(scope)}", rule.cost,
+                    settings.RATE_LIMIT_IP_BURST, settings.RATE_LIMIT_IP_PER_SECOND)]
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                user_id = _user_id(value.decode("latin-1"))
+                if user_id is not None:
+                    charges.append((f"user:{user_id}", rule.cost,
+                                    settings.RATE_LIMIT_USER_BURST, settings.RATE_LIMIT_USER_PER_SECOND))
+                break
+        wait = self.store.take(charges)
+        if wait:
+            await self._reject(scope, receive, send, 429, wait, rule)
+            return
+
+        if rule.max_concurrency is None:
+            await self.app(scope, receive, send)
+            return
+        self.in_flight[rule.name] = self.in_flight.get(rule.name, 0) + 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight[rule.name] -= 1
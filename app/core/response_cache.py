@@ -0,0 +1,136 @@
+# app/core/response_cache.py
+"""
+In-process cache of serialized GET responses, with strong ETags.
+
+- Entries are keyed by route + the endpoint's parsed (normalized) parameters,
+  so ?limit=20&city=Harare and ?city=Harare&limit=20 share one entry.
+- Each entry carries tags (e.g. "property:7", "properties:owner:1"); writers
+  invalidate exactly the tags they touched.
+- Bounded by the total size of the cached bodies, evicting least recently used.
+- Clients revalidate with If-None-Match and get a bodyless 304 when unchanged.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, NamedTuple, Optional, Set
+from fastapi import Request, Response
+from app.core import metrics
+from app.core.config import settings
+
+# Shared caches may store the response but must revalidate it (cheap with the ETag)
+CACHE_CONTROL = "public, no-cache"
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+    media_type: str
+    tags: frozenset
+    expires: float
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def make_key(route: str, **params) -> tuple:
+    """Unset (None) parameters are dropped, so defaults and omissions share a key."""
+    return (route,) + tuple(sorted((name, value) for name, value in params.items() if value is not None))
+
+class ResponseCache:
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # Bumped by every invalidation; a response computed while it moved may be stale
+        self.generation = 0
+        self._data: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._by_tag: Dict[str, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry.expires < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, body: bytes, tags: Iterable[str], generation: int,
+            headers: Optional[Dict[str, str]] = None, media_type: str = "application/json") -> CachedResponse:
+        """
+        Stores a freshly rendered response. `generation` is the value read before
+        the data was loaded: if anything was invalidated since, the response is
+        returned but not cached, so a racing write can never be masked.
+        """
+        entry = CachedResponse(body, make_etag(body), dict(headers or {}), media_type,
+                               frozenset(tags), time.monotonic() + self.ttl)
+        if len(body) > self.max_bytes // 4:
+            return entry
+        with self._lock:
+            if generation != self.generation:
+                return entry
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = entry
+            self.size += len(body)
+            for tag in entry.tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._data)))
+        return entry
+
+    def invalidate(self, *tags: str) -> None:
+        with self._lock:
+            self.generation += 1
+            for tag in tags:
+                for key in self._by_tag.pop(tag, ()):
+                    if key in self._data:
+                        self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+            self._by_tag.clear()
+            self.size = 0
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._data.pop(key)
+        self.size -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+cache = ResponseCache(settings.RESPONSE_CACHE_MAX_BYTES, settings.RESPONSE_CACHE_TTL_SECONDS)
+
+metrics.register_gauge("response_cache_bytes", "Size of the cached response bodies", lambda: cache.size)
+metrics.register_gauge("response_cache_entries", "Responses currently cached", lambda: len(cache))
+metrics.register_gauge(
+    "response_cache_hit_ratio", "Share of cacheable GETs answered from the response cache",
+    lambda: cache.hits / ((cache.hits + cache.misses) or 1),
+)
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison: W/"x" matches "x"
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+def respond(request: Request, entry: CachedResponse) -> Response:
+    headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type=entry.media_type, headers=headers)
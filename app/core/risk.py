@@ -0,0 +1,220 @@
+# app/core/risk.py
+"""
+Deterministic, rule-based listing risk score (0-100, lower is safer).
+
+Factors (points add up, capped at 100):
+- asking price vs. the median of the same suburb, listing status and type
+  (far below the median is the classic scam / hidden-defect signal)
+- ownership documents, water source and electricity supply
+- missing description
+
+Scores are computed for whole batches with NumPy and written back with one
+executemany UPDATE per chunk. Each row records the rule set that scored it
+(risk_version); rows with NULL or an older version are pending, so:
+
+- create_property / bulk import store a preliminary score (no price factor,
+  risk_version NULL) and the background job completes it
+- editing a risk input resets risk_version, so only changed rows are rescored
+- bumping RULES_VERSION rescores everything on the next run
+
+CLI:
+    python -m app.core.risk          # pending rows only
+    python -m app.core.risk --all    # everything (e.g. after suburb medians moved)
+"""
+import argparse
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from sqlalchemy import bindparam, event, inspect, or_, select, update
+from app.core import valuation
+from app.db import database, models
+
+logger = logging.getLogger(__name__)
+
+RULES_VERSION = 1
+CHUNK_SIZE = 5000
+BASE_RISK = 5
+
+# category -> (points, note); the last entry of each table is used for unknown values
+OWNERSHIP_RISK = {
+    "title_deed": (0, None),
+    "sectional_title": (5, "Sectional title: check body corporate levies and rules."),
+    "leasehold": (15, "Leasehold / council land: transfer needs council approval."),
+    "cession": (20, "Cession only: no title deed in the seller's name."),
+    "deceased_estate": (30, "Deceased estate: sale needs the executor's and Master's consent."),
+    None: (15, "Ownership documents not stated."),
+}
+WATER_RISK = {
+    "borehole": (0, None),
+    "both": (0, None),
+    "municipal": (5, "Municipal water only (supply is intermittent in many suburbs)."),
+    "none": (15, "No water connection."),
+    None: (5, "Water source not stated."),
+}
+ELECTRICITY_RISK = {
+    "good": (0, None),
+    "solar": (0, None),
+    "intermittent": (8, "Intermittent electricity supply."),
+    "none": (15, "No electricity connection."),
+    None: (5, "Electricity supply not stated."),
+}
+# (upper bound of price / suburb median, points, note), checked in order
+PRICE_BANDS = (
+    (0.5, 35, "Asking price is under half the suburb median: possible scam or undisclosed defect."),
+    (0.75, 15, "Priced well below the suburb median."),
+    (2.0, 0, None),
+    (np.inf, 10, "Priced at more than twice the suburb median."),
+)
+MISSING_DESCRIPTION = (5, "No description provided.")
+
+RISK_INPUTS = ("price", "suburb", "listing_status", "property_type", "ownership_status",
+               "water_source", "electricity_status", "description")
+
+def _normalize(value) -> Optional[str]:
+    if value is None or not str(value).strip():
+        return None
+    return str(value).strip().lower().replace(" ", "_").replace("-", "_")
+
+def _categorical(values: List, table: dict):
+    """-> (points array, note array) for one categorical factor."""
+    categories = [key for key in table if key is not None]
+    index = {key: i for i, key in enumerate(categories)}
+    points = np.array([table[key][0] for key in categories] + [table[None][0]])
+    notes = np.array([table[key][1] for key in categories] + [table[None][1]], dtype=object)
+    codes = np.fromiter((index.get(_normalize(v), -1) for v in values), dtype=np.int64, count=len(values))
+    return points[codes], notes[codes]  # code -1 picks the trailing "unknown" entry
+
+def score(rows: List[dict], medians: Optional[Dict[tuple, float]] = None):
+    """
+    Scores a batch of rows (dicts with RISK_INPUTS). Returns (scores, notes, priced)
+    where priced[i] tells whether the price factor could be applied.
+    """
+    n = len(rows)
+    totals = np.full(n, BASE_RISK, dtype=np.int64)
+    factor_notes = []
+    for column, table in (("ownership_status", OWNERSHIP_RISK), ("water_source", WATER_RISK), ("electricity_status", ELECTRICITY_RISK)):
+        points, notes = _categorical([row.get(column) for row in rows], table)
+        totals += points
+        factor_notes.append(notes)
+
+    # Price vs. suburb median (same listing status and type)
+    price = np.array([row.get("price") or 0.0 for row in rows], dtype=np.float64)
+    median = np.array([
+        (medians or {}).get((row.get("suburb"), row.get("listing_status"), row.get("property_type")), np.nan)
+        for row in rows
+    ], dtype=np.float64)
+    priced = (median > 0) & (price > 0)
+    ratio = np.divide(price, median, out=np.full(n, np.nan), where=priced)
+    band = np.searchsorted(np.array([bound for bound, _, _ in PRICE_BANDS]), ratio)
+    band_points = np.array([points for _, points, _ in PRICE_BANDS] + [0])
+    band_notes = np.array([note for _, _, note in PRICE_BANDS] + [None], dtype=object)
+    band = np.where(priced, band, len(PRICE_BANDS))  # unpriced rows -> the neutral extra entry
+    totals += band_points[band]
+    factor_notes.append(band_notes[band])
+
+    undescribed = np.fromiter((not (row.get("description") or "").strip() for row in rows), dtype=bool, count=n)
+    totals += np.where(undescribed, MISSING_DESCRIPTION[0], 0)
+    factor_notes.append(np.where(undescribed, MISSING_DESCRIPTION[1], None))
+
+    scores = np.clip(totals, 0, 100)
+    notes = []
+    for i in range(n):
+        reasons = [column[i] for column in factor_notes if column[i]]
+        notes.append(" ".join(reasons) if reasons else "Low risk. No issues found.")
+    return scores, notes, priced
+
+def apply(rows: List[dict], medians: Optional[Dict[tuple, float]] = None, final: bool = False) -> None:
+    """
+    Sets risk_score / risk_notes / risk_version on each row in place. Unless
+    `final`, rows the price factor could not be applied to stay pending.
+    """
+    scores, notes, priced = score(rows, medians)
+    for row, value, note, has_price in zip(rows, scores.tolist(), notes, priced.tolist()):
+        row["risk_score"] = value
+        row["risk_notes"] = note
+        row["risk_version"] = RULES_VERSION if (final or has_price) else None
+
+# --- 1. KEEP CHANGED ROWS PENDING ---
+@event.listens_for(models.Property, "before_update")
+def _reset_risk_version(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in RISK_INPUTS):
+        target.risk_version = None
+
+# --- 2. BATCH JOB ---
+_COLUMNS = [getattr(models.Property, name) for name in ("id",) + RISK_INPUTS]
+
+def rescore(bind=None, full: bool = False, chunk_size: int = CHUNK_SIZE,
+            on_chunk: Optional[Callable[[List[int]], None]] = None) -> dict:
+    """Rescores pending rows (or all rows with full=True), one transaction per chunk."""
+    started = time.perf_counter()
+    bind = bind or database.engine
+    medians = valuation.engine.median_prices()
+    table = models.Property.__table__
+    stmt_update = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        # updated_at kept: a new score is not a modification (export --modified-since, the change feed)
+        .values(risk_score=bindparam("b_score"), risk_notes=bindparam("b_notes"), risk_version=bindparam("b_version"),
+                updated_at=table.c.updated_at)
+    )
+    version = models.Property.risk_version
+
+    last_id, scored = 0, 0
+    while True:
+        stmt = select(*_COLUMNS).where(models.Property.id > last_id).order_by(models.Property.id).limit(chunk_size)
+        if not full:
+            stmt = stmt.where(or_(version.is_(None), version < RULES_VERSION))
+        with bind.begin() as connection:
+            rows = [dict(row) for row in connection.execute(stmt).mappings()]
+            if not rows:
+                break
+            apply(rows, medians, final=True)
+            connection.execute(stmt_update, [
+                {"b_id": row["id"], "b_score": row["risk_score"], "b_notes": row["risk_notes"], "b_version": row["risk_version"]}
+                for row in rows
+            ])
+        last_id = rows[-1]["id"]
+        scored += len(rows)
+        if on_chunk is not None:
+            on_chunk([row["id"] for row in rows])
+
+    seconds = time.perf_counter() - started
+    return {"scored": scored, "seconds": round(seconds, 3), "rows_per_second": int(scored / seconds) if seconds else None}
+
+_job_lock = threading.Lock()
+_rerun = False
+
+def rescore_pending_in_background(on_chunk: Optional[Callable[[List[int]], None]] = None) -> None:
+    """
+    Entry point for BackgroundTasks. One job runs at a time; a call arriving
+    during a run makes that run do one more pass instead of starting another.
+    The flag is checked again after the lock is released, so a call arriving
+    just as the run finishes is not lost.
+    """
+    global _rerun
+    _rerun = True
+    while _rerun and _job_lock.acquire(blocking=False):
+        try:
+            while _rerun:
+                _rerun = False
+                result = rescore(on_chunk=on_chunk)
+                if result["scored"]:
+                    logger.info("Risk rescoring: %d listings in %.2fs", result["scored"], result["seconds"])
+        except Exception:
+            logger.exception("Risk rescoring failed")
+        finally:
+            _job_lock.release()
+
+# --- 3. CLI ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute listing risk scores")
+    parser.add_argument("--all", action="store_true", help="Rescore every listing, not only pending ones")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    print("🧮 Scoring listings...")
+    result = rescore(full=args.all, chunk_size=args.chunk_size)
+    print(f"✅ Scored {result['scored']} listings ({result['rows_per_second']} rows/s)")
@@ -0,0 +1,181 @@
+# app/core/search_parser.py
+"""
+Local rule-based parser for natural language property searches.
+Handles the common shapes ("3 bed house in Avondale under 100k") without
+calling the LLM, and reports how much of the query it understood.
+"""
+import difflib
+import re
+from typing import Dict, List, Optional, Tuple
+
+# --- 1. GAZETTEER (suburb -> city) ---
+# Suburbs that exist in more than one city map to None so we don't guess the city.
+SUBURBS: Dict[str, Optional[str]] = {
+    # Harare
+    "Alexandra Park": "Harare", "Avondale": "Harare", "Ballantyne Park": "Harare",
+    "Belgravia": "Harare", "Belvedere": "Harare", "Bluff Hill": "Harare",
+    "Borrowdale": "Harare", "Borrowdale Brooke": "Harare", "Borrowdale West": "Harare",
+    "Budiriro": "Harare", "Carrick Creagh": "Harare", "Chisipite": "Harare",
+    "Colne Valley": "Harare", "Dzivarasekwa": "Harare", "Eastlea": "Harare",
+    "Emerald Hill": "Harare", "Glen Lorne": "Harare", "Glen View": "Harare",
+    "Greendale": "Harare", "Greystone Park": "Harare", "Gun Hill": "Harare",
+    "Hatfield": "Harare", "Highfield": "Harare", "Highlands": "Harare",
+    "Kambuzuma": "Harare", "Kuwadzana": "Harare", "Mabelreign": "Harare",
+    "Mabvuku": "Harare", "Madokero": "Harare", "Mandara": "Harare",
+    "Marimba Park": "Harare", "Marlborough": "Harare", "Mbare": "Harare",
+    "Milton Park": "Harare", "Mount Pleasant": "Harare", "Msasa": "Harare",
+    "Mufakose": "Harare", "Pomona": "Harare", "Southerton": "Harare",
+    "Stoneridge": "Harare", "Strathaven": "Harare", "Tynwald": "Harare",
+    "Vainona": "Harare", "Warren Park": "Harare", "Waterfalls": "Harare",
+    "Westgate": "Harare",
+    # Bulawayo
+    "Bradfield": "Bulawayo", "Burnside": "Bulawayo", "Entumbane": "Bulawayo",
+    "Famona": "Bulawayo", "Ilanda": "Bulawayo", "Khumalo": "Bulawayo",
+    "Lobengula": "Bulawayo", "Matsheumhlope": "Bulawayo", "Morningside": "Bulawayo",
+    "Nkulumane": "Bulawayo", "Parklands": "Bulawayo", "Pumula": "Bulawayo",
+    "Sauerstown": "Bulawayo", "Selborne Park": "Bulawayo",
+    # Mutare
+    "Dangamvura": "Mutare", "Fairbridge Park": "Mutare", "Murambi": "Mutare",
+    "Palmerstone": "Mutare", "Sakubva": "Mutare",
+    # Gweru
+    "Ascot": "Gweru", "Mkoba": "Gweru", "Senga": "Gweru", "Windsor Park": "Gweru",
+    # Both Harare and Bulawayo
+    "Hillside": None,
+}
+
+CITIES: List[str] = [
+    "Harare", "Bulawayo", "Chitungwiza", "Mutare", "Gweru", "Kwekwe", "Kadoma",
+    "Masvingo", "Chinhoyi", "Marondera", "Norton", "Ruwa", "Victoria Falls",
+    "Kariba", "Bindura", "Beitbridge", "Hwange", "Epworth", "Domboshava",
+]
+
+PROPERTY_TYPES: Dict[str, str] = {
+    "house": "House", "houses": "House", "home": "House", "homes": "House",
+    "cottage": "House", "townhouse": "House", "mansion": "House",
+    "flat": "Flat", "flats": "Flat", "apartment": "Flat", "apartments": "Flat",
+    "commercial": "Commercial", "office": "Commercial", "offices": "Commercial",
+    "shop": "Commercial", "warehouse": "Commercial",
+    "land": "Land", "stand": "Land", "stands": "Land", "plot": "Land", "plots": "Land",
+}
+
+NUMBER_WORDS: Dict[str, int] = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+
+# Words that carry no filter but shouldn't lower the confidence
+STOPWORDS = {
+    "a", "an", "the", "in", "at", "on", "of", "for", "with", "and", "or", "to",
+    "i", "want", "need", "looking", "find", "me", "show", "any", "some",
+    "sale", "rent", "buy", "cheap", "nice", "good", "property", "properties",
+    "near", "around", "area", "usd", "us", "dollars", "price", "budget",
+}
+
+_GAZETTEER: Dict[str, Tuple[str, str]] = {}
+for _name in SUBURBS:
+    _GAZETTEER[_name.lower()] = ("suburb", _name)
+for _name in CITIES:
+    _GAZETTEER[_name.lower()] = ("city", _name)
+_SINGLE_WORD_PLACES = [name for name in _GAZETTEER if " " not in name]
+
+# --- 2. PATTERNS ---
+_AMOUNT = r"\$?\s*(\d+(?:[.,]\d+)*)\s*(k|m|thousand|million)?"
+_BETWEEN_RE = re.compile(rf"\b(?:between|from)\s+{_AMOUNT}\s+(?:and|to|-)\s+{_AMOUNT}")
+_RANGE_RE = re.compile(rf"{_AMOUNT}\s*-\s*{_AMOUNT}(?!\s*-?\s*(?:bed|br))")
+_MAX_RE = re.compile(rf"\b(?:under|below|less than|max|maximum|up to|upto|within|<)\s*{_AMOUNT}")
+_MIN_RE = re.compile(rf"\b(?:over|above|more than|min|minimum|at least|from|>)\s*{_AMOUNT}")
+_BED_RE = re.compile(r"\b(\d+|" + "|".join(NUMBER_WORDS) + r")\s*-?\s*(?:bed|beds|bedroom|bedrooms|bedroomed|br|bdr)\b")
+_TOKEN_RE = re.compile(r"[a-z0-9$]+")
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation noise, collapse spaces. Used as the cache key."""
+    query = query.lower().replace("’", "'")
+    query = re.sub(r"[^a-z0-9$.,\-<> ]+", " ", query)
+    return re.sub(r"\s+", " ", query).strip(" .,")
+
+def _to_amount(number: str, suffix: Optional[str]) -> int:
+    value = float(number.replace(",", ""))
+    if suffix in ("k", "thousand"):
+        value *= 1_000
+    elif suffix in ("m", "million"):
+        value *= 1_000_000
+    return int(value)
+
+# --- 3. PARSER ---
+def parse_query(query: str) -> Tuple[dict, float]:
+    """
+    Returns (filters, confidence). Filters use the same keys as the LLM output
+    (min_price, max_price, bedrooms, suburb, city, property_type); confidence is
+    the share of meaningful words the rules understood (0.0 - 1.0).
+    """
+    filters = {
+        "min_price": None, "max_price": None, "bedrooms": None,
+        "suburb": None, "city": None, "property_type": None,
+    }
+    text = normalize_query(query)
+    if not text:
+        return filters, 0.0
+
+    # Cut out every recognised span so only unexplained words remain
+    def consume(match: re.Match) -> str:
+        nonlocal text
+        text = text[:match.start()] + " " + text[match.end():]
+        return match.group(0)
+
+    match = _BETWEEN_RE.search(text) or _RANGE_RE.search(text)
+    if match:
+        filters["min_price"] = _to_amount(match.group(1), match.group(2))
+        filters["max_price"] = _to_amount(match.group(3), match.group(4))
+        consume(match)
+    else:
+        match = _MAX_RE.search(text)
+        if match:
+            filters["max_price"] = _to_amount(match.group(1), match.group(2))
+            consume(match)
+        match = _MIN_RE.search(text)
+        if match:
+            filters["min_price"] = _to_amount(match.group(1), match.group(2))
+            consume(match)
+
+    match = _BED_RE.search(text)
+    if match:
+        count = match.group(1)
+        filters["bedrooms"] = NUMBER_WORDS.get(count) or int(count)
+        consume(match)
+
+    tokens = _TOKEN_RE.findall(text)
+    understood = [False] * len(tokens)
+
+    # Places: try 3-, 2- then 1-word windows, exact first, fuzzy for single words
+    for size in (3, 2, 1):
+        for start in range(len(tokens) - size + 1):
+            if any(understood[start:start + size]):
+                continue
+            phrase = " ".join(tokens[start:start + size])
+            place = _GAZETTEER.get(phrase)
+            if place is None and size == 1 and len(phrase) >= 4 and phrase not in STOPWORDS and phrase not in PROPERTY_TYPES:
+                close = difflib.get_close_matches(phrase, _SINGLE_WORD_PLACES, n=1, cutoff=0.85)
+                place = _GAZETTEER[close[0]] if close else None
+            if place is None or filters[place[0]] not in (None, place[1]):
+                continue
+            kind, name = place
+            filters[kind] = name
+            if kind == "suburb" and filters["city"] is None:
+                filters["city"] = SUBURBS.get(name)
+            for i in range(start, start + size):
+                understood[i] = True
+
+    for i, token in enumerate(tokens):
+        if understood[i]:
+            continue
+        if token in PROPERTY_TYPES and filters["property_type"] is None:
+            filters["property_type"] = PROPERTY_TYPES[token]
+            understood[i] = True
+        elif token in STOPWORDS or token in PROPERTY_TYPES:
+            understood[i] = True
+
+    found = sum(value is not None for value in filters.values())
+    if found == 0:
+        return filters, 0.0
+    unknown = understood.count(False)
+    return filters, found / (found + unknown)
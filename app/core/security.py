@@ -1,7 +1,10 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import jwt
 from passlib.context import CryptContext
+from app.core.config import settings
 
 # --- PERMANENT SECRET KEY ---
 # We use a fixed string so the key never changes, even if the server restarts.
@@ -17,6 +20,22 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+# --- BCRYPT OFF THE REQUEST PATH ---
+# bcrypt releases the GIL, so a thread pool gives real parallelism; its size is the
+# cap on simultaneous hashes (extra logins queue here instead of starving other routes)
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.BCRYPT_MAX_CONCURRENCY,
+    thread_name_prefix="bcrypt",
+)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
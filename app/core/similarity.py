@@ -0,0 +1,485 @@
+# app/core/similarity.py
+"""
+"Homes like this one" behind /properties/{id}/similar.
+
+Every listing is one float32 row of a feature matrix:
+
+- numbers: log price, bedrooms, bathrooms and log land size, standardized
+  with the mean / spread of the last full build
+- title + description: hashed TF-IDF (words hashed into TEXT_DIMS signed
+  buckets, IDF from the last full build), scaled to unit length
+- suburb and property type, one-hot; stored as their codes, since a one-hot
+  dot product is just "same suburb?" and the matrix stays half as wide
+
+Each block is scaled so a complete mismatch adds its weight to the squared
+distance. Neighbours are the nearest rows with the same listing status; with
+every row's squared norm stored, |q - x|² = |q|² + |x|² - 2·q·x, so ranking
+all listings is one matrix-vector product plus two code comparisons.
+
+The matrix is a .npy file opened with np.memmap: workers share one copy in
+the page cache and a restart maps it instead of re-encoding every listing.
+Writes land in a small in-memory delta (ids above the last one seen, plus
+ids the API reports as changed) that is searched alongside the file; once
+it outgrows SIMILARITY_MAX_DELTA rows it is merged into a new file
+generation, which other workers switch to on their next refresh. Only the
+full build (no index yet, FEATURE_VERSION changed, or every
+SIMILARITY_REBUILD_SECONDS) reads every listing.
+
+One thread refreshes at a time, off to the side: the others keep searching
+the current view instead of waiting for it. A request only applies the
+delta; the full build and the compaction run in a background thread, as
+does the first load, which the app starts at boot. Until it is done,
+similar() raises IndexNotReady (the endpoint answers 503 with Retry-After).
+A failed refresh is logged and the current view served. The previous file
+generation is kept, since other workers may still be switching from it.
+
+Rebuild from scratch:
+    python -m app.core.similarity
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import select
+from app.core.config import settings
+from app.db import database, models
+
+logger = logging.getLogger(__name__)
+
+FEATURE_VERSION = 1
+TEXT_DIMS = 64
+# Squared distance added by a complete mismatch in each block
+WEIGHTS = {"numeric": 1.0, "text": 1.0, "suburb": 1.0, "property_type": 1.5}
+
+_NUMERIC = 4  # log price, bedrooms, bathrooms, log land size
+DIMS = _NUMERIC + TEXT_DIMS
+STATUS, SUBURB, PROPERTY_TYPE = range(3)  # rows of the codes array
+
+_COLUMNS = (
+    models.Property.id, models.Property.price, models.Property.bedrooms, models.Property.bathrooms,
+    models.Property.land_size, models.Property.suburb, models.Property.property_type,
+    models.Property.listing_status, models.Property.title, models.Property.description,
+)
+_IN_CHUNK = 500  # ids per IN (...) when reloading changed rows
+_ENCODE_CHUNK = 10_000
+_MISS_REFRESH_SECONDS = 1.0  # an unknown id triggers at most one refresh this often
+_WORD = re.compile(r"[a-z0-9]{2,}")
+
+# --- 1. FEATURES ---
+def _tokens(title: Optional[str], description: Optional[str]) -> Counter:
+    return Counter(_WORD.findall(f"{title or ''} {description or ''}".lower()))
+
+_buckets: Dict[str, Tuple[int, float]] = {}
+
+def _bucket(word: str) -> Tuple[int, float]:
+    """Stable across processes (unlike hash()): crc32 picks the bucket and the sign."""
+    found = _buckets.get(word)
+    if found is None:
+        h = zlib.crc32(word.encode())
+        found = _buckets[word] = (h % TEXT_DIMS, 1.0 if h & 0x80000000 else -1.0)
+    return found
+
+def _numeric(rows) -> np.ndarray:
+    if not rows:
+        return np.zeros((0, _NUMERIC))
+    price, bedrooms, bathrooms, land_size = (
+        np.array([v or 0 for v in column], dtype=np.float64) for column in list(zip(*rows))[1:5]
+    )
+    return np.column_stack([np.log1p(np.maximum(price, 0)), bedrooms, bathrooms, np.log1p(np.maximum(land_size, 0))])
+
+class _Encoder:
+    """Listing rows -> feature vectors and codes. Its state is saved with each file generation."""
+    def __init__(self, mean, std, idf, vocabularies: List[Dict[str, int]]):
+        self.mean, self.std, self.idf = np.asarray(mean), np.asarray(std), np.asarray(idf)
+        self.vocabularies = vocabularies  # listing_status, suburb, property_type -> code
+
+    @classmethod
+    def fit(cls, rows: list) -> "_Encoder":
+        numeric = _numeric(rows)
+        std = numeric.std(axis=0) if len(rows) else np.ones(_NUMERIC)
+        df = np.zeros(TEXT_DIMS)
+        for row in rows:
+            df[list({_bucket(word)[0] for word in _tokens(row[8], row[9])})] += 1
+        idf = np.log((1 + len(rows)) / (1 + df)) + 1
+        mean = numeric.mean(axis=0) if len(rows) else np.zeros(_NUMERIC)
+        return cls(mean, np.where(std > 0, std, 1.0), idf, [{}, {}, {}])
+
+    @classmethod
+    def from_meta(cls, meta: dict) -> "_Encoder":
+        return cls(meta["mean"], meta["std"], meta["idf"], meta["vocabularies"])
+
+    def to_meta(self) -> dict:
+        return {"mean": self.mean.tolist(), "std": self.std.tolist(), "idf": self.idf.tolist(), "vocabularies": self.vocabularies}
+
+    def encode(self, rows: list) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """-> (ids, vectors, codes)"""
+        n = len(rows)
+        vectors = np.zeros((n, DIMS), dtype=np.float32)
+        # ~2 standard deviations apart on every number counts as a complete mismatch
+        z = np.clip((_numeric(rows) - self.mean) / self.std, -4, 4)
+        vectors[:, :_NUMERIC] = z * (np.sqrt(WEIGHTS["numeric"] / _NUMERIC) / 2)
+
+        text_scale = np.sqrt(WEIGHTS["text"] / 2)
+        ids = np.empty(n, dtype=np.int64)
+        codes = np.empty((3, n), dtype=np.int32)
+        status, suburb, ptype = self.vocabularies
+        for i, row in enumerate(rows):
+            ids[i] = row[0]
+            codes[:, i] = (status.setdefault(row[7], len(status)), suburb.setdefault(row[5], len(suburb)),
+                           ptype.setdefault(row[6], len(ptype)))
+            text = np.zeros(TEXT_DIMS)
+            for word, count in _tokens(row[8], row[9]).items():
+                bucket, sign = _bucket(word)
+                text[bucket] += sign * (1 + np.log(count))
+            text *= self.idf
+            norm = np.linalg.norm(text)
+            if norm > 0:
+                vectors[i, _NUMERIC:] = text * (text_scale / norm)
+        return ids, vectors, codes
+
+# --- 2. STORAGE ---
+class _Block:
+    """Listings in id order: ids, feature vectors, squared norms, codes and a live mask."""
+    __slots__ = ("ids", "vectors", "sqnorm", "codes", "valid")
+
+    def __init__(self, ids, vectors, codes, sqnorm=None, valid=None):
+        self.ids, self.vectors, self.codes = ids, vectors, codes
+        self.sqnorm = np.einsum("ij,ij->i", vectors, vectors) if sqnorm is None else sqnorm
+        self.valid = np.ones(len(ids), dtype=bool) if valid is None else valid
+
+    @classmethod
+    def from_rows(cls, entries: Dict[int, tuple]) -> "_Block":
+        """{id: (vector, codes)} -> block"""
+        order = sorted(entries)
+        vectors = np.array([entries[pid][0] for pid in order], dtype=np.float32).reshape(len(order), DIMS)
+        codes = np.array([entries[pid][1] for pid in order], dtype=np.int32).reshape(len(order), 3).T.copy()
+        return cls(np.array(order, dtype=np.int64), vectors, codes)
+
+    def find(self, property_id: int) -> int:
+        """-> position of a live row, or -1"""
+        i = int(np.searchsorted(self.ids, property_id))
+        return i if i < len(self.ids) and self.ids[i] == property_id and self.valid[i] else -1
+
+# <dir>/current.json names the live generation; a generation is
+# <gen>.vectors.npy (memory-mapped) + <gen>.rows.npz (ids, codes, norms)
+def _load_generation(directory: Path, meta: dict) -> _Block:
+    vectors = np.load(directory / f"{meta['generation']}.vectors.npy", mmap_mode="r")
+    with np.load(directory / f"{meta['generation']}.rows.npz") as rows:
+        return _Block(rows["ids"], vectors, rows["codes"], sqnorm=rows["sqnorm"])
+
+def _read_meta(directory: Path) -> Optional[dict]:
+    try:
+        return json.loads((directory / "current.json").read_text())
+    except (OSError, ValueError):
+        return None
+
+def _write_generation(directory: Path, encoder: _Encoder, parts: Iterable[tuple], rows: int, source: str, built_at: float) -> dict:
+    """parts: (ids, vectors, codes) chunks in id order. Readers only see the new files once current.json points at them."""
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"{time.time_ns()}-{os.getpid()}"
+    vectors = np.lib.format.open_memmap(directory / f"{name}.vectors.npy", mode="w+", dtype=np.float32, shape=(rows, DIMS))
+    ids, codes = np.empty(rows, dtype=np.int64), np.empty((3, rows), dtype=np.int32)
+    at = 0
+    for part_ids, part_vectors, part_codes in parts:
+        end = at + len(part_ids)
+        ids[at:end], vectors[at:end], codes[:, at:end] = part_ids, part_vectors, part_codes
+        at = end
+    sqnorm = np.einsum("ij,ij->i", vectors, vectors)
+    vectors.flush()
+    del vectors
+    np.savez(directory / f"{name}.rows.npz", ids=ids, codes=codes, sqnorm=sqnorm)
+
+    meta = {"generation": name, "version": FEATURE_VERSION, "dims": DIMS, "rows": rows, "source": source,
+            "built_at": built_at, **encoder.to_meta()}
+    tmp = directory / f"current.json.{name}"
+    tmp.write_text(json.dumps(meta))
+    os.replace(tmp, directory / "current.json")
+    _remove_old_generations(directory)
+    return meta
+
+def _generation_order(name: str) -> int:
+    try:
+        return int(name.split("-")[0])  # time_ns of the write
+    except ValueError:
+        return 0
+
+def _remove_old_generations(directory: Path, keep: int = 2) -> None:
+    """
+    Deletes all but the newest `keep` generations. The previous one stays for
+    the workers that read current.json just before the switch and are about
+    to open it; those still mapping older files keep them alive (POSIX).
+    A file that can't be deleted yet is retried next time.
+    """
+    paths = list(directory.glob("*.*.np[yz]"))
+    generations = sorted({path.name.split(".")[0] for path in paths}, key=_generation_order)
+    stale = set(generations[:-keep]) if keep else set(generations)
+    for path in paths:
+        if path.name.split(".")[0] in stale:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+# --- 3. INDEX ---
+class IndexNotReady(RuntimeError):
+    """The first load is still running (warm())."""
+
+class _View:
+    """What readers search: a file generation (minus superseded rows) plus the in-memory delta."""
+    __slots__ = ("generation", "base", "delta", "max_id")
+
+    def __init__(self, generation: str, base: _Block, delta: _Block, max_id: int):
+        self.generation, self.base, self.delta, self.max_id = generation, base, delta, max_id
+
+    def row(self, property_id: int) -> Optional[tuple]:
+        """-> (vector, codes) of a live listing, or None"""
+        for block in (self.delta, self.base):
+            i = block.find(property_id)
+            if i >= 0:
+                return np.asarray(block.vectors[i]), block.codes[:, i]
+        return None
+
+class SimilarityIndex:
+    def __init__(self, directory, bind=None, refresh_seconds: float = 30.0, rebuild_seconds: float = 86400.0, max_delta: int = 5000):
+        self.directory = Path(directory)
+        self._bind = bind
+        self.refresh_seconds = refresh_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self.max_delta = max_delta
+        self._lock = threading.Lock()  # guards _changed / _stale; held for moments only
+        self._refreshing = threading.Lock()  # one refresh at a time; readers never wait for it
+        self._background: Optional[threading.Thread] = None  # first load, full builds and compactions
+        self._view: Optional[_View] = None
+        self._meta: Optional[dict] = None
+        self._encoder: Optional[_Encoder] = None
+        self._delta: Dict[int, Optional[tuple]] = {}  # id -> (vector, codes), or None once deleted
+        self._changed: set = set()
+        self._stale = True
+        self._checked_at = 0.0
+        self._missed_at = -_MISS_REFRESH_SECONDS
+
+    # --- MAINTENANCE ---
+    def mark_changed(self, property_ids: Iterable[int] = ()) -> None:
+        """Called after commits: changed ids are re-encoded, new ids are picked up by id range."""
+        with self._lock:
+            self._changed.update(pid for pid in property_ids if pid is not None)
+            self._stale = True
+
+    def refresh(self, force: bool = False, wait: bool = False) -> None:
+        """
+        Brings the index up to date when it is stale or due. If another thread
+        is already refreshing, returns at once (the caller searches the current
+        view). Only force or wait do everything here, waiting for the other
+        thread first; otherwise a due full build or compaction, or the first
+        load, is handed to the background thread.
+        """
+        now = time.monotonic()
+        inline = not (force or wait)
+        if inline and (self._view is None or (not self._stale and now - self._checked_at <= self.refresh_seconds)):
+            return
+        if not self._refreshing.acquire(blocking=not inline):
+            return
+        try:
+            with self._lock:
+                changed, self._changed, self._stale = self._changed, set(), False
+            try:
+                meta = _read_meta(self.directory)
+                if force or self._build_due(meta):
+                    if inline:
+                        self._in_background()
+                        meta = self._meta  # meanwhile, keep the current generation up to date
+                    else:
+                        meta = self._build()
+                if self._view is None or self._view.generation != meta["generation"]:
+                    self._load(meta, changed)  # first use, or another worker wrote a new generation
+                else:
+                    self._apply_changes(changed)
+                if len(self._delta) > self.max_delta:
+                    if inline:
+                        self._in_background()
+                    else:
+                        self._compact()
+            except Exception:
+                with self._lock:  # try these again next time
+                    self._changed |= changed
+                    self._stale = True
+                if not inline:
+                    raise
+                logger.exception("Refreshing the similarity index failed, serving the current view")
+                return
+            self._checked_at = now
+        finally:
+            self._refreshing.release()
+
+    def _build_due(self, meta: Optional[dict]) -> bool:
+        return meta is None or (meta.get("version"), meta.get("dims"), meta.get("source")) != (FEATURE_VERSION, DIMS, self._source()) \
+            or time.time() - meta["built_at"] > self.rebuild_seconds
+
+    def warm(self) -> None:
+        """Loads (or builds) the index in a background thread, so no request waits for it."""
+        if self._view is None:
+            self._in_background()
+
+    def _in_background(self) -> None:
+        """Runs refresh(wait=True) in the background thread, unless it is running already."""
+        with self._lock:
+            if self._background is not None and self._background.is_alive():
+                return
+            self._background = threading.Thread(target=self._refresh_in_background, name="similarity-refresh", daemon=True)
+            self._background.start()
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.refresh(wait=True)
+        except Exception:
+            logger.exception("Refreshing the similarity index in the background failed")
+
+    def _connect(self):
+        return (self._bind or database.read_engine).connect()
+
+    def _source(self) -> str:
+        # An index built from another database (e.g. a benchmark copy) is never reused
+        return (self._bind or database.read_engine).url.render_as_string(hide_password=True)
+
+    def _rows(self, connection, where=None) -> list:
+        stmt = select(*_COLUMNS).order_by(models.Property.id)
+        if where is not None:
+            stmt = stmt.where(where)
+        return connection.execute(stmt).all()
+
+    def _build(self) -> dict:
+        started = time.perf_counter()
+        with self._connect() as connection:
+            rows = self._rows(connection)
+        encoder = _Encoder.fit(rows)
+        parts = (encoder.encode(rows[i:i + _ENCODE_CHUNK]) for i in range(0, len(rows), _ENCODE_CHUNK))
+        meta = _write_generation(self.directory, encoder, parts, len(rows), self._source(), built_at=time.time())
+        logger.info("Similarity index built: %d listings in %.0f ms", len(rows), (time.perf_counter() - started) * 1000)
+        return meta
+
+    # _load, _apply_changes and _compact run with _refreshing held; readers only see the _View they swap in
+    def _load(self, meta: dict, changed: Iterable[int] = ()) -> None:
+        """Maps a generation and re-reads what it may not contain yet (our own delta, newer ids)."""
+        base = _load_generation(self.directory, meta)
+        encoder = _Encoder.from_meta(meta)
+        changed = set(changed) | set(self._delta)
+        max_id = int(base.ids[-1]) if len(base.ids) else 0
+        view = _View(meta["generation"], base, _Block.from_rows({}), max_id)
+        self._meta, self._encoder, self._delta = meta, encoder, {}
+        self._apply_changes(changed, view)
+
+    def _apply_changes(self, changed: Iterable[int], view: Optional[_View] = None) -> None:
+        view = view or self._view
+        changed = sorted(changed)
+        with self._connect() as connection:
+            rows = self._rows(connection, models.Property.id > view.max_id)
+            for i in range(0, len(changed), _IN_CHUNK):
+                rows += self._rows(connection, models.Property.id.in_(changed[i:i + _IN_CHUNK]))
+        if not rows and not changed:
+            self._view = view
+            return
+
+        for pid in changed:  # deleted unless reloaded below
+            self._delta[pid] = None
+        ids, vectors, codes = self._encoder.encode(rows)
+        for i, pid in enumerate(ids.tolist()):
+            self._delta[pid] = (vectors[i], codes[:, i])
+
+        # Base rows superseded by the delta (changed or deleted) drop out of the search
+        base = view.base
+        touched = np.fromiter(self._delta, dtype=np.int64, count=len(self._delta))
+        positions = np.minimum(np.searchsorted(base.ids, touched), max(len(base.ids) - 1, 0))
+        valid = np.ones(len(base.ids), dtype=bool)
+        if len(base.ids):
+            valid[positions[base.ids[positions] == touched]] = False
+        base = _Block(base.ids, base.vectors, base.codes, sqnorm=base.sqnorm, valid=valid)
+        delta = _Block.from_rows({pid: entry for pid, entry in self._delta.items() if entry is not None})
+        max_id = max(view.max_id, int(ids.max()) if len(ids) else 0)
+        self._view = _View(view.generation, base, delta, max_id)
+
+    def _compact(self) -> None:
+        """Merges the delta into a new file generation (no listing is re-read or re-encoded)."""
+        base, delta = self._view.base, self._view.delta
+        kept = np.flatnonzero(base.valid)
+        # Both sides are in id order and disjoint: interleave them chunk by chunk
+        cuts = np.searchsorted(base.ids[kept], delta.ids)
+
+        def parts():
+            at = 0
+            for j in range(len(delta.ids) + 1):
+                end = cuts[j] if j < len(delta.ids) else len(kept)
+                for i in range(at, end, _ENCODE_CHUNK):
+                    rows = kept[i:min(i + _ENCODE_CHUNK, end)]
+                    yield base.ids[rows], base.vectors[rows], base.codes[:, rows]
+                at = end
+                if j < len(delta.ids):
+                    yield delta.ids[j:j + 1], delta.vectors[j:j + 1], delta.codes[:, j:j + 1]
+
+        meta = _write_generation(self.directory, self._encoder, parts(), len(kept) + len(delta.ids), self._source(), self._meta["built_at"])
+        self._delta = {}
+        self._load(meta)
+        logger.info("Similarity index compacted: %d listings", meta["rows"])
+
+    # --- QUERIES ---
+    def similar(self, property_id: int, k: int = 8) -> Optional[List[Tuple[int, float]]]:
+        """-> [(id, similarity 0..1)] nearest first, or None when the listing doesn't exist."""
+        self.refresh()
+        view = self._view
+        if view is None:
+            self.warm()  # no-op when it is already running
+            raise IndexNotReady("the similar-listings index is still loading")
+        found = view.row(property_id)
+        if found is None:
+            # Ids above the view's may be listings created through another worker since our
+            # last refresh: look once more, but at most every _MISS_REFRESH_SECONDS, so a
+            # stream of unknown ids can't keep the database and the refresh busy
+            now = time.monotonic()
+            if property_id <= view.max_id or now - self._missed_at < _MISS_REFRESH_SECONDS:
+                return None
+            self._missed_at = now
+            self.mark_changed()
+            self.refresh()
+            view = self._view
+            found = view.row(property_id)
+            if found is None:
+                return None
+
+        query, query_codes = found
+        mismatch = (WEIGHTS["suburb"] / 2, WEIGHTS["property_type"] / 2)
+        ids, scores = [], []
+        for block in (view.base, view.delta):
+            if not len(block.ids):
+                continue
+            # Larger is nearer: q·x - |x|²/2 - (one-hot mismatches)/2 = (|q|² - |q - x|²) / 2
+            score = np.asarray(block.vectors) @ query - block.sqnorm / 2
+            score -= np.where(block.codes[SUBURB] == query_codes[SUBURB], 0.0, mismatch[0])
+            score -= np.where(block.codes[PROPERTY_TYPE] == query_codes[PROPERTY_TYPE], 0.0, mismatch[1])
+            keep = block.valid & (block.codes[STATUS] == query_codes[STATUS]) & (block.ids != property_id)
+            ids.append(block.ids)
+            scores.append(np.where(keep, score, -np.inf))
+        ids, scores = np.concatenate(ids), np.concatenate(scores)
+
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return []
+        nearest = np.argpartition(-scores, k - 1)[:k]
+        nearest = nearest[np.argsort(-scores[nearest], kind="stable")]
+        distance = np.sqrt(np.maximum(float(query @ query) - 2 * scores[nearest], 0))
+        return [(int(pid), round(float(1.0 / (1.0 + d)), 3)) for pid, d in zip(ids[nearest], distance)]
+
+index = SimilarityIndex(
+    settings.SIMILARITY_DIR, refresh_seconds=settings.SIMILARITY_REFRESH_SECONDS,
+    rebuild_seconds=settings.SIMILARITY_REBUILD_SECONDS, max_delta=settings.SIMILARITY_MAX_DELTA,
+)
+
+if __name__ == "__main__":
+    print("🧭 Rebuilding the similar-listings index...")
+    index.refresh(force=True)
+    print(f"✅ Indexed {len(index._view.base.ids)} listings in {settings.SIMILARITY_DIR}")
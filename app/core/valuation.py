@@ -0,0 +1,352 @@
+# app/core/valuation.py
+"""
+Comparable-listings valuation behind /properties/{id}/report.
+
+Every listing's valuation features live in a column-oriented NumPy snapshot,
+loaded once and then refreshed incrementally (rows with an id above the last
+one seen, plus ids the API reports as changed), so a report is a few
+vectorized operations over arrays instead of a table scan:
+
+1. comparables: same listing status and property type in the same suburb
+   (falling back to the city, then everywhere), ranked by standardized
+   distance on bedrooms, bathrooms and log(land size)
+2. estimate: similarity-weighted mean price of the nearest comparables,
+   with a weighted standard deviation as the range
+3. suburb statistics: median price and price per m², and the trend between
+   the older and the newer half of the suburb's listings (listing order)
+
+Reports run in the threadpool. One thread at a time refreshes the snapshot
+while the others keep reading the current one; the new snapshot is built
+outside the lock and swapped in whole (with its suburb statistics and
+medians, cached on it), so readers never wait for a rebuild nor see
+half-updated arrays. The app warms it at startup.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional
+import numpy as np
+from sqlalchemy import select
+from app.core.config import settings
+from app.db import database, models
+
+logger = logging.getLogger(__name__)
+
+K_COMPARABLES = 8
+MIN_COMPARABLES = 3
+TREND_THRESHOLD = 0.03  # +-3% between halves counts as a move
+_IN_CHUNK = 500  # ids per IN (...) when reloading changed rows
+
+_COLUMNS = (
+    models.Property.id, models.Property.price, models.Property.bedrooms, models.Property.bathrooms,
+    models.Property.land_size, models.Property.suburb, models.Property.city,
+    models.Property.property_type, models.Property.listing_status,
+)
+SUBJECT_FIELDS = ("id", "price", "bedrooms", "bathrooms", "land_size", "suburb", "city", "property_type", "listing_status")
+
+class _Codes:
+    """Dictionary-encodes a categorical column (string -> small int)."""
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+
+    def code(self, value) -> int:
+        return self.index.setdefault(value, len(self.index))
+
+    def lookup(self, value) -> int:
+        return self.index.get(value, -1)
+
+class _Snapshot:
+    __slots__ = ("ids", "price", "features", "land_size", "suburb", "city", "ptype", "status", "valid", "scale",
+                 "suburb_stats", "medians")
+
+    def __init__(self, ids, price, features, land_size, suburb, city, ptype, status, valid):
+        self.ids, self.price, self.features, self.land_size = ids, price, features, land_size
+        self.suburb, self.city, self.ptype, self.status, self.valid = suburb, city, ptype, status, valid
+        # Per-feature spread, so one bedroom and one bathroom weigh comparably
+        scale = features[valid].std(axis=0) if valid.any() else np.ones(features.shape[1])
+        self.scale = np.where(scale > 0, scale, 1.0)
+        # Derived from this snapshot, so they go with it
+        self.suburb_stats: Dict[tuple, dict] = {}
+        self.medians: Optional[Dict[tuple, float]] = None
+
+    @property
+    def max_id(self) -> int:
+        return int(self.ids[-1]) if len(self.ids) else 0
+
+def _features(bedrooms, bathrooms, land_size) -> np.ndarray:
+    return np.column_stack([bedrooms, bathrooms, np.log1p(np.maximum(land_size, 0))])
+
+class ValuationEngine:
+    def __init__(self, bind=None, refresh_seconds: float = 30.0, rebuild_seconds: float = 3600.0):
+        self._bind = bind
+        self.refresh_seconds = refresh_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()  # one refresh at a time; readers never wait for it
+        self._warming: Optional[threading.Thread] = None
+        self._snapshot: Optional[_Snapshot] = None
+        self._changed: set = set()
+        self._stale = True
+        self._checked_at = 0.0
+        self._built_at = 0.0
+        self._codes = {name: _Codes() for name in ("suburb", "city", "property_type", "listing_status")}
+
+    # --- 1. MAINTENANCE ---
+    def mark_changed(self, property_ids: Iterable[int] = ()) -> None:
+        """Called after commits: changed ids are reloaded, new ids are picked up by id range."""
+        with self._lock:
+            self._changed.update(pid for pid in property_ids if pid is not None)
+            self._stale = True
+
+    def _due(self, now: float) -> Optional[bool]:
+        """True when a rebuild is due, False for an incremental refresh, None for neither."""
+        if self._snapshot is None or now - self._built_at > self.rebuild_seconds:
+            return True
+        if self._stale or now - self._checked_at > self.refresh_seconds:
+            return False
+        return None
+
+    def refresh(self, force: bool = False, wait: bool = False) -> None:
+        """
+        Returns at once when another thread is refreshing, unless force or wait
+        is set or there is no snapshot yet. A failure with a snapshot to serve
+        is logged and retried on a later call.
+        """
+        if not force and self._due(time.monotonic()) is None:
+            return
+        if not self._refreshing.acquire(blocking=force or wait or self._snapshot is None):
+            return
+        try:
+            now = time.monotonic()
+            with self._lock:
+                rebuild = True if force else self._due(now)  # again: it may have been done while we waited
+                if rebuild is None:
+                    return
+                changed, self._changed, self._stale = self._changed, set(), False
+            try:
+                snapshot = self._rebuild() if rebuild else self._apply_changes(changed)
+            except Exception:
+                with self._lock:
+                    self._changed |= changed
+                    self._stale = True
+                if self._snapshot is None:
+                    raise
+                logger.exception("Refreshing the valuation snapshot failed, serving the current one")
+                return
+            with self._lock:
+                if snapshot is not None:
+                    self._snapshot = snapshot
+                if rebuild:
+                    self._built_at = now
+                self._checked_at = now
+        finally:
+            self._refreshing.release()
+
+    def warm(self) -> None:
+        """Builds the snapshot in a background thread, so no report waits for it."""
+        with self._lock:
+            if self._snapshot is not None or (self._warming is not None and self._warming.is_alive()):
+                return
+            self._warming = threading.Thread(target=self._warm, name="valuation-warm", daemon=True)
+            self._warming.start()
+
+    def _warm(self) -> None:
+        try:
+            self.refresh(wait=True)
+        except Exception:
+            logger.exception("Warming the valuation snapshot failed")
+
+    def _load(self, connection, where=None) -> list:
+        stmt = select(*_COLUMNS).order_by(models.Property.id)
+        if where is not None:
+            stmt = stmt.where(where)
+        return connection.execute(stmt).all()
+
+    def _arrays(self, rows: list) -> tuple:
+        codes = self._codes
+        n = len(rows)
+        cols = list(zip(*rows)) if rows else [()] * len(_COLUMNS)
+        ids = np.fromiter(cols[0], dtype=np.int64, count=n)
+        price = np.array([p or 0.0 for p in cols[1]], dtype=np.float64)
+        bedrooms = np.array([v or 0 for v in cols[2]], dtype=np.float64)
+        bathrooms = np.array([v or 0 for v in cols[3]], dtype=np.float64)
+        land_size = np.array([v or 0 for v in cols[4]], dtype=np.float64)
+        suburb = np.fromiter((codes["suburb"].code(v) for v in cols[5]), dtype=np.int32, count=n)
+        city = np.fromiter((codes["city"].code(v) for v in cols[6]), dtype=np.int32, count=n)
+        ptype = np.fromiter((codes["property_type"].code(v) for v in cols[7]), dtype=np.int32, count=n)
+        status = np.fromiter((codes["listing_status"].code(v) for v in cols[8]), dtype=np.int32, count=n)
+        return ids, price, _features(bedrooms, bathrooms, land_size), land_size, suburb, city, ptype, status
+
+    # _rebuild and _apply_changes run with _refreshing held and return the snapshot to swap in
+    def _rebuild(self) -> _Snapshot:
+        started = time.perf_counter()
+        with (self._bind or database.read_engine).connect() as connection:
+            rows = self._load(connection)
+        snapshot = _Snapshot(*self._arrays(rows), valid=np.ones(len(rows), dtype=bool))
+        logger.info("Valuation snapshot built: %d listings in %.0f ms", len(rows), (time.perf_counter() - started) * 1000)
+        return snapshot
+
+    def _apply_changes(self, changed: set) -> Optional[_Snapshot]:
+        snap = self._snapshot
+        changed = sorted(pid for pid in changed if pid <= snap.max_id)
+        with (self._bind or database.read_engine).connect() as connection:
+            rows = self._load(connection, models.Property.id > snap.max_id)
+            for i in range(0, len(changed), _IN_CHUNK):
+                rows += self._load(connection, models.Property.id.in_(changed[i:i + _IN_CHUNK]))
+        if not rows and not changed:
+            return None
+
+        new_rows = [row for row in rows if row[0] > snap.max_id]
+        updated_rows = [row for row in rows if row[0] <= snap.max_id]
+        columns = [snap.ids, snap.price, snap.features, snap.land_size, snap.suburb, snap.city, snap.ptype, snap.status]
+        columns = [col.copy() for col in columns]  # copy-on-write: readers keep the old snapshot
+        valid = snap.valid.copy()
+
+        if changed:
+            changed = np.asarray(changed, dtype=np.int64)
+            positions = np.searchsorted(columns[0], changed)
+            valid[positions[columns[0][positions] == changed]] = False  # deleted unless reloaded below
+        if updated_rows:
+            updated = self._arrays(updated_rows)
+            positions = np.searchsorted(columns[0], updated[0])
+            if not (columns[0][np.minimum(positions, len(columns[0]) - 1)] == updated[0]).all():
+                # A row below max_id we never saw (ids committed out of order): start over
+                return self._rebuild()
+            for col, values in zip(columns, updated):
+                col[positions] = values
+            valid[positions] = True
+        if new_rows:
+            appended = self._arrays(new_rows)
+            columns = [np.concatenate([col, values]) for col, values in zip(columns, appended)]
+            valid = np.concatenate([valid, np.ones(len(new_rows), dtype=bool)])
+        return _Snapshot(*columns, valid=valid)
+
+    # --- 2. REPORTS ---
+    def _comparables(self, snap: _Snapshot, subject: dict):
+        codes = self._codes
+        base = (
+            snap.valid
+            & (snap.status == codes["listing_status"].lookup(subject["listing_status"]))
+            & (snap.ptype == codes["property_type"].lookup(subject["property_type"]))
+            & (snap.ids != subject["id"])
+        )
+        for basis, mask in (
+            ("suburb", base & (snap.suburb == codes["suburb"].lookup(subject["suburb"]))),
+            ("city", base & (snap.city == codes["city"].lookup(subject["city"]))),
+            ("all", base),
+        ):
+            candidates = np.flatnonzero(mask)
+            if len(candidates) >= MIN_COMPARABLES:
+                return basis, candidates
+        return basis, candidates
+
+    def suburb_stats(self, snap: _Snapshot, suburb: str, listing_status: str) -> dict:
+        key = (suburb, listing_status)
+        cached = snap.suburb_stats.get(key)
+        if cached is not None:
+            return cached
+
+        rows = np.flatnonzero(
+            snap.valid
+            & (snap.suburb == self._codes["suburb"].lookup(suburb))
+            & (snap.status == self._codes["listing_status"].lookup(listing_status))
+        )
+        prices, land = snap.price[rows], snap.land_size[rows]
+        sized = land > 0
+        per_sqm = prices[sized] / land[sized]
+        stats = {
+            "listings": int(len(rows)),
+            "median_price": round(float(np.median(prices)), 2) if len(rows) else None,
+            "median_price_per_sqm": round(float(np.median(per_sqm)), 2) if len(per_sqm) else None,
+            "trend_pct": None,
+            "market_trend": "Insufficient data",
+        }
+        # Rows are in id (= listing) order: compare the newer half with the older half
+        series = per_sqm if len(per_sqm) >= 4 else prices
+        if len(series) >= 4:
+            half = len(series) // 2
+            older, newer = np.median(series[:half]), np.median(series[half:])
+            if older > 0:
+                change = newer / older - 1
+                stats["trend_pct"] = round(float(change) * 100, 1)
+                stats["market_trend"] = "Rising" if change > TREND_THRESHOLD else "Falling" if change < -TREND_THRESHOLD else "Stable"
+        snap.suburb_stats[key] = stats
+        return stats
+
+    def median_prices(self) -> Dict[tuple, float]:
+        """Median price per (suburb, listing_status, property_type), e.g. for the risk scorer."""
+        self.refresh()
+        snap = self._snapshot
+        if snap.medians is not None:
+            return snap.medians
+
+        rows = np.flatnonzero(snap.valid)
+        n_status = len(self._codes["listing_status"].index) + 1
+        n_type = len(self._codes["property_type"].index) + 1
+        keys = (snap.suburb[rows].astype(np.int64) * n_status + snap.status[rows]) * n_type + snap.ptype[rows]
+        order = np.lexsort((snap.price[rows], keys))
+        keys, prices = keys[order], snap.price[rows][order]
+
+        # Groups are contiguous after the sort: the median sits in the middle of each run
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=np.int64)
+        ends = np.r_[starts[1:], len(keys)]
+        values = (prices[starts + (ends - starts - 1) // 2] + prices[starts + (ends - starts) // 2]) / 2
+
+        names = {name: {code: value for value, code in codes.index.items()} for name, codes in self._codes.items()}
+        medians = {}
+        for key, value in zip(keys[starts].tolist(), values.tolist()):
+            rest, ptype = divmod(key, n_type)
+            suburb, status = divmod(rest, n_status)
+            medians[(names["suburb"][suburb], names["listing_status"][status], names["property_type"][ptype])] = value
+        snap.medians = medians
+        return medians
+
+    def appraise(self, subject: dict) -> dict:
+        """`subject` holds SUBJECT_FIELDS of the listing being valued."""
+        self.refresh()
+        snap = self._snapshot
+        basis, candidates = self._comparables(snap, subject)
+        stats = self.suburb_stats(snap, subject["suburb"], subject["listing_status"])
+
+        result = {
+            "estimated_value": None,
+            "range": None,
+            "asking_vs_estimate_pct": None,
+            "market_trend": stats["market_trend"],
+            "comparable_basis": basis,
+            "comparables": [],
+            "suburb_stats": stats,
+        }
+        if len(candidates) == 0:
+            return result
+
+        target = _features([subject["bedrooms"] or 0], [subject["bathrooms"] or 0], np.array([subject["land_size"] or 0], dtype=np.float64))[0]
+        distance = np.sqrt((((snap.features[candidates] - target) / snap.scale) ** 2).sum(axis=1))
+        k = min(K_COMPARABLES, len(candidates))
+        nearest = np.argpartition(distance, k - 1)[:k]
+        nearest = nearest[np.argsort(distance[nearest], kind="stable")]
+        rows, distance = candidates[nearest], distance[nearest]
+
+        weights = 1.0 / (1.0 + distance)
+        prices = snap.price[rows]
+        estimate = float(np.average(prices, weights=weights))
+        spread = float(np.sqrt(np.average((prices - estimate) ** 2, weights=weights)))
+
+        result["estimated_value"] = round(estimate, 2)
+        result["range"] = {"low": round(max(estimate - spread, 0.0), 2), "high": round(estimate + spread, 2)}
+        if estimate > 0 and subject["price"]:
+            result["asking_vs_estimate_pct"] = round((subject["price"] / estimate - 1) * 100, 1)
+        result["comparables"] = [
+            {
+                "id": int(snap.ids[row]),
+                "price": float(snap.price[row]),
+                "bedrooms": int(snap.features[row, 0]),
+                "bathrooms": float(snap.features[row, 1]),
+                "land_size": float(snap.land_size[row]),
+                "similarity": round(float(weight), 3),
+            }
+            for row, weight in zip(rows, weights)
+        ]
+        return result
+
+engine = ValuationEngine(refresh_seconds=settings.VALUATION_REFRESH_SECONDS, rebuild_seconds=settings.VALUATION_REBUILD_SECONDS)
@@ -0,0 +1,211 @@
+# app/db/bulk_import.py
+"""
+Bulk listing import from CSV or NDJSON.
+
+Rows are validated with schemas.PropertyCreate and written in large batches,
+one transaction per batch: the properties in one statement (PostgreSQL: a
+multi-row INSERT ... RETURNING id; SQLite: an executemany, the ids read back
+with last_insert_rowid()), then one executemany for their images. A bad row
+is reported and skipped, it never aborts the rest of the file.
+
+Saved-search alerts are not matched here: callers pass a list to collect the
+new ids and hand it to alerts.enqueue_ids (the API in a background task).
+
+Throughput on SQLite is about 4k rows/s (30k listings with 5 photos each),
+short of the tens of thousands first aimed for. Over half of it is the
+per-row triggers keeping the full-text, R*Tree, facet and change-feed tables
+current; validation and risk scoring take most of the rest.
+
+CLI:
+    python -m app.db.bulk_import listings.csv
+    python -m app.db.bulk_import listings.ndjson --owner-id 3 --batch-size 10000
+"""
+import argparse
+import csv
+import io
+import json
+import time
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert, text
+from sqlalchemy.exc import SQLAlchemyError
+from app.core import alerts, risk
+from app.db import database, models, schemas
+
+BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000  # keep the response bounded on a file full of bad rows
+FORMATS = ("csv", "ndjson")
+
+# --- 1. READERS ---
+def _csv_records(text: IO[str]) -> Iterator[Tuple[int, dict]]:
+    """CSV with a header row; `images` holds image URLs separated by '|'."""
+    reader = csv.DictReader(text)
+    for row in reader:
+        record = {key: value for key, value in row.items() if key and value not in (None, "")}
+        urls = record.pop("images", "")
+        record["images"] = [{"image_url": url.strip()} for url in urls.split("|") if url.strip()]
+        yield reader.line_num, record
+
+def _ndjson_records(text: IO[str]) -> Iterator[Tuple[int, object]]:
+    for line_num, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_num, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_num, e
+
+def read_records(stream: IO[bytes], fmt: str) -> Iterator[Tuple[int, object]]:
+    """Reads a binary stream lazily, one record at a time (constant memory)."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    return _csv_records(text) if fmt == "csv" else _ndjson_records(text)
+
+# --- 2. VALIDATION ---
+def _to_rows(record, owner_id: Optional[int]) -> Tuple[dict, List[str]]:
+    if isinstance(record, Exception):
+        raise ValueError(f"Invalid JSON: {record}")
+    if not isinstance(record, dict):
+        raise ValueError("Each line must be a JSON object")
+
+    prop = schemas.PropertyCreate(**record)
+    image_urls = []
+    for img in prop.images or []:
+        if not isinstance(img.get("image_url"), str):
+            raise ValueError("Every image needs an image_url")
+        image_urls.append(img["image_url"])
+
+    row = prop.model_dump(exclude={"images"})
+    row["owner_id"] = owner_id
+    return row, image_urls
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+# --- 3. BATCH WRITES ---
+def _insert_batch(connection, rows: List[dict], images: List[List[str]]) -> List[int]:
+    table = models.Property.__table__
+    if connection.dialect.name == "sqlite":
+        # SQLite can't keep RETURNING order for multi-row inserts (SQLAlchemy would fall
+        # back to one statement per row). Inside one write transaction rowids are handed
+        # out sequentially, so a plain executemany + last_insert_rowid() gives the ids.
+        connection.execute(insert(table), rows)
+        last_id = connection.execute(text("SELECT last_insert_rowid()")).scalar()
+        property_ids = range(last_id - len(rows) + 1, last_id + 1)
+    else:
+        result = connection.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), rows)
+        property_ids = result.scalars().all()
+
+    image_rows = [
+        {"property_id": property_id, "image_url": url}
+        for property_id, urls in zip(property_ids, images)
+        for url in urls
+    ]
+    if image_rows:
+        connection.execute(insert(models.PropertyImage.__table__), image_rows)
+    return list(property_ids)
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+        self._started = time.perf_counter()
+
+    def error(self, line: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self) -> dict:
+        seconds = time.perf_counter() - self._started
+        return {
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "seconds": round(seconds, 3),
+            "rows_per_second": int(self.inserted / seconds) if seconds else None,
+        }
+
+def _flush(bind, batch: list, report: ImportReport, property_ids: Optional[List[int]]) -> None:
+    if not batch:
+        return
+    rows = [row for _, row, _ in batch]
+    images = [urls for _, _, urls in batch]
+    # Preliminary scores for the whole batch at once; the risk job adds the price factor
+    risk.apply(rows)
+    inserted = []
+    try:
+        with bind.begin() as connection:
+            inserted = _insert_batch(connection, rows, images)
+    except SQLAlchemyError:
+        # Something in the batch broke at the DB level: retry row by row to isolate it
+        for line, row, urls in batch:
+            try:
+                with bind.begin() as connection:
+                    inserted += _insert_batch(connection, [row], [urls])
+            except SQLAlchemyError as e:
+                report.error(line, str(e.orig) if getattr(e, "orig", None) else str(e))
+    report.inserted += len(inserted)
+    if property_ids is not None:
+        property_ids += inserted
+    batch.clear()
+
+def import_records(
+        records: Iterable[Tuple[int, object]],
+        owner_id: Optional[int] = None,
+        batch_size: int = BATCH_SIZE,
+        bind=None,
+        property_ids: Optional[List[int]] = None,
+) -> dict:
+    """Imports the records; the ids of the new listings are appended to property_ids when given."""
+    bind = bind or database.engine
+    report = ImportReport()
+    batch = []
+    for line, record in records:
+        try:
+            row, urls = _to_rows(record, owner_id)
+        except (ValidationError, ValueError, TypeError) as e:
+            report.error(line, _error_message(e))
+            continue
+        batch.append((line, row, urls))
+        if len(batch) >= batch_size:
+            _flush(bind, batch, report, property_ids)
+    _flush(bind, batch, report, property_ids)
+    return report.as_dict()
+
+def import_file(stream: IO[bytes], fmt: str, owner_id: Optional[int] = None, batch_size: int = BATCH_SIZE,
+                property_ids: Optional[List[int]] = None) -> dict:
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    return import_records(read_records(stream, fmt), owner_id=owner_id, batch_size=batch_size, property_ids=property_ids)
+
+# --- 4. CLI ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import listings from CSV or NDJSON")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension")
+    parser.add_argument("--owner-id", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    database.init_db()
+
+    print(f"📦 Importing {args.path} ({fmt})...")
+    new_ids = []
+    with open(args.path, "rb") as f:
+        result = import_file(f, fmt, owner_id=args.owner_id, batch_size=args.batch_size, property_ids=new_ids)
+
+    for err in result["errors"][:20]:
+        print(f"❌ line {err['line']}: {err['error']}")
+    print(f"✅ Inserted {result['inserted']} listings, {result['failed']} failed ({result['rows_per_second']} rows/s)")
+
+    print("🔔 Matching saved searches...")
+    print(f"✅ Queued {alerts.enqueue_ids(new_ids)} saved-search alerts")
+
+    print("🧮 Scoring imported listings...")
+    scored = risk.rescore()
+    print(f"✅ Scored {scored['scored']} listings ({scored['rows_per_second']} rows/s)")
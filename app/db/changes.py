@@ -0,0 +1,234 @@
+# app/db/changes.py
+"""
+Change feed for client sync (GET /properties/changes?since=<cursor>).
+
+A `property_changes` table with one row per listing (deleted ones stay as
+tombstones) holds the sequence number of its latest change. Triggers on
+`properties` and `property_images` bump it on every insert, update and
+delete, like the FTS5 / R*Tree / facet triggers, so ORM writes, bulk
+imports and scripts all show up in the feed. The risk job's score-only
+writes (updated_at left alone) don't: clients get the new score with the
+listing's next change.
+
+The cursor is just the last seq a client received, which only works if seqs
+are handed out in commit order: a reader that has seen seq N must have seen
+every change up to N.
+- SQLite: max(seq) + 1 inside the writing transaction. SQLite runs one
+  writer at a time, so that is commit order.
+- PostgreSQL: nextval() of a sequence, taken under a transaction-level
+  advisory lock that is held until commit, so listing writes take turns
+  the way SQLite's do. Other tables are not affected.
+
+A listing changed several times since the cursor appears once, with its
+current state: "inserted" if it was created after the cursor, else
+"updated", or "deleted".
+
+Filtered by owner, "created" means the time the listing got that owner
+(owned_seq). When a listing changes hands, its previous owner gets a row in
+`property_owner_tombstones`, so their feed reports it deleted while the new
+owner's reports it inserted; the unfiltered feed just sees an update.
+"""
+from typing import Optional
+from sqlalchemy import column, event, inspect, literal, select, table, text, union_all
+from app.db import models
+
+CHANGES_TABLE = "property_changes"
+TOMBSTONES_TABLE = "property_owner_tombstones"
+
+SEQUENCE = "property_changes_seq"  # PostgreSQL
+
+_TABLES_DDL = [
+    f"""CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (
+        property_id INTEGER PRIMARY KEY,
+        seq BIGINT NOT NULL,
+        created_seq BIGINT NOT NULL,
+        owned_seq BIGINT NOT NULL,
+        owner_id INTEGER,
+        deleted INTEGER NOT NULL DEFAULT 0
+    )""",
+    f"CREATE UNIQUE INDEX IF NOT EXISTS ix_property_changes_seq ON {CHANGES_TABLE} (seq)",
+    f"CREATE INDEX IF NOT EXISTS ix_property_changes_owner_seq ON {CHANGES_TABLE} (owner_id, seq)",
+    # Listings an owner no longer has: (listing, former owner) -> seq of the move
+    f"""CREATE TABLE IF NOT EXISTS {TOMBSTONES_TABLE} (
+        property_id INTEGER NOT NULL,
+        owner_id INTEGER NOT NULL,
+        seq BIGINT NOT NULL,
+        owned_seq BIGINT NOT NULL,
+        PRIMARY KEY (property_id, owner_id)
+    )""",
+    f"CREATE INDEX IF NOT EXISTS ix_property_owner_tombstones_owner_seq ON {TOMBSTONES_TABLE} (owner_id, seq)",
+]
+
+_NEXT_SEQ = f"(SELECT coalesce(max(seq), 0) + 1 FROM {CHANGES_TABLE})"
+
+# An update that only rescored the listing (risk.rescore keeps updated_at)
+_RESCORE_ONLY = ("old.updated_at IS new.updated_at AND (old.risk_score IS NOT new.risk_score "
+                 "OR old.risk_notes IS NOT new.risk_notes OR old.risk_version IS NOT new.risk_version)")
+
+_SQLITE_DDL = [
+    # A reused id (SQLite hands out max(id) + 1 again after the newest row is deleted) starts over as an insert
+    f"""CREATE TRIGGER IF NOT EXISTS property_changes_ai AFTER INSERT ON properties BEGIN
+        INSERT INTO {CHANGES_TABLE} (property_id, seq, created_seq, owned_seq, owner_id, deleted)
+            VALUES (new.id, {_NEXT_SEQ}, {_NEXT_SEQ}, {_NEXT_SEQ}, new.owner_id, 0)
+            ON CONFLICT (property_id) DO UPDATE SET seq = excluded.seq, created_seq = excluded.created_seq,
+                owned_seq = excluded.owned_seq, owner_id = excluded.owner_id, deleted = 0;
+        DELETE FROM {TOMBSTONES_TABLE} WHERE property_id = new.id AND owner_id = new.owner_id;
+    END""",
+    # A new owner: the tombstone takes the next seq before the listing's own row is bumped,
+    # so both get the same number and the next change still gets a higher one
+    f"""CREATE TRIGGER IF NOT EXISTS property_changes_au AFTER UPDATE ON properties WHEN NOT ({_RESCORE_ONLY}) BEGIN
+        INSERT INTO {TOMBSTONES_TABLE} (property_id, owner_id, seq, owned_seq)
+            SELECT old.id, old.owner_id, {_NEXT_SEQ}, owned_seq FROM {CHANGES_TABLE}
+            WHERE property_id = old.id AND old.owner_id IS NOT NULL AND old.owner_id IS NOT new.owner_id
+            ON CONFLICT (property_id, owner_id) DO UPDATE SET seq = excluded.seq, owned_seq = excluded.owned_seq;
+        DELETE FROM {TOMBSTONES_TABLE}
+            WHERE property_id = new.id AND owner_id = new.owner_id AND old.owner_id IS NOT new.owner_id;
+        UPDATE {CHANGES_TABLE} SET seq = {_NEXT_SEQ}, owner_id = new.owner_id,
+            owned_seq = CASE WHEN old.owner_id IS new.owner_id THEN owned_seq ELSE {_NEXT_SEQ} END
+            WHERE property_id = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS property_changes_ad AFTER DELETE ON properties BEGIN
+        UPDATE {CHANGES_TABLE} SET seq = {_NEXT_SEQ}, deleted = 1 WHERE property_id = old.id;
+    END""",
+    # Photos are part of the payload: adding or removing one is an update of the listing
+    f"""CREATE TRIGGER IF NOT EXISTS property_changes_image_ai AFTER INSERT ON property_images BEGIN
+        UPDATE {CHANGES_TABLE} SET seq = {_NEXT_SEQ} WHERE property_id = new.property_id AND deleted = 0;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS property_changes_image_au AFTER UPDATE ON property_images BEGIN
+        UPDATE {CHANGES_TABLE} SET seq = {_NEXT_SEQ} WHERE property_id IN (old.property_id, new.property_id) AND deleted = 0;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS property_changes_image_ad AFTER DELETE ON property_images BEGIN
+        UPDATE {CHANGES_TABLE} SET seq = {_NEXT_SEQ} WHERE property_id = old.property_id AND deleted = 0;
+    END""",
+]
+
+# Same rules as the SQLite triggers, one plpgsql function per table
+_PG_NEXT_SEQ = f"""
+        PERFORM pg_advisory_xact_lock(hashtext('{CHANGES_TABLE}'));
+        next_seq := nextval('{SEQUENCE}');"""
+
+_POSTGRES_DDL = [
+    f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCE}",
+    f"""CREATE OR REPLACE FUNCTION property_changes_listing() RETURNS trigger LANGUAGE plpgsql AS $$
+    DECLARE
+        next_seq BIGINT;
+    BEGIN
+        IF TG_OP = 'UPDATE' AND OLD.updated_at IS NOT DISTINCT FROM NEW.updated_at
+                AND (OLD.risk_score, OLD.risk_notes, OLD.risk_version) IS DISTINCT FROM (NEW.risk_score, NEW.risk_notes, NEW.risk_version) THEN
+            RETURN NULL;  -- rescored only
+        END IF;{_PG_NEXT_SEQ}
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO {CHANGES_TABLE} (property_id, seq, created_seq, owned_seq, owner_id, deleted)
+                VALUES (NEW.id, next_seq, next_seq, next_seq, NEW.owner_id, 0)
+                ON CONFLICT (property_id) DO UPDATE SET seq = excluded.seq, created_seq = excluded.created_seq,
+                    owned_seq = excluded.owned_seq, owner_id = excluded.owner_id, deleted = 0;
+            DELETE FROM {TOMBSTONES_TABLE} WHERE property_id = NEW.id AND owner_id = NEW.owner_id;
+        ELSIF TG_OP = 'UPDATE' THEN
+            IF OLD.owner_id IS DISTINCT FROM NEW.owner_id THEN
+                INSERT INTO {TOMBSTONES_TABLE} (property_id, owner_id, seq, owned_seq)
+                    SELECT OLD.id, OLD.owner_id, next_seq, owned_seq FROM {CHANGES_TABLE}
+                    WHERE property_id = OLD.id AND OLD.owner_id IS NOT NULL
+                    ON CONFLICT (property_id, owner_id) DO UPDATE SET seq = excluded.seq, owned_seq = excluded.owned_seq;
+                DELETE FROM {TOMBSTONES_TABLE} WHERE property_id = NEW.id AND owner_id = NEW.owner_id;
+                UPDATE {CHANGES_TABLE} SET seq = next_seq, owned_seq = next_seq, owner_id = NEW.owner_id
+                    WHERE property_id = NEW.id;
+            ELSE
+                UPDATE {CHANGES_TABLE} SET seq = next_seq WHERE property_id = NEW.id;
+            END IF;
+        ELSE
+            UPDATE {CHANGES_TABLE} SET seq = next_seq, deleted = 1 WHERE property_id = OLD.id;
+        END IF;
+        RETURN NULL;
+    END $$""",
+    f"""CREATE OR REPLACE FUNCTION property_changes_image() RETURNS trigger LANGUAGE plpgsql AS $$
+    DECLARE
+        next_seq BIGINT;
+    BEGIN{_PG_NEXT_SEQ}
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE {CHANGES_TABLE} SET seq = next_seq WHERE property_id = OLD.property_id AND deleted = 0;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            UPDATE {CHANGES_TABLE} SET seq = next_seq WHERE property_id = NEW.property_id AND deleted = 0;
+        END IF;
+        RETURN NULL;
+    END $$""",
+    # CREATE TRIGGER has no IF NOT EXISTS before PostgreSQL 14
+    """DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'property_changes_listing') THEN
+            CREATE TRIGGER property_changes_listing AFTER INSERT OR UPDATE OR DELETE ON properties
+                FOR EACH ROW EXECUTE FUNCTION property_changes_listing();
+        END IF;
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'property_changes_image') THEN
+            CREATE TRIGGER property_changes_image AFTER INSERT OR UPDATE OR DELETE ON property_images
+                FOR EACH ROW EXECUTE FUNCTION property_changes_image();
+        END IF;
+    END $$""",
+]
+
+# Listings that predate the feed start in it as inserts, in id order
+_BACKFILL_SQL = f"""
+    INSERT INTO {CHANGES_TABLE} (property_id, seq, created_seq, owned_seq, owner_id, deleted)
+    SELECT id, n, n, n, owner_id, 0 FROM (SELECT id, owner_id, row_number() OVER (ORDER BY id) AS n FROM properties) AS listings
+"""
+
+property_changes = table(
+    CHANGES_TABLE, column("property_id"), column("seq"), column("created_seq"), column("owned_seq"),
+    column("owner_id"), column("deleted"),
+)
+owner_tombstones = table(TOMBSTONES_TABLE, column("property_id"), column("owner_id"), column("seq"), column("owned_seq"))
+
+def is_supported(bind) -> bool:
+    return bind.dialect.name in ("sqlite", "postgresql")
+
+def create_changes_table(connection) -> None:
+    postgres = connection.dialect.name == "postgresql"
+    existed = inspect(connection).has_table(CHANGES_TABLE)
+    for statement in _TABLES_DDL + (_POSTGRES_DDL if postgres else _SQLITE_DDL):
+        connection.execute(text(statement))
+    if not existed:
+        connection.execute(text(_BACKFILL_SQL))
+        if postgres:
+            connection.execute(text(f"SELECT setval('{SEQUENCE}', (SELECT coalesce(max(seq), 0) + 1 FROM {CHANGES_TABLE}), false)"))
+
+@event.listens_for(models.Base.metadata, "after_create")
+def _create_after_tables(target, connection, **kw):
+    if is_supported(connection):
+        create_changes_table(connection)
+
+@event.listens_for(models.Base.metadata, "before_drop")
+def _drop_before_tables(target, connection, **kw):
+    if is_supported(connection):
+        connection.execute(text(f"DROP TABLE IF EXISTS {TOMBSTONES_TABLE}"))
+        connection.execute(text(f"DROP TABLE IF EXISTS {CHANGES_TABLE}"))
+        if connection.dialect.name == "postgresql":
+            # CASCADE drops their triggers too
+            connection.execute(text("DROP FUNCTION IF EXISTS property_changes_listing() CASCADE"))
+            connection.execute(text("DROP FUNCTION IF EXISTS property_changes_image() CASCADE"))
+            connection.execute(text(f"DROP SEQUENCE IF EXISTS {SEQUENCE}"))
+
+# --- QUERIES ---
+def changes_query(since: int, limit: int, owner_id: Optional[int] = None):
+    """
+    Changes after `since` in sequence order: (property_id, seq, created_seq, deleted)
+    rows. For one owner, created_seq is when the listing got that owner, and the
+    listings they lost since the cursor come back as deleted.
+    """
+    c = property_changes.c
+    if owner_id is None:
+        # Created and deleted since the cursor: the client never saw it
+        return (
+            select(c.property_id, c.seq, c.created_seq, c.deleted)
+            .where(c.seq > since, (c.deleted == 0) | (c.created_seq <= since))
+            .order_by(c.seq)
+            .limit(limit)
+        )
+    t = owner_tombstones.c
+    owned = select(c.property_id, c.seq, c.owned_seq.label("created_seq"), c.deleted).where(
+        c.owner_id == owner_id, c.seq > since, (c.deleted == 0) | (c.owned_seq <= since))
+    lost = select(t.property_id, t.seq, t.owned_seq.label("created_seq"), literal(1).label("deleted")).where(
+        t.owner_id == owner_id, t.seq > since, t.owned_seq <= since)
+    feed = union_all(owned, lost).subquery()
+    return select(feed).order_by(feed.c.seq).limit(limit)
+
+def latest_seq_query():
+    return select(property_changes.c.seq).order_by(property_changes.c.seq.desc()).limit(1)
@@ -1,20 +1,187 @@
-from sqlalchemy import create_engine
+import threading
+from typing import Callable, List
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
 
-# ✅ CHANGED FILENAME TO FORCE RESET
-SQLALCHEMY_DATABASE_URL = "sqlite:///./smartestate_v2.db"
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    # Applied on every new connection: WAL lets readers run alongside the writer,
+    # synchronous=NORMAL is safe with WAL and avoids an fsync per commit
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+# Async drivers for the API: aiosqlite for SQLite, asyncpg for PostgreSQL
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+# Sync drivers for a URL naming none (workers, scripts): the ones in requirements.txt
+SYNC_DRIVERS = {"postgresql": "psycopg"}
+
+def _engine_options(url: str) -> dict:
+    """Engine tuned for the backend: pragmas for SQLite, a real pool for PostgreSQL."""
+    pool = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        options = {"connect_args": {"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000}}
+        if parsed.database not in (None, "", ":memory:"):
+            options.update(pool)  # in-memory databases use a single shared connection instead
+        return options
+    return {**pool, "pool_recycle": settings.DB_POOL_RECYCLE, "pool_pre_ping": True}
+
+def _add_sqlite_pragmas(url: str, sync_engine) -> None:
+    if make_url(url).get_backend_name() == "sqlite" and make_url(url).database not in (None, "", ":memory:"):
+        event.listen(sync_engine, "connect", _sqlite_pragmas)
+
+def to_sync_url(url: str) -> str:
+    """postgresql://... -> postgresql+psycopg://...; a URL naming its driver is kept."""
+    parsed = make_url(url)
+    driver = SYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None or "+" in parsed.drivername:
+        return url
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+def build_engine(url: str):
+    engine = create_engine(to_sync_url(url), **_engine_options(url))
+    _add_sqlite_pragmas(url, engine)
+    return engine
+
+def to_async_url(url: str) -> str:
+    """sqlite:///x.db -> sqlite+aiosqlite:///x.db, postgresql://... -> postgresql+asyncpg://..."""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        return url
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+def build_async_engine(url: str):
+    async_url = to_async_url(url)
+    engine = create_async_engine(async_url, **_engine_options(url))
+    _add_sqlite_pragmas(url, engine.sync_engine)
+    return engine
+
+# --- LAZY ENGINES ---
+# Engines and session factories are built on first use (database.engine,
+# database.AsyncSessionLocal, ...), so importing the app opens no pools and
+# loads no drivers; dispose_engines() drops them again on shutdown.
+_LAZY: dict = {
+    "engine": lambda: build_engine(SQLALCHEMY_DATABASE_URL),
+    "SessionLocal": lambda: sessionmaker(autocommit=False, autoflush=False, bind=_resource("engine")),
+    # Read replica (falls back to the primary when DATABASE_READ_URL is not set)
+    "read_engine": lambda: build_engine(settings.DATABASE_READ_URL) if settings.DATABASE_READ_URL else _resource("engine"),
+    "ReadSessionLocal": lambda: sessionmaker(autocommit=False, autoflush=False, bind=_resource("read_engine")),
+    # --- ASYNC (used by the API endpoints) ---
+    # expire_on_commit=False: objects stay readable after commit without a lazy reload
+    "async_engine": lambda: build_async_engine(SQLALCHEMY_DATABASE_URL),
+    "AsyncSessionLocal": lambda: async_sessionmaker(
+        _resource("async_engine"), class_=AsyncSession, autoflush=False, expire_on_commit=False),
+    "async_read_engine": lambda: (
+        build_async_engine(settings.DATABASE_READ_URL) if settings.DATABASE_READ_URL else _resource("async_engine")),
+    "AsyncReadSessionLocal": lambda: async_sessionmaker(
+        _resource("async_read_engine"), class_=AsyncSession, autoflush=False, expire_on_commit=False),
+}
+_ENGINES = ("engine", "read_engine", "async_engine", "async_read_engine")
+_lazy_lock = threading.RLock()
+_engine_hooks: List[Callable] = []
+_hooked: set = set()
+
+def _run_engine_hooks(engine) -> None:
+    sync_engine = getattr(engine, "sync_engine", engine)
+    for hook in _engine_hooks:
+        if (id(hook), id(sync_engine)) not in _hooked:
+            _hooked.add((id(hook), id(sync_engine)))
+            hook(sync_engine)
+
+def _resource(name: str):
+    value = globals().get(name)
+    if value is None:
+        with _lazy_lock:
+            value = globals().get(name)
+            if value is None:
+                value = _LAZY[name]()
+                if name in _ENGINES:
+                    _run_engine_hooks(value)
+                globals()[name] = value
+    return value
+
+def __getattr__(name: str):
+    if name in _LAZY:
+        return _resource(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def on_engine_created(hook: Callable) -> None:
+    """Runs hook(sync_engine) for every engine, already built or built later (e.g. metrics)."""
+    with _lazy_lock:
+        _engine_hooks.append(hook)
+        for name in _ENGINES:
+            if globals().get(name) is not None:
+                _run_engine_hooks(globals()[name])
+
+async def dispose_engines() -> None:
+    """Closes the pools; the next use builds fresh engines."""
+    with _lazy_lock:
+        built = {name: globals().pop(name) for name in list(_LAZY) if globals().get(name) is not None}
+    for name in _ENGINES:
+        engine = built.get(name)
+        if engine is None:
+            continue
+        if hasattr(engine, "sync_engine"):
+            await engine.dispose()
+        else:
+            engine.dispose()
+
+def _metadata():
+    """The tables, with the modules that hook their DDL (triggers, FTS5, R*Tree, ...) onto create_all / drop_all."""
+    from app.db import changes, facets, fulltext, geo, models  # noqa: F401
+    return models.Base.metadata
+
+def init_db(bind=None) -> None:
+    """Creates missing tables, columns, indexes and triggers. Idempotent."""
+    _metadata().create_all(bind=bind or _resource("engine"))
+
+def drop_db(bind=None) -> None:
+    """Drops everything init_db creates (seed.py's reset)."""
+    _metadata().drop_all(bind=bind or _resource("engine"))
 
 Base = declarative_base()
 
 def get_db():
-    db = SessionLocal()
+    db = _resource("SessionLocal")()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_read_db():
+    """For GET endpoints. A replica may lag a little behind writes."""
+    db = _resource("ReadSessionLocal")()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with _resource("AsyncSessionLocal")() as db:
+        yield db
+
+async def get_async_read_db():
+    """Async twin of get_read_db."""
+    async with _resource("AsyncReadSessionLocal")() as db:
+        yield db
+
+if __name__ == "__main__":
+    print("🏗️ Creating missing tables and indexes...")
+    init_db()
+    print("✅ Database schema is up to date!")
@@ -0,0 +1,128 @@
+# app/db/export.py
+"""
+Streaming listing export to CSV or NDJSON (the formats bulk_import reads, so
+a dump can be imported elsewhere as-is).
+
+Listings come off one server-side cursor in id order, `yield_per` rows at a
+time; each batch fetches its images with one IN query and is encoded into
+one chunk. Memory is bounded by the batch size however large the table is.
+
+CLI:
+    python -m app.db.export --format csv > listings.csv
+    python -m app.db.export --format ndjson --owner-id 3 --modified-since 2026-10-01 -o changed.ndjson
+"""
+import argparse
+import csv
+import io
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+from sqlalchemy import select
+from app.core import responses
+from app.db import database, models
+
+BATCH_SIZE = 2000
+FORMATS = ("csv", "ndjson")
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+_table = models.Property.__table__
+FIELDS = (
+    "id", "title", "description", "price", "location", "city", "suburb", "bedrooms", "bathrooms", "land_size",
+    "listing_status", "property_type", "latitude", "longitude", "ownership_status", "water_source",
+    "electricity_status", "owner_id", "risk_score", "risk_notes", "updated_at",
+)
+
+def _naive_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    # updated_at is stored as naive UTC
+    if moment is not None and moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+def _select(owner_id: Optional[int], modified_since: Optional[datetime], modified_before: Optional[datetime]):
+    stmt = select(*(_table.c[name] for name in FIELDS)).order_by(_table.c.id)
+    if owner_id is not None:
+        stmt = stmt.where(_table.c.owner_id == owner_id)
+    if modified_since is not None:
+        stmt = stmt.where(_table.c.updated_at >= modified_since)
+    if modified_before is not None:
+        stmt = stmt.where(_table.c.updated_at < modified_before)
+    return stmt
+
+def _images(connection, property_ids: List[int]) -> Dict[int, List[str]]:
+    images = models.PropertyImage.__table__
+    stmt = (
+        select(images.c.property_id, images.c.image_url)
+        .where(images.c.property_id.in_(property_ids))
+        .order_by(images.c.property_id, images.c.id)
+    )
+    found: Dict[int, List[str]] = {}
+    for property_id, url in connection.execute(stmt):
+        found.setdefault(property_id, []).append(url)
+    return found
+
+# --- ENCODERS (one call per batch) ---
+def _csv_chunk(rows: List[dict], header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(FIELDS + ("images",))
+    for row in rows:
+        values = [row[name] for name in FIELDS]
+        values[FIELDS.index("updated_at")] = row["updated_at"].isoformat() if row["updated_at"] else None
+        writer.writerow(values + ["|".join(row["images"])])  # '|'-separated, as bulk_import reads it
+    return buffer.getvalue().encode()
+
+def _ndjson_chunk(rows: List[dict], header: bool) -> bytes:
+    return b"".join(
+        responses.dumps({**row, "images": [{"image_url": url} for url in row["images"]]}) + b"\n" for row in rows
+    )
+
+_ENCODERS = {"csv": _csv_chunk, "ndjson": _ndjson_chunk}
+
+def stream_listings(
+        fmt: str = "ndjson",
+        owner_id: Optional[int] = None,
+        modified_since: Optional[datetime] = None,
+        modified_before: Optional[datetime] = None,
+        batch_size: int = BATCH_SIZE,
+        bind=None,
+) -> Iterator[bytes]:
+    """Yields the export one encoded batch at a time. The connection is held until the generator finishes or is closed."""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    encode = _ENCODERS[fmt]
+    header = True
+    with (bind or database.read_engine).connect() as connection:
+        result = connection.execution_options(yield_per=batch_size).execute(
+            _select(owner_id, _naive_utc(modified_since), _naive_utc(modified_before)))
+        for partition in result.mappings().partitions():
+            rows = [dict(row) for row in partition]
+            images = _images(connection, [row["id"] for row in rows])
+            for row in rows:
+                row["images"] = images.get(row["id"], [])
+            yield encode(rows, header)
+            header = False
+    if header and fmt == "csv":  # nothing matched: still a valid CSV with its header
+        yield encode([], True)
+
+# --- CLI ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export listings as CSV or NDJSON")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--owner-id", type=int)
+    parser.add_argument("--modified-since", type=datetime.fromisoformat, help="UTC, e.g. 2026-10-01 or 2026-10-01T06:00")
+    parser.add_argument("--modified-before", type=datetime.fromisoformat, help="UTC, exclusive")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("-o", "--output", help="File to write (default: stdout)")
+    args = parser.parse_args()
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        written = 0
+        for chunk in stream_listings(args.format, args.owner_id, args.modified_since, args.modified_before, args.batch_size):
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.output:
+            out.close()
+    print(f"✅ Exported {written / 1024 / 1024:.1f} MB ({args.format})", file=sys.stderr)
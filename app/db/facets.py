@@ -0,0 +1,222 @@
+# app/db/facets.py
+"""
+Facet counts for the search UI (city, suburb, type, status, bedrooms, price bucket).
+
+A summary table with one row per combination of the faceted values and the
+number of listings that have it, kept up to date by triggers (SQLite ones like
+the FTS5 and R*Tree indexes', a plpgsql one on PostgreSQL, like the change
+feed's), so ORM writes, bulk imports and scripts all maintain it.
+It has a few thousand rows where `properties` has hundreds of thousands, so
+the GROUP BYs behind a facet response only touch the summary.
+
+Counts are filter-aware the usual way: each facet is counted with every filter
+except its own, so picking "Borrowdale" still shows the other suburbs' counts.
+Filters on the faceted values themselves are answered from the summary; any
+other filter (owner, price range, bathrooms, ...) and other databases fall
+back to the same GROUP BYs over `properties`.
+
+Rebuild for an existing database:
+    python -m app.db.facets
+"""
+from typing import Callable, Dict, Optional
+from sqlalchemy import String, case, cast, column, event, func, inspect, literal, select, table, text, union_all
+from app.db import database, models
+
+FACETS_TABLE = "property_facets"
+
+# Lower edges of the price buckets (USD); rentals fall in the first few
+PRICE_BUCKETS = (0, 500, 1_000, 2_500, 50_000, 100_000, 250_000, 500_000, 1_000_000)
+DIMENSIONS = ("city", "suburb", "property_type", "listing_status", "bedrooms", "price")
+
+def _bucket_sql(price: str) -> str:
+    edges = " ".join(f"WHEN {price} >= {edge} THEN {edge}" for edge in reversed(PRICE_BUCKETS[1:]))
+    return f"CASE {edges} ELSE 0 END"
+
+# NULLs are stored as '' / -1 so they take part in the primary key like any other value
+def _key_sql(row: str) -> str:
+    return (f"coalesce({row}.city, ''), coalesce({row}.suburb, ''), coalesce({row}.property_type, ''), "
+            f"coalesce({row}.listing_status, ''), coalesce({row}.bedrooms, -1), {_bucket_sql(f'{row}.price')}")
+
+_KEY_COLUMNS = "city, suburb, property_type, listing_status, bedrooms, price_from"
+_MATCH_OLD = (f"({_KEY_COLUMNS}) = ({_key_sql('old')})")
+
+_TABLE_DDL = f"""CREATE TABLE IF NOT EXISTS {FACETS_TABLE} (
+        city TEXT NOT NULL, suburb TEXT NOT NULL, property_type TEXT NOT NULL, listing_status TEXT NOT NULL,
+        bedrooms INTEGER NOT NULL, price_from INTEGER NOT NULL, listings INTEGER NOT NULL,
+        PRIMARY KEY ({_KEY_COLUMNS})
+    )"""
+
+_SQLITE_DDL = [
+    _TABLE_DDL + " WITHOUT ROWID",
+    f"""CREATE TRIGGER IF NOT EXISTS property_facets_ai AFTER INSERT ON properties BEGIN
+        INSERT INTO {FACETS_TABLE} VALUES ({_key_sql('new')}, 1)
+            ON CONFLICT ({_KEY_COLUMNS}) DO UPDATE SET listings = listings + 1;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS property_facets_ad AFTER DELETE ON properties BEGIN
+        UPDATE {FACETS_TABLE} SET listings = listings - 1 WHERE {_MATCH_OLD};
+        DELETE FROM {FACETS_TABLE} WHERE {_MATCH_OLD} AND listings <= 0;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS property_facets_au
+        AFTER UPDATE OF city, suburb, property_type, listing_status, bedrooms, price ON properties BEGIN
+        UPDATE {FACETS_TABLE} SET listings = listings - 1 WHERE {_MATCH_OLD};
+        DELETE FROM {FACETS_TABLE} WHERE {_MATCH_OLD} AND listings <= 0;
+        INSERT INTO {FACETS_TABLE} VALUES ({_key_sql('new')}, 1)
+            ON CONFLICT ({_KEY_COLUMNS}) DO UPDATE SET listings = listings + 1;
+    END""",
+]
+
+_POSTGRES_DDL = [
+    _TABLE_DDL,
+    f"""CREATE OR REPLACE FUNCTION property_facets_count() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE {FACETS_TABLE} SET listings = listings - 1 WHERE {_MATCH_OLD};
+            DELETE FROM {FACETS_TABLE} WHERE {_MATCH_OLD} AND listings <= 0;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO {FACETS_TABLE} VALUES ({_key_sql('new')}, 1)
+                ON CONFLICT ({_KEY_COLUMNS}) DO UPDATE SET listings = {FACETS_TABLE}.listings + 1;
+        END IF;
+        RETURN NULL;
+    END $$""",
+    # CREATE TRIGGER has no IF NOT EXISTS before PostgreSQL 14
+    """DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'property_facets_count') THEN
+            CREATE TRIGGER property_facets_count
+                AFTER INSERT OR DELETE OR UPDATE OF city, suburb, property_type, listing_status, bedrooms, price
+                ON properties FOR EACH ROW EXECUTE FUNCTION property_facets_count();
+        END IF;
+    END $$""",
+]
+
+_REBUILD_SQL = [
+    f"DELETE FROM {FACETS_TABLE}",
+    f"INSERT INTO {FACETS_TABLE} SELECT {_key_sql('properties')}, count(*) FROM properties GROUP BY 1, 2, 3, 4, 5, 6",
+]
+
+# Lightweight handle for building queries (the summary table is not part of Base.metadata)
+property_facets = table(
+    FACETS_TABLE, column("city"), column("suburb"), column("property_type"), column("listing_status"),
+    column("bedrooms"), column("price_from"), column("listings"),
+)
+
+def is_supported(bind) -> bool:
+    return bind.dialect.name in ("sqlite", "postgresql")
+
+def create_facets_table(connection) -> None:
+    existed = inspect(connection).has_table(FACETS_TABLE)
+    for statement in _POSTGRES_DDL if connection.dialect.name == "postgresql" else _SQLITE_DDL:
+        connection.execute(text(statement))
+    if not existed:  # databases that already have listings start with correct counts
+        for statement in _REBUILD_SQL:
+            connection.execute(text(statement))
+
+def rebuild_facets(bind=None) -> None:
+    bind = bind or database.engine
+    with bind.begin() as connection:
+        create_facets_table(connection)
+        for statement in _REBUILD_SQL:
+            connection.execute(text(statement))
+
+@event.listens_for(models.Base.metadata, "after_create")
+def _create_after_tables(target, connection, **kw):
+    if is_supported(connection):
+        create_facets_table(connection)
+
+@event.listens_for(models.Base.metadata, "before_drop")
+def _drop_before_tables(target, connection, **kw):
+    if is_supported(connection):
+        connection.execute(text(f"DROP TABLE IF EXISTS {FACETS_TABLE}"))
+        if connection.dialect.name == "postgresql":
+            # CASCADE drops its trigger too
+            connection.execute(text("DROP FUNCTION IF EXISTS property_facets_count() CASCADE"))
+
+# --- QUERIES ---
+def _price_bucket_expr(price):
+    whens = [(price >= edge, edge) for edge in reversed(PRICE_BUCKETS[1:])]
+    return case(*whens, else_=0)
+
+def _sources(use_summary: bool):
+    """-> (dimension -> column, count expression, base select) for the summary or the live table."""
+    if use_summary:
+        c = property_facets.c
+        columns = {"city": c.city, "suburb": c.suburb, "property_type": c.property_type,
+                   "listing_status": c.listing_status, "bedrooms": c.bedrooms, "price": c.price_from}
+        return columns, func.sum(c.listings), property_facets
+    p = models.Property
+    columns = {"city": p.city, "suburb": p.suburb, "property_type": p.property_type,
+               "listing_status": p.listing_status, "bedrooms": p.bedrooms, "price": _price_bucket_expr(p.price)}
+    return columns, func.count(), p
+
+def _apply(stmt, columns, filters: Dict[str, object], skip: Optional[str] = None):
+    for name, value in filters.items():
+        if name == skip or value is None:
+            continue
+        # bedrooms is a minimum, like on GET /properties; everything else is an exact match
+        stmt = stmt.where(columns[name] >= value if name == "bedrooms" else columns[name] == value)
+    return stmt
+
+def facet_query(filters: Dict[str, object], use_summary: bool, refine: Optional[Callable] = None):
+    """
+    One UNION ALL statement returning (facet, value, count) rows: one group per
+    dimension (counted without that dimension's own filter) plus a "total" row.
+    `refine` applies further filters and is only valid against the live table.
+    """
+    columns, count, source = _sources(use_summary)
+    parts = []
+    for name in ("total",) + DIMENSIONS:
+        value = literal(None, String) if name == "total" else cast(columns[name], String)
+        stmt = select(literal(name).label("facet"), value.label("value"), count.label("count")).select_from(source)
+        stmt = _apply(stmt, columns, filters, skip=name)
+        if refine is not None:
+            stmt = refine(stmt)
+        if name != "total":
+            stmt = stmt.group_by(columns[name])
+        parts.append(stmt)
+    return union_all(*parts)
+
+def _price_label(edge: int) -> str:
+    def short(amount: int) -> str:
+        if amount >= 1_000_000:
+            return f"${amount / 1_000_000:g}M"
+        return f"${amount / 1000:g}k" if amount >= 1000 else f"${amount}"
+    index = PRICE_BUCKETS.index(edge)
+    if index + 1 == len(PRICE_BUCKETS):
+        return f"{short(edge)}+"
+    return f"{short(edge)} - {short(PRICE_BUCKETS[index + 1])}"
+
+def format_counts(rows, use_summary: bool) -> dict:
+    """(facet, value, count) rows -> {"total": n, "facets": {dimension: [{"value", "count"}, ...]}}"""
+    total = 0
+    facets = {name: [] for name in DIMENSIONS}
+    for facet, value, count in rows:
+        if facet == "total":
+            total = int(count or 0)
+            continue
+        if not count:
+            continue
+        if facet in ("bedrooms", "price"):
+            value = int(float(value)) if value is not None else None
+            if use_summary and facet == "bedrooms" and value == -1:
+                value = None
+        elif use_summary and value == "":
+            value = None
+        item = {"value": value, "count": int(count)}
+        if facet == "price":
+            index = PRICE_BUCKETS.index(value)
+            item["min_price"] = value
+            item["max_price"] = PRICE_BUCKETS[index + 1] if index + 1 < len(PRICE_BUCKETS) else None
+            item["label"] = _price_label(value)
+        facets[facet].append(item)
+
+    for name, items in facets.items():
+        if name in ("bedrooms", "price"):
+            items.sort(key=lambda item: (item["value"] is None, item["value"] or 0))
+        else:
+            items.sort(key=lambda item: (-item["count"], item["value"] or ""))
+    return {"total": total, "facets": facets}
+
+if __name__ == "__main__":
+    print("📊 Rebuilding facet counts...")
+    rebuild_facets()
+    print("✅ Facet counts rebuilt!")
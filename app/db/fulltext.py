@@ -0,0 +1,111 @@
+# app/db/fulltext.py
+"""
+SQLite FTS5 index over properties.title / properties.description.
+
+The index is an external-content table (it stores no second copy of the text)
+kept in sync by triggers, so every insert/update/delete on `properties` - ORM,
+bulk SQL or seed scripts - updates it in the same transaction. Added to a
+database that already has listings, it is rebuilt from them first: they would
+be missing from search, and the triggers' 'delete' of a row never indexed
+corrupts an external-content index.
+
+Rebuild for an existing database:
+    python -m app.db.fulltext
+"""
+import re
+from sqlalchemy import column, event, false, func, inspect, literal_column, table, text
+from app.db import database, models
+
+FTS_TABLE = "properties_fts"
+
+_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description,
+        content='properties', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS properties_fts_ai AFTER INSERT ON properties BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS properties_fts_ad AFTER DELETE ON properties BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS properties_fts_au AFTER UPDATE OF title, description ON properties BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+]
+
+# Lightweight handle for building queries (the virtual table is not part of Base.metadata)
+properties_fts = table(FTS_TABLE, column("rowid"), column(FTS_TABLE))
+
+# Title hits count 10x a description hit
+_BM25 = func.bm25(literal_column(FTS_TABLE), 10.0, 1.0)
+_SNIPPET = func.snippet(literal_column(FTS_TABLE), -1, "<mark>", "</mark>", "…", 12)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+def is_supported(bind) -> bool:
+    return bind.dialect.name == "sqlite"
+
+_REBUILD_SQL = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+
+def create_fulltext_index(connection) -> None:
+    existed = inspect(connection).has_table(FTS_TABLE)
+    for statement in _DDL:
+        connection.execute(text(statement))
+    if not existed:  # databases that already have listings start fully indexed
+        connection.execute(text(_REBUILD_SQL))
+
+def rebuild_fulltext_index(bind=None) -> None:
+    bind = bind or database.engine
+    with bind.begin() as connection:
+        create_fulltext_index(connection)
+        connection.execute(text(_REBUILD_SQL))
+
+@event.listens_for(models.Base.metadata, "after_create")
+def _create_after_tables(target, connection, **kw):
+    if is_supported(connection):
+        create_fulltext_index(connection)
+
+@event.listens_for(models.Base.metadata, "before_drop")
+def _drop_before_tables(target, connection, **kw):
+    if is_supported(connection):
+        connection.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+
+def to_match_expression(q: str) -> str:
+    """
+    Turns user input into a safe FTS5 query: every word is quoted (so operators
+    and punctuation can't break the syntax) and all words must match.
+    """
+    return " ".join(f'"{word}"' for word in _WORD_RE.findall(q))
+
+def apply_text_search(stmt, q: str, bind, order_by_rank: bool = True):
+    """
+    Restricts a Property select() to full-text matches and adds the highlighted
+    snippet as an extra column. Falls back to LIKE on databases without FTS5.
+    `bind` is any engine/connection/session bind, only its dialect is used.
+    """
+    query = stmt
+    if not is_supported(bind):
+        pattern = f"%{q}%"
+        query = query.filter(models.Property.title.ilike(pattern) | models.Property.description.ilike(pattern))
+        return query.add_columns(literal_column("NULL").label("snippet"))
+
+    match = to_match_expression(q)
+    if not match:
+        return query.filter(false()).add_columns(literal_column("NULL").label("snippet"))
+
+    query = (
+        query.join(properties_fts, properties_fts.c.rowid == models.Property.id)
+        .filter(properties_fts.c[FTS_TABLE].op("MATCH")(match))
+        .add_columns(_SNIPPET.label("snippet"))
+    )
+    if order_by_rank:
+        query = query.order_by(_BM25)
+    return query
+
+if __name__ == "__main__":
+    print("🔎 Rebuilding full-text index...")
+    rebuild_fulltext_index()
+    print("✅ Full-text index rebuilt!")
@@ -0,0 +1,143 @@
+# app/db/geo.py
+"""
+Spatial index over properties.latitude / properties.longitude (WGS84 degrees).
+
+- SQLite: an R*Tree virtual table kept in sync by triggers, like the FTS5 index,
+  so ORM writes, bulk imports and scripts all maintain it. Added to a database
+  that already has listings, it is filled from them.
+- Other databases (PostgreSQL): a btree on (latitude, longitude) serves the same
+  bounding-box predicate. The columns are plain WGS84 lat/lng, so a PostGIS
+  geography index can be layered on top without changing the schema.
+
+Radius searches are a bounding-box prefilter on the index plus an exact check
+on the equirectangular distance, which is within 0.5% of the great-circle
+distance at city scale and needs only arithmetic in SQL. Distances returned to
+clients are haversine.
+
+Add the columns / rebuild the index for an existing database:
+    python -m app.db.geo
+"""
+import math
+from typing import NamedTuple
+from sqlalchemy import column, event, inspect, select, table, text
+from app.db import database, models
+
+RTREE_TABLE = "properties_rtree"
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.195  # great-circle km per degree of latitude
+
+_SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {RTREE_TABLE} USING rtree(id, min_lat, max_lat, min_lng, max_lng)",
+    f"""CREATE TRIGGER IF NOT EXISTS properties_rtree_ai AFTER INSERT ON properties
+        WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN
+        INSERT INTO {RTREE_TABLE} VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS properties_rtree_ad AFTER DELETE ON properties BEGIN
+        DELETE FROM {RTREE_TABLE} WHERE id = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS properties_rtree_au AFTER UPDATE OF latitude, longitude ON properties BEGIN
+        DELETE FROM {RTREE_TABLE} WHERE id = old.id;
+        INSERT INTO {RTREE_TABLE} SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude
+            WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+    END""",
+]
+
+_GENERIC_DDL = ["CREATE INDEX IF NOT EXISTS ix_properties_lat_lng ON properties (latitude, longitude)"]
+
+# Lightweight handle for building queries (the virtual table is not part of Base.metadata)
+properties_rtree = table(RTREE_TABLE, column("id"), column("min_lat"), column("max_lat"), column("min_lng"), column("max_lng"))
+
+class BBox(NamedTuple):
+    south: float
+    west: float
+    north: float
+    east: float
+
+def is_rtree_supported(bind) -> bool:
+    return bind.dialect.name == "sqlite"
+
+_REBUILD_SQL = [
+    f"DELETE FROM {RTREE_TABLE}",
+    f"INSERT INTO {RTREE_TABLE} SELECT id, latitude, latitude, longitude, longitude FROM properties "
+    "WHERE latitude IS NOT NULL AND longitude IS NOT NULL",
+]
+
+def create_spatial_index(connection) -> None:
+    models.add_missing_columns(connection)  # databases created before latitude/longitude existed
+    if not is_rtree_supported(connection):
+        for statement in _GENERIC_DDL:
+            connection.execute(text(statement))
+        return
+    existed = inspect(connection).has_table(RTREE_TABLE)
+    for statement in _SQLITE_DDL:
+        connection.execute(text(statement))
+    if not existed:  # databases that already have listings start with them indexed
+        for statement in _REBUILD_SQL:
+            connection.execute(text(statement))
+
+def rebuild_spatial_index(bind=None) -> None:
+    bind = bind or database.engine
+    with bind.begin() as connection:
+        create_spatial_index(connection)
+        if is_rtree_supported(connection):
+            for statement in _REBUILD_SQL:
+                connection.execute(text(statement))
+
+@event.listens_for(models.Base.metadata, "after_create")
+def _create_after_tables(target, connection, **kw):
+    create_spatial_index(connection)
+
+@event.listens_for(models.Base.metadata, "before_drop")
+def _drop_before_tables(target, connection, **kw):
+    if is_rtree_supported(connection):
+        connection.execute(text(f"DROP TABLE IF EXISTS {RTREE_TABLE}"))
+
+# --- QUERY HELPERS ---
+def parse_bbox(value: str) -> BBox:
+    """"min_lng,min_lat,max_lng,max_lat" (the GeoJSON / OGC order) -> BBox."""
+    try:
+        west, south, east, north = (float(part) for part in value.split(","))
+    except ValueError:
+        raise ValueError("bbox must be min_lng,min_lat,max_lng,max_lat")
+    if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180):
+        raise ValueError("bbox is out of range or inverted")
+    return BBox(south, west, north, east)
+
+def radius_bbox(lat: float, lng: float, radius_km: float) -> BBox:
+    dlat = radius_km / KM_PER_DEGREE
+    dlng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    return BBox(max(lat - dlat, -90.0), max(lng - dlng, -180.0), min(lat + dlat, 90.0), min(lng + dlng, 180.0))
+
+def within_bbox(stmt, bbox: BBox, bind):
+    lat, lng = models.Property.latitude, models.Property.longitude
+    stmt = stmt.filter(lat.between(bbox.south, bbox.north), lng.between(bbox.west, bbox.east))
+    if is_rtree_supported(bind):
+        # The R*Tree answers the box; the exact column checks above absorb its float32 rounding
+        candidates = select(properties_rtree.c.id).where(
+            properties_rtree.c.max_lat >= bbox.south, properties_rtree.c.min_lat <= bbox.north,
+            properties_rtree.c.max_lng >= bbox.west, properties_rtree.c.min_lng <= bbox.east,
+        )
+        stmt = stmt.filter(models.Property.id.in_(candidates))
+    return stmt
+
+def squared_distance(lat: float, lng: float):
+    """Equirectangular squared distance in km², as a SQL expression (orders like the true distance)."""
+    kx = KM_PER_DEGREE * math.cos(math.radians(lat))
+    dy = (models.Property.latitude - lat) * KM_PER_DEGREE
+    dx = (models.Property.longitude - lng) * kx
+    return dx * dx + dy * dy
+
+def within_radius(stmt, lat: float, lng: float, radius_km: float, bind):
+    stmt = within_bbox(stmt, radius_bbox(lat, lng, radius_km), bind)
+    return stmt.filter(squared_distance(lat, lng) <= radius_km * radius_km)
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlmb = phi2 - phi1, math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+if __name__ == "__main__":
+    print("🗺️ Rebuilding spatial index...")
+    rebuild_spatial_index()
+    print("✅ Spatial index rebuilt!")
@@ -1,7 +1,12 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, DateTime, Index, event, inspect
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 
+def utcnow() -> datetime:
+    # Naive UTC, the form SQLite round-trips
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 # --- 1. USER MODEL (Updated with new fields) ---
 class User(Base):
     __tablename__ = "users"
@@ -32,8 +37,25 @@ class Property(Base):
     listing_status = Column(String)
     property_type = Column(String)
 
-    # AI Risk Score
+    # Map position (WGS84). Spatially indexed by app/db/geo.py
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+
+    # Due-diligence data (used by the risk scorer)
+    ownership_status = Column(String, nullable=True)    # title_deed, sectional_title, cession, ...
+    water_source = Column(String, nullable=True)        # municipal, borehole, both, none
+    electricity_status = Column(String, nullable=True)  # good, intermittent, solar, none
+
+    # AI Risk Score (app/core/risk.py). risk_version is the rule set that scored
+    # the row; NULL means "needs (re)scoring" and is picked up by the batch job
     risk_score = Column(Integer, default=0)
+    risk_notes = Column(Text, nullable=True)
+    risk_version = Column(Integer, nullable=True)
+
+    # Naive UTC, set by SQLAlchemy on ORM and Core inserts/updates alike; NULL
+    # for rows that predate the columns. Clients sync through app/db/changes.py
+    created_at = Column(DateTime, default=utcnow, nullable=True)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow, nullable=True)
 
     # Owner Link
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -42,12 +64,127 @@ class Property(Base):
     # Images
     images = relationship("PropertyImage", back_populates="property", cascade="all, delete-orphan")
 
+    # Composite indexes for the search filters on GET /properties.
+    # Equality columns go first, then price so range filters + keyset paging stay on the index.
+    __table_args__ = (
+        Index("ix_properties_city_suburb_price", "city", "suburb", "price", "id"),
+        Index("ix_properties_type_status_price", "property_type", "listing_status", "price", "id"),
+        Index("ix_properties_price_id", "price", "id"),
+        Index("ix_properties_owner_id", "owner_id", "id"),
+        Index("ix_properties_risk_version", "risk_version", "id"),
+        Index("ix_properties_created_at", "created_at", "id"),
+        Index("ix_properties_updated_at", "updated_at", "id"),
+    )
+
 # --- 3. IMAGE MODEL ---
 class PropertyImage(Base):
     __tablename__ = "property_images"
 
     id = Column(Integer, primary_key=True, index=True)
-    property_id = Column(Integer, ForeignKey("properties.id"))
+    property_id = Column(Integer, ForeignKey("properties.id"), index=True)
     image_url = Column(String)
 
-    property = relationship("Property", back_populates="images")
\ No newline at end of file
+    property = relationship("Property", back_populates="images")
+
+# --- 4. INQUIRY OUTBOX ---
+class Inquiry(Base):
+    """
+    Buyer -> seller inquiries. The contact endpoint only inserts a row (in the
+    request transaction); app/core/outbox.py delivers pending rows in batches.
+    """
+    __tablename__ = "inquiry_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    property_id = Column(Integer, ForeignKey("properties.id"))
+    idempotency_key = Column(String, unique=True)  # repeat submissions collapse into one row
+    name = Column(String)
+    email = Column(String)
+    phone = Column(String)
+    message = Column(Text)
+
+    # Delivery state: pending -> sent, or failed after OUTBOX_MAX_ATTEMPTS
+    status = Column(String, default="pending")
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=utcnow)  # also the lease expiry while a worker holds the row
+    claimed_by = Column(String, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_inquiry_outbox_due", "status", "next_attempt_at", "id"),
+        Index("ix_inquiry_outbox_claimed_by", "claimed_by"),
+    )
+
+# --- 5. SAVED SEARCHES ---
+class SavedSearch(Base):
+    """
+    A buyer's search (the filters interpret_search_query returns), alerted on
+    new matching listings by app/core/alerts.py. `token` authorizes reading and
+    deleting it (the unsubscribe link), buyers don't need an account.
+    """
+    __tablename__ = "saved_searches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    email = Column(String)
+    name = Column(String, nullable=True)
+    query = Column(Text, nullable=True)  # the natural-language search it came from, if any
+    token = Column(String)
+
+    # Filters; NULL means "any". bedrooms is a minimum, like on GET /properties
+    min_price = Column(Float, nullable=True)
+    max_price = Column(Float, nullable=True)
+    city = Column(String, nullable=True)
+    suburb = Column(String, nullable=True)
+    bedrooms = Column(Integer, nullable=True)
+    property_type = Column(String, nullable=True)
+
+    created_at = Column(DateTime, default=utcnow)
+
+# --- 6. SEARCH ALERT OUTBOX ---
+class SearchAlert(Base):
+    """One new listing matching one saved search, delivered like an inquiry (outbox columns)."""
+    __tablename__ = "search_alerts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    saved_search_id = Column(Integer, ForeignKey("saved_searches.id", ondelete="CASCADE"))
+    property_id = Column(Integer, ForeignKey("properties.id"))
+
+    status = Column(String, default="pending")
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=utcnow)
+    claimed_by = Column(String, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ux_search_alerts_search_property", "saved_search_id", "property_id", unique=True),
+        Index("ix_search_alerts_due", "status", "next_attempt_at", "id"),
+        Index("ix_search_alerts_claimed_by", "claimed_by"),
+    )
+
+# --- 7. SCHEMA UPGRADES ---
+def add_missing_columns(connection) -> None:
+    """
+    create_all only creates missing tables, with their indexes. Columns added to
+    existing tables since (all nullable, so no rewrite) are added here, and so
+    is every declared index they are missing (e.g. the composite ones in
+    __table_args__), which on a large table takes a while the first time.
+    """
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {col["name"] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable and not column.primary_key:
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+@event.listens_for(Base.metadata, "after_create")
+def _upgrade_existing_tables(target, connection, **kw):
+    add_missing_columns(connection)
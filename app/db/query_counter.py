@@ -0,0 +1,80 @@
+# app/db/query_counter.py
+import logging
+import os
+from contextvars import ContextVar
+from typing import Optional
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# --- MODE ---
+# "off"    -> nothing is counted (production default)
+# "warn"   -> count statements, add X-SQL-Query-Count header, log budget overruns
+# "strict" -> same as warn, but a request over its budget raises QueryBudgetExceeded
+MODE = os.getenv("SQL_QUERY_BUDGET", "off").lower()
+
+logger = logging.getLogger(__name__)
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.budget: Optional[int] = None
+
+# The counter object is shared by reference, so statements executed in the
+# threadpool (sync endpoints) still land on the request's counter.
+_current: ContextVar[Optional[QueryCounter]] = ContextVar("sql_query_counter", default=None)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    counter = _current.get()
+    if counter is not None:
+        counter.count += 1
+
+# --- 1. ROUTE BUDGET ---
+def query_budget(max_queries: int):
+    """
+    Declares the SQL statement budget of a route:
+        @router.get("/", dependencies=[Depends(query_budget(2))])
+    """
+    def _declare(request: Request):
+        counter = _current.get()
+        if counter is not None:
+            counter.budget = max_queries
+    return _declare
+
+# --- 2. MIDDLEWARE ---
+class QueryCountMiddleware:
+    """
+    Counts the statements of each HTTP request. The check runs when the response
+    starts, i.e. after serialization, so lazy loads triggered by the response
+    model are included.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        counter = QueryCounter()
+        token = _current.set(counter)
+
+        async def send_with_count(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-sql-query-count", str(counter.count).encode())]
+                if counter.budget is not None and counter.count > counter.budget:
+                    detail = f"{scope['method']} {scope['path']} ran {counter.count} SQL statements (budget {counter.budget})"
+                    if MODE == "strict":
+                        raise QueryBudgetExceeded(detail)
+                    logger.warning("SQL budget exceeded: %s", detail)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            _current.reset(token)
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from datetime import datetime
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 # --- 1. USER SCHEMAS ---
@@ -28,6 +29,11 @@ class PropertyBase(BaseModel):
     land_size: int
     listing_status: str
     property_type: str
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+    ownership_status: Optional[str] = None    # title_deed, sectional_title, cession, leasehold, deceased_estate
+    water_source: Optional[str] = None        # municipal, borehole, both, none
+    electricity_status: Optional[str] = None  # good, intermittent, solar, none
 
 class PropertyCreate(PropertyBase):
     images: Optional[List[dict]] = []
@@ -43,10 +49,43 @@ class Property(PropertyBase):
     owner_id: Optional[int] = None
     images: List[PropertyImage] = []
     risk_score: int = 0
+    risk_notes: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    snippet: Optional[str] = None  # Highlighted match, only set for keyword (q=) searches
+    distance_km: Optional[float] = None  # Only set for searches around a point (lat/lng)
+    similarity: Optional[float] = None  # Only set for similar listings (0..1)
     class Config:
         from_attributes = True
 
-# --- 3. EXTRAS ---
+# --- 3. SAVED SEARCHES ---
+class SearchFilters(BaseModel):
+    # The shape ai_search.interpret_search_query returns
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    city: Optional[str] = None
+    suburb: Optional[str] = None
+    bedrooms: Optional[int] = None  # minimum
+    property_type: Optional[str] = None
+
+class SavedSearchCreate(SearchFilters):
+    email: str
+    name: Optional[str] = None
+    query: Optional[str] = None  # parsed into the filters when none are given
+
+class SavedSearch(SearchFilters):
+    id: int
+    email: str
+    name: Optional[str] = None
+    query: Optional[str] = None
+    created_at: Optional[datetime] = None
+    class Config:
+        from_attributes = True
+
+class SavedSearchCreated(SavedSearch):
+    token: str  # only returned once: needed to read or delete the search
+
+# --- 4. EXTRAS ---
 class ContactRequest(BaseModel):
     name: str
     email: str
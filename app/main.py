@@ -1,28 +1,139 @@
-from fastapi import FastAPI
+import time
+_IMPORT_STARTED = time.perf_counter()  # cold-start clock: everything below counts towards the budget
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.datastructures import Default
 from fastapi.middleware.cors import CORSMiddleware
-from app.db import database, models
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import text
+from app.db import database, query_counter
 from app.api.v1.api import api_router
+from app.core import ai_search, alerts, images, metrics, outbox, ratelimit, responses, similarity, valuation
+from app.core.config import settings
+from app.core.log_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# --- 1. LIFESPAN ---
+# Importing this module touches neither the database nor the network: engines,
+# the OpenAI client and the caches are built on first use, and the schema is
+# created here (DB_INIT_ON_STARTUP) or once per deploy with `python -m app.db.database`.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.ready = False
+    if settings.DB_INIT_ON_STARTUP:
+        # init_db imports the modules that add the FTS5 and R*Tree indexes, the facet summary and the change feed
+        await run_in_threadpool(database.init_db)
+    # Deliver inquiries and saved-search alerts queued before a restart
+    outbox.worker.wake()
+    alerts.worker.wake()
+    # Map (or, on a fresh deploy, build) the similar-listings index and build the
+    # valuation snapshot off the request path
+    similarity.index.warm()
+    valuation.engine.warm()
+
+    app.state.startup_seconds = time.perf_counter() - _IMPORT_STARTED
+    app.state.ready = True
+    log = logger.warning if app.state.startup_seconds > settings.STARTUP_BUDGET_SECONDS else logger.info
+    log("Started in %.3fs (budget %.1fs)", app.state.startup_seconds, settings.STARTUP_BUDGET_SECONDS)
+    yield
+
+    # Drain: fail readiness first so the load balancer stops routing here
+    app.state.ready = False
+    outbox.worker.stop()  # between batches
+    alerts.worker.stop()
+    images.shutdown_pool()
+    await ai_search.close_clients()
+    await database.dispose_engines()
+    ratelimit.buckets.close()
+
+# --- 2. HEALTH ---
+async def live():
+    """Liveness: the process serves requests. Never touches the database."""
+    return {"status": "alive"}
+
+async def _ping_database() -> None:
+    async with database.async_engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+async def ready(request: Request):
+    """Readiness: startup finished, not draining, and the database answers."""
+    if not getattr(request.app.state, "ready", False):
+        return responses.ORJSONResponse({"status": "starting"}, status_code=503)
+    try:
+        # One timeout over checkout and query: an exhausted pool or an unreachable
+        # host would otherwise hold the probe for DB_POOL_TIMEOUT or the TCP timeout
+        await asyncio.wait_for(_ping_database(), settings.READINESS_TIMEOUT_SECONDS)
+    except Exception as exc:
+        logger.warning("Readiness check failed: %s", str(exc) or type(exc).__name__)
+        return responses.ORJSONResponse({"status": "database unavailable"}, status_code=503)
+    return {"status": "ready", "startup_seconds": round(request.app.state.startup_seconds, 3)}
+
+# --- 3. APPLICATION FACTORY ---
+def create_app() -> FastAPI:
+    setup_logging()
+
+    # orjson for routes returning plain dicts; wrapped in Default() so routes with a
+    # response_model keep FastAPI's direct Pydantic-to-bytes serialization
+    app = FastAPI(title="SmartEstate AI API", default_response_class=Default(responses.ORJSONResponse), lifespan=lifespan)
+
+    # --- ADMISSION CONTROL (rate limits + load shedding) ---
+    # Inside CORS, so browsers can read the 429/503 and its Retry-After
+    app.add_middleware(ratelimit.AdmissionMiddleware)
+
+    # --- CRITICAL FIX: ENABLE CORS ---
+    # This allows your Vercel frontend to talk to this Render backend
+    origins = ["*"]  # In production, replace "*" with your Vercel URL
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # --- COMPRESSION (brotli when installed, else gzip; bodies under 1 KB are sent as-is) ---
+    app.add_middleware(responses.CompressionMiddleware, minimum_size=1024)
+
+    # --- SQL QUERY BUDGETS (debug/test only) ---
+    # Set SQL_QUERY_BUDGET=warn or strict to count statements per request
+    if query_counter.MODE != "off":
+        app.add_middleware(query_counter.QueryCountMiddleware)
+
+    # --- METRICS ---
+    # Outermost middleware, so the latency covers CORS and everything below it;
+    # engines are instrumented as they are built
+    database.on_engine_created(metrics.instrument_engine)
+    metrics.register_gauge(
+        "app_startup_seconds", "Seconds from importing app.main to the end of startup",
+        lambda: getattr(app.state, "startup_seconds", 0.0),
+    )
+    app.add_middleware(metrics.MetricsMiddleware)
 
-# Create Database Tables
-models.Base.metadata.create_all(bind=database.engine)
+    # Include Routers
+    app.include_router(api_router, prefix=settings.API_V1_STR)
 
-app = FastAPI(title="SmartEstate AI API")
+    # Uploaded photos and their thumbnails (ETag, Range and long-lived Cache-Control).
+    # Created up front: on a fresh deploy a missing directory would turn every photo 404 into a 500
+    images.UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    app.mount(images.UPLOAD_URL_PREFIX, images.UploadStaticFiles(directory=str(images.UPLOAD_DIR)), name="uploads")
 
-# --- CRITICAL FIX: ENABLE CORS ---
-# This allows your Vercel frontend to talk to this Render backend
-origins = ["*"]  # In production, replace "*" with your Vercel URL
+    @app.get("/")
+    def root():
+        return {"message": "SmartEstate AI Backend is Running!"}
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
-# Include Routers
-app.include_router(api_router, prefix="/api/v1")
+    app.add_api_route("/health/live", live, methods=["GET"], include_in_schema=False)
+    app.add_api_route("/health/ready", ready, methods=["GET"], include_in_schema=False)
+    return app
 
-@app.get("/")
-def root():
-    return {"message": "SmartEstate AI Backend is Running!"}
\ No newline at end of file
+# `uvicorn app.main:app`, or `uvicorn app.main:create_app --factory`
+app = create_app()
@@ -0,0 +1,120 @@
+# benchmarks/async_vs_sync.py
+"""
+Throughput of the listing query on the old sync path (def endpoint + Session,
+runs in Starlette's threadpool) versus the async path (async def + AsyncSession).
+
+Both endpoints run the same query against the same SQLite file, in-process
+through httpx's ASGI transport.
+
+    python -m benchmarks.async_vs_sync --clients 500 --requests 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+# Point the app at a scratch database before anything reads the settings
+_tmpdir = tempfile.mkdtemp(prefix="smartestate-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmpdir}/bench.db")
+# Fail fast instead of after the default 30s when the pool runs dry. Past
+# pool size + overflow concurrent clients the sync path stalls: every threadpool
+# worker waits on the pool while the sessions holding the connections wait for a
+# free thread to run their close(). Raise DB_POOL_SIZE to measure it anyway.
+os.environ.setdefault("DB_POOL_TIMEOUT", "5")
+
+from typing import List
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from app.db import bulk_import, database, models, schemas
+
+PAGE_SIZE = 20
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/sync", response_model=List[schemas.Property])
+    def list_sync(db: Session = Depends(database.get_db)):
+        return (
+            db.query(models.Property)
+            .options(selectinload(models.Property.images))
+            .order_by(models.Property.id)
+            .limit(PAGE_SIZE)
+            .all()
+        )
+
+    @app.get("/async", response_model=List[schemas.Property])
+    async def list_async(db: AsyncSession = Depends(database.get_async_db)):
+        stmt = (
+            select(models.Property)
+            .options(selectinload(models.Property.images))
+            .order_by(models.Property.id)
+            .limit(PAGE_SIZE)
+        )
+        return (await db.execute(stmt)).scalars().all()
+
+    return app
+
+def seed(rows: int) -> None:
+    database.init_db()
+    records = (
+        (i, {
+            "title": f"Listing {i}", "description": "Benchmark listing", "price": 50_000 + i,
+            "location": "Bench", "city": "Harare", "suburb": "Avondale", "bedrooms": 3,
+            "bathrooms": 2, "land_size": 500, "listing_status": "For Sale", "property_type": "House",
+            "images": [{"image_url": f"/uploads/{i}.jpg"}],
+        })
+        for i in range(rows)
+    )
+    bulk_import.import_records(records, owner_id=None)
+
+async def run(client: httpx.AsyncClient, path: str, clients: int, requests_per_client: int) -> dict:
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for _ in range(requests_per_client):
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - started)
+            errors += response.status_code != 200
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": (len(latencies) - errors) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+    }
+
+async def main(args) -> None:
+    seed(args.rows)
+    transport = httpx.ASGITransport(app=build_app(), raise_app_exceptions=False)
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", limits=limits, timeout=120) as client:
+        await run(client, "/sync", 10, 5)   # warm-up
+        await run(client, "/async", 10, 5)
+        for path in ("/sync", "/async"):
+            result = await run(client, path, args.clients, args.requests)
+            print(f"{path:7} clients={args.clients} requests={result['requests']} errors={result['errors']} "
+                  f"rps={result['rps']:.0f} p50={result['p50_ms']:.1f}ms "
+                  f"p95={result['p95_ms']:.1f}ms p99={result['p99_ms']:.1f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync vs async DB path under concurrency")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--rows", type=int, default=5000)
+    asyncio.run(main(parser.parse_args()))
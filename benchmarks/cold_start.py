@@ -0,0 +1,92 @@
+# benchmarks/cold_start.py
+"""
+Cold start: how long a fresh worker takes from process spawn until
+GET /health/ready answers 200 and the first real request is served, i.e. how
+quickly an autoscaled worker takes traffic. Each trial starts a new uvicorn
+process; the first one runs against an empty database, so it includes
+creating the schema (DB_INIT_ON_STARTUP).
+
+    python -m benchmarks.cold_start --trials 5
+    python -m benchmarks.cold_start --database-url sqlite:////data/smartestate.db --budget 1.5
+
+Exits with status 1 when the median time to ready exceeds the budget
+(STARTUP_BUDGET_SECONDS by default).
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.suite import _free_port
+
+def boot(env: dict, timeout: float = 60) -> dict:
+    """Starts one worker -> seconds to ready, to the first listing page, and the app's own startup time."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        env=env, cwd=Path(__file__).resolve().parent.parent,
+    )
+    # one client and a relaxed poll: on a small box the poller must not steal the CPU the worker boots on
+    client = httpx.Client(base_url=url, timeout=1)
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError(f"not ready within {timeout:.0f}s")
+            try:
+                response = client.get("/health/ready")
+                if response.status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.05)
+        ready = time.perf_counter() - started
+        client.get("/api/v1/properties/", timeout=10).raise_for_status()
+        first = time.perf_counter() - started
+        return {"ready": ready, "first_request": first, "app_startup": response.json()["startup_seconds"]}
+    finally:
+        client.close()
+        process.terminate()
+        process.wait(10)
+
+def main(args) -> int:
+    from app.core.config import settings
+
+    budget = args.budget if args.budget is not None else settings.STARTUP_BUDGET_SECONDS
+    with tempfile.TemporaryDirectory(prefix="smartestate-cold-") as scratch:
+        env = os.environ.copy()
+        env["DATABASE_URL"] = args.database_url or f"sqlite:///{scratch}/cold_start.db"
+        trials = []
+        for trial in range(args.trials):
+            result = boot(env)
+            trials.append(result)
+            label = "empty db" if trial == 0 and not args.database_url else "existing db"
+            print(f"  trial {trial + 1} ({label:>11}): ready={result['ready'] * 1000:7.0f}ms "
+                  f"first_request={result['first_request'] * 1000:7.0f}ms app_startup={result['app_startup'] * 1000:7.0f}ms")
+
+    median_ready = statistics.median(t["ready"] for t in trials)
+    print(f"📊 median ready={median_ready * 1000:.0f}ms "
+          f"first_request={statistics.median(t['first_request'] for t in trials) * 1000:.0f}ms "
+          f"(budget {budget * 1000:.0f}ms)")
+    if median_ready > budget:
+        print("❌ Cold start is over budget")
+        return 1
+    print("✅ Cold start within budget")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure worker cold-start time")
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--database-url", help="Existing database (default: a scratch SQLite file)")
+    parser.add_argument("--budget", type=float, help="Seconds to ready (default: STARTUP_BUDGET_SECONDS)")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,341 @@
+# benchmarks/suite.py
+"""
+Per-endpoint load test: p50/p95/p99 latency and throughput for the main API
+routes, compared against a stored baseline to flag regressions.
+
+Targets:
+- inprocess: the app in this process through httpx's ASGI transport (no
+  sockets, so it measures the app itself)
+- uvicorn:   a real server in a subprocess (--workers N), over HTTP
+- --url:     an already running server
+
+The database is a scratch SQLite file filled by benchmarks.synthetic, unless
+--database-url points at an existing one (then --rows 0 skips generation).
+
+    python -m benchmarks.suite --rows 20000 --concurrency 32 --requests 300 --rounds 3
+    python -m benchmarks.suite --target uvicorn --workers 4 --concurrency 64
+    python -m benchmarks.suite --save-baseline      # store this run as the baseline
+    python -m benchmarks.suite --scenario detail --scenario facets
+
+Exits with status 1 when a scenario regressed against the baseline.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    params: Optional[dict] = None
+    json: Optional[dict] = None
+
+class Scenario(NamedTuple):
+    name: str
+    build: Callable[[random.Random, dict], Request]  # (rng, context) -> request
+    write: bool = False
+
+def _suburb(rng: random.Random, ctx: dict) -> tuple:
+    return rng.choice(ctx["suburbs"])  # (city, suburb, lat, lng)
+
+def _listing_id(rng: random.Random, ctx: dict) -> int:
+    return rng.randint(1, ctx["max_id"])
+
+SCENARIOS = [
+    Scenario("list_default", lambda rng, ctx: Request("GET", "/api/v1/properties/", {"limit": 20})),
+    Scenario("list_filtered", lambda rng, ctx: Request("GET", "/api/v1/properties/", {
+        "city": (s := _suburb(rng, ctx))[0], "suburb": s[1], "bedrooms": rng.randint(1, 4),
+        "max_price": rng.choice([100_000, 250_000, 500_000]), "limit": 20})),
+    Scenario("list_grid_projection", lambda rng, ctx: Request("GET", "/api/v1/properties/", {
+        "fields": "id,title,price,suburb,thumbnail", "sort": "price_desc", "city": _suburb(rng, ctx)[0], "limit": 50})),
+    Scenario("list_keyset_deep", lambda rng, ctx: Request("GET", "/api/v1/properties/", {
+        "sort": "price_asc", "after_price": rng.randint(1_000, 400_000), "after_id": _listing_id(rng, ctx), "limit": 20})),
+    Scenario("detail", lambda rng, ctx: Request("GET", f"/api/v1/properties/{_listing_id(rng, ctx)}")),
+    Scenario("facets", lambda rng, ctx: Request("GET", "/api/v1/properties/facets", {
+        "city": _suburb(rng, ctx)[0], "bedrooms": rng.choice([None, 2, 3])})),
+    Scenario("text_search", lambda rng, ctx: Request("GET", "/api/v1/properties/", {
+        "q": rng.choice(["borehole", "swimming pool", "solar backup garden", "walled gated"]), "limit": 20})),
+    Scenario("map_bbox", lambda rng, ctx: Request("GET", "/api/v1/properties/", {
+        "bbox": "{1:.4f},{0:.4f},{3:.4f},{2:.4f}".format((s := _suburb(rng, ctx))[2] - 0.02, s[3] - 0.02, s[2] + 0.02, s[3] + 0.02),
+        "fields": "id,price,latitude,longitude", "limit": 200})),
+    Scenario("nearby", lambda rng, ctx: Request("GET", "/api/v1/properties/", {
+        "lat": (s := _suburb(rng, ctx))[2], "lng": s[3], "radius_km": 3, "sort": "distance", "limit": 20})),
+    Scenario("report", lambda rng, ctx: Request("GET", f"/api/v1/properties/{_listing_id(rng, ctx)}/report")),
+    Scenario("similar", lambda rng, ctx: Request("GET", f"/api/v1/properties/{_listing_id(rng, ctx)}/similar")),
+    Scenario("nl_search", lambda rng, ctx: Request("POST", "/api/v1/properties/search", {
+        "query": f"{rng.randint(2, 4)} bedroom {rng.choice(['house', 'flat'])} in {rng.choice(ctx['places'])} under {rng.choice([150, 300])}k",
+        "limit": 20})),
+    Scenario("create_listing", lambda rng, ctx: Request("POST", "/api/v1/properties/", json={
+        "title": "Bench listing", "description": "Load test", "price": rng.randint(30, 500) * 1000,
+        "location": "Bench", "city": (s := _suburb(rng, ctx))[0], "suburb": s[1], "bedrooms": 3, "bathrooms": 2,
+        "land_size": 600, "listing_status": "For Sale", "property_type": "House"}), write=True),
+    Scenario("contact_seller", lambda rng, ctx: Request("POST", f"/api/v1/properties/{_listing_id(rng, ctx)}/contact", json={
+        "name": "Bench", "email": "bench@example.com", "phone": "0770000000",
+        "message": f"Is this still available? {rng.random()}"}), write=True),
+]
+
+# --- 1. LOAD GENERATION ---
+async def run_scenario(client, scenario: Scenario, ctx: dict, requests: int, concurrency: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    planned = [scenario.build(rng, ctx) for _ in range(requests)]
+    latencies: List[float] = []
+    errors = 0
+    statuses: Dict[int, int] = {}
+    queue = iter(planned)
+
+    async def worker():
+        nonlocal errors
+        for request in queue:  # shared iterator: each request is taken by exactly one worker
+            started = time.perf_counter()
+            try:
+                params = {k: v for k, v in (request.params or {}).items() if v is not None}
+                response = await client.request(request.method, request.path, params=params, json=request.json)
+                status = response.status_code
+            except Exception:
+                status = 0
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+            errors += not (200 <= status < 400)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+        "p50_ms": round(pick(0.50), 2),
+        "p95_ms": round(pick(0.95), 2),
+        "p99_ms": round(pick(0.99), 2),
+    }
+
+def _median_round(rounds: List[dict]) -> dict:
+    """Median of each metric over the rounds (one noisy round can't flag a regression)."""
+    result = dict(rounds[len(rounds) // 2])
+    for metric in ("rps", "mean_ms", "p50_ms", "p95_ms", "p99_ms"):
+        result[metric] = statistics.median(r[metric] for r in rounds)
+    result["requests"] = sum(r["requests"] for r in rounds)
+    result["errors"] = sum(r["errors"] for r in rounds)
+    statuses: Dict[str, int] = {}
+    for r in rounds:
+        for code, count in r["statuses"].items():
+            statuses[code] = statuses.get(code, 0) + count
+    result["statuses"] = statuses
+    result["rounds"] = len(rounds)
+    return result
+
+# --- 2. TARGETS ---
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_uvicorn(workers: int) -> tuple:
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        env=os.environ.copy(),
+        cwd=Path(__file__).resolve().parent.parent,
+    )
+    url = f"http://127.0.0.1:{port}"
+    import httpx
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            if httpx.get(url + "/health/ready", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("uvicorn did not start within 60s")
+
+async def build_context(client, local_db: bool) -> dict:
+    from benchmarks import synthetic
+
+    if local_db:
+        from sqlalchemy import func, select
+        from app.db import database, models
+        with database.SessionLocal() as db:
+            max_id = db.scalar(select(func.max(models.Property.id))) or 1
+    else:  # remote server: assume ids run 1..count
+        max_id = (await client.get("/api/v1/properties/facets")).json()["total"] or 1
+    from app.core import search_parser
+
+    suburbs = [(city, suburb, lat, lng) for city, (_, subs) in synthetic.CITIES.items() for suburb, (_, lat, lng) in subs.items()]
+    # Places the local parser knows, so nl_search measures the API rather than the LLM round trip
+    places = [suburb for _, suburb, _, _ in suburbs if suburb in search_parser.SUBURBS]
+    places += [city for city in synthetic.CITIES if city in search_parser.CITIES]
+    return {"max_id": max_id, "suburbs": suburbs, "places": places}
+
+# --- 3. BASELINES ---
+def compare(results: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> List[str]:
+    """
+    A scenario regresses when its p95 grows by more than `tolerance` (and at
+    least min_delta_ms, so sub-millisecond noise doesn't count), its throughput
+    drops by more than `tolerance`, or it starts returning errors.
+    """
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        p95_delta = current["p95_ms"] - before["p95_ms"]
+        if p95_delta > min_delta_ms and current["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['rps']} -> {current['rps']} req/s")
+        if current["errors"] > before.get("errors", 0):
+            regressions.append(f"{name}: errors {before.get('errors', 0)} -> {current['errors']}")
+    return regressions
+
+def _baseline_path(args) -> Path:
+    if args.baseline:
+        return Path(args.baseline)
+    target = "uvicorn" if args.target == "uvicorn" else "inprocess"
+    return BASELINE_DIR / f"{target}-c{args.concurrency}.json"
+
+# --- 4. MAIN ---
+async def run_suite(args, client, scenarios: List[Scenario]) -> dict:
+    ctx = await build_context(client, local_db=not args.url)
+    results = {}
+    for index, scenario in enumerate(scenarios):
+        await run_scenario(client, scenario, ctx, args.warmup, min(args.concurrency, args.warmup or 1), args.seed + 1000 + index)
+        # A fresh request mix per round, so later rounds aren't all response-cache hits
+        rounds = [await run_scenario(client, scenario, ctx, args.requests, args.concurrency, args.seed + 100 * index + round_)
+                  for round_ in range(args.rounds)]
+        result = _median_round(rounds)
+        results[scenario.name] = result
+        print(f"{scenario.name:22} rps={result['rps']:>8.1f} p50={result['p50_ms']:>7.2f}ms "
+              f"p95={result['p95_ms']:>7.2f}ms p99={result['p99_ms']:>7.2f}ms errors={result['errors']}")
+    return results
+
+async def main(args) -> int:
+    import httpx
+
+    scenarios = [s for s in SCENARIOS if (not args.scenario or s.name in args.scenario) and (args.writes or not s.write or s.name in (args.scenario or ()))]
+    if args.rows:
+        from app.core import images
+        from benchmarks import synthetic
+        if args.scratch_dir:  # keep the generated photos out of the real uploads folder
+            images.UPLOAD_DIR = Path(args.scratch_dir) / "uploads"
+        print(f"🏗️ Generating {args.rows} synthetic listings...")
+        synthetic.populate(args.rows, image_count=args.images, seed=args.seed)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    process = None
+    lifespan = contextlib.AsyncExitStack()
+    try:
+        if args.url or args.target == "uvicorn":
+            url = args.url
+            if not url:
+                process, url = start_uvicorn(args.workers)
+            client = httpx.AsyncClient(base_url=url, limits=limits, timeout=60)
+        else:
+            from app.main import app
+            # startup and shutdown as under a server (schema, outbox worker, engine disposal)
+            await lifespan.enter_async_context(app.router.lifespan_context(app))
+            transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+            client = httpx.AsyncClient(transport=transport, base_url="http://bench", limits=limits, timeout=60)
+        print(f"🚀 {len(scenarios)} scenarios, {args.requests} requests each at concurrency {args.concurrency} "
+              f"({args.url or args.target}{f', {args.workers} workers' if args.target == 'uvicorn' and not args.url else ''})")
+        async with client:
+            results = await run_suite(args, client, scenarios)
+    finally:
+        await lifespan.aclose()
+        if process is not None:
+            process.terminate()
+            process.wait(10)
+
+    run = {
+        "meta": {
+            "target": args.url or args.target, "workers": args.workers, "concurrency": args.concurrency,
+            "requests": args.requests, "rounds": args.rounds, "rows": args.rows, "python": platform.python_version(),
+            "machine": platform.machine(), "cpus": os.cpu_count(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(run, indent=2) + "\n")
+
+    baseline_path = _baseline_path(args)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(run, indent=2) + "\n")
+        print(f"💾 Baseline saved to {baseline_path}")
+        return 0
+    if not baseline_path.exists():
+        print(f"ℹ️ No baseline at {baseline_path} (run with --save-baseline to create one)")
+        return 0
+
+    baseline = json.loads(baseline_path.read_text())
+    differing = [key for key in ("concurrency", "requests", "rows", "cpus", "machine")
+                 if baseline["meta"].get(key) != run["meta"][key]]
+    if differing:
+        print(f"⚠️ Baseline was recorded with different {', '.join(differing)}; numbers may not be comparable")
+    regressions = compare(results, baseline["results"], args.tolerance, args.min_delta_ms)
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) against {baseline_path}:")
+        for line in regressions:
+            print(f"   {line}")
+        return 1
+    print(f"✅ No regressions against {baseline_path}")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-endpoint latency / throughput benchmark")
+    parser.add_argument("--target", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--url", help="Benchmark a running server instead (no data generation)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=300, help="Requests per scenario and round")
+    parser.add_argument("--rounds", type=int, default=3, help="Rounds per scenario; the median round is reported")
+    parser.add_argument("--warmup", type=int, default=50, help="Unmeasured requests per scenario")
+    parser.add_argument("--rows", type=int, default=20_000, help="Synthetic listings to generate (0 = use the database as is)")
+    parser.add_argument("--images", type=int, default=20, help="Synthetic photo pool size")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scenario", action="append", help="Run only these scenarios (repeatable)")
+    parser.add_argument("--writes", action="store_true", help="Include the write scenarios (create_listing, contact_seller)")
+    parser.add_argument("--database-url", help="Default: a scratch SQLite file")
+    parser.add_argument("--baseline", help=f"Baseline file (default: {BASELINE_DIR.name}/<target>-c<concurrency>.json)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Allowed relative p95 / throughput change")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="Ignore p95 increases smaller than this")
+    parser.add_argument("--output", help="Also write this run's results to a JSON file")
+    args = parser.parse_args()
+    if args.url:
+        args.rows = 0
+
+    # Point the app (and a uvicorn child) at the benchmark database before anything reads the settings
+    args.scratch_dir = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    elif not args.url:
+        args.scratch_dir = tempfile.mkdtemp(prefix="smartestate-bench-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{args.scratch_dir}/bench.db"
+        os.environ["SIMILARITY_DIR"] = os.path.join(args.scratch_dir, "similar")
+    os.environ.setdefault("OUTBOX_FILE", os.path.join(tempfile.gettempdir(), "smartestate-bench-outbox.ndjson"))
+    # One client IP sends everything: measure the routes, not the rate limiter
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,217 @@
+# benchmarks/synthetic.py
+"""
+Synthetic listings with Zimbabwe-like distributions, for benchmarks and load tests.
+
+- cities weighted roughly by market size (Harare, then Bulawayo, ...), each with
+  low / medium / high density suburbs that set the price level
+- log-normal prices per suburb tier and property type; rentals priced per month
+- coordinates scattered around real suburb centres
+- 0-6 photos per listing from a pool of generated JPEGs that go through the
+  same variant pipeline as uploads (so thumbnails exist)
+- due-diligence fields (ownership, water, electricity) for the risk scorer
+
+Everything is driven by one seed, so two runs with the same arguments produce
+the same database.
+
+    python -m benchmarks.synthetic --rows 100000 --images 40
+"""
+import argparse
+import hashlib
+import io
+import math
+import random
+import time
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy import text
+from app.core import images, risk
+from app.core.security import get_password_hash
+from app.db import bulk_import, database, models
+
+# city -> (share of listings, {suburb: (tier, lat, lng)}); tier 0 = low density (most expensive).
+# Names match the search parser's gazetteer where it has the suburb.
+CITIES = {
+    "Harare": (0.52, {
+        "Borrowdale": (0, -17.7431, 31.1465), "Mount Pleasant": (0, -17.7667, 31.0500),
+        "Highlands": (0, -17.7956, 31.0972), "Chisipite": (0, -17.7890, 31.1120),
+        "Avondale": (1, -17.7965, 31.0263), "Greendale": (1, -17.8140, 31.1190),
+        "Marlborough": (1, -17.7530, 30.9990), "Hatfield": (1, -17.8710, 31.0880),
+        "Waterfalls": (1, -17.8950, 31.0330), "Madokero": (1, -17.7550, 30.9600),
+        "Budiriro": (2, -17.8950, 30.9300), "Glen View": (2, -17.9000, 30.9550),
+        "Kuwadzana": (2, -17.8300, 30.9300), "Mabvuku": (2, -17.8400, 31.1900),
+        "Highfield": (2, -17.8760, 30.9960),
+    }),
+    "Bulawayo": (0.20, {
+        "Famona": (0, -20.1650, 28.6000), "Hillside": (0, -20.1790, 28.6050),
+        "Burnside": (0, -20.1900, 28.6300), "Khumalo": (1, -20.1350, 28.6050),
+        "Bradfield": (1, -20.1700, 28.5900), "Nkulumane": (2, -20.1900, 28.5000),
+        "Entumbane": (2, -20.1300, 28.5300), "Pumula": (2, -20.1700, 28.4800),
+    }),
+    "Mutare": (0.08, {
+        "Murambi": (0, -18.9580, 32.6500), "Fairbridge Park": (1, -18.9800, 32.6500),
+        "Dangamvura": (2, -19.0100, 32.6300), "Sakubva": (2, -18.9800, 32.6400),
+    }),
+    "Gweru": (0.07, {
+        "Windsor Park": (1, -19.4600, 29.8200), "Senga": (2, -19.5000, 29.8300), "Mkoba": (2, -19.4600, 29.7700),
+    }),
+    "Masvingo": (0.05, {"Rhodene": (1, -20.0600, 30.8300), "Mucheke": (2, -20.0800, 30.8400)}),
+    "Kwekwe": (0.04, {"Newtown": (1, -18.9300, 29.8100), "Amaveni": (2, -18.9400, 29.8300)}),
+    "Victoria Falls": (0.04, {"Aerodrome": (0, -17.9300, 25.8400), "Mkhosana": (2, -17.9400, 25.8200)}),
+}
+
+# Median asking price (USD) of a house for sale, by suburb tier
+TIER_MEDIAN_PRICE = (320_000, 120_000, 38_000)
+# property type -> (share, price factor, bedroom choices); the type names the search parser produces
+PROPERTY_TYPES = {
+    "House": (0.62, 1.0, (2, 3, 3, 4, 4, 5, 6)),
+    "Flat": (0.2, 0.55, (1, 2, 2, 3)),
+    "Land": (0.15, 0.35, (0,)),
+    "Commercial": (0.03, 1.5, (0,)),
+}
+RENTAL_SHARE = 0.3
+RENT_YIELD = 0.006  # monthly rent / sale price
+
+OWNERSHIP = (("title_deed", 0.55), ("sectional_title", 0.12), ("leasehold", 0.1), ("cession", 0.13),
+             ("deceased_estate", 0.03), (None, 0.07))
+WATER = (("borehole", 0.35), ("both", 0.15), ("municipal", 0.4), ("none", 0.03), (None, 0.07))
+ELECTRICITY = (("good", 0.3), ("solar", 0.25), ("intermittent", 0.35), ("none", 0.03), (None, 0.07))
+
+FEATURES = ("borehole", "solar backup", "swimming pool", "servants quarters", "double garage", "walled and gated",
+            "fitted kitchen", "en-suite main bedroom", "established garden", "electric fence", "tarred road",
+            "close to schools", "near shopping centre", "cottage", "water tanks", "open plan lounge")
+
+def _pick(rng: random.Random, weighted) -> object:
+    values, weights = zip(*weighted)
+    return rng.choices(values, weights)[0]
+
+def generate_listings(rows: int, seed: int = 1, image_urls: Optional[List[str]] = None) -> Iterator[Tuple[int, dict]]:
+    """(line, record) pairs in the shape bulk_import.import_records() takes."""
+    rng = random.Random(seed)
+    cities = list(CITIES)
+    city_weights = [CITIES[city][0] for city in cities]
+    types = list(PROPERTY_TYPES)
+    type_weights = [PROPERTY_TYPES[name][0] for name in types]
+
+    for i in range(rows):
+        city = rng.choices(cities, city_weights)[0]
+        suburb, (tier, lat, lng) = rng.choice(list(CITIES[city][1].items()))
+        property_type = rng.choices(types, type_weights)[0]
+        _, price_factor, bedroom_choices = PROPERTY_TYPES[property_type]
+        bedrooms = rng.choice(bedroom_choices)
+        land_size = int(rng.lognormvariate(math.log((2000, 800, 300)[tier]), 0.5))
+        if property_type == "Flat":
+            land_size = int(rng.uniform(50, 150))
+
+        price = TIER_MEDIAN_PRICE[tier] * price_factor * rng.lognormvariate(0, 0.35) * (0.8 + 0.1 * max(bedrooms, 2))
+        listing_status = "For Rent" if property_type != "Land" and rng.random() < RENTAL_SHARE else "For Sale"
+        if listing_status == "For Rent":
+            price *= RENT_YIELD
+        price = round(price, -1 if price < 10_000 else -3)
+
+        features = rng.sample(FEATURES, rng.randint(0, 5))
+        description = (
+            f"{bedrooms}-bedroom {property_type.lower()} in {suburb}, {city}. " if bedrooms else
+            f"{land_size} m² {'stand' if property_type == 'Land' else 'commercial property'} in {suburb}, {city}. "
+        ) + (", ".join(features).capitalize() + "." if features else "")
+        description = description.strip()
+
+        record = {
+            "title": f"{bedrooms} Bed {property_type} in {suburb}" if bedrooms else f"{land_size}m² {'Stand' if property_type == 'Land' else 'Commercial'} in {suburb}",
+            "description": description if rng.random() > 0.05 else None,
+            "price": price,
+            "location": f"{suburb}, {city}",
+            "city": city,
+            "suburb": suburb,
+            "latitude": round(lat + rng.gauss(0, 0.012), 6),
+            "longitude": round(lng + rng.gauss(0, 0.012), 6),
+            "bedrooms": bedrooms,
+            "bathrooms": max(1, bedrooms - rng.randint(0, 2)) if bedrooms else 0,
+            "land_size": land_size,
+            "listing_status": listing_status,
+            "property_type": property_type,
+            "ownership_status": _pick(rng, OWNERSHIP),
+            "water_source": _pick(rng, WATER),
+            "electricity_status": _pick(rng, ELECTRICITY),
+        }
+        if image_urls:
+            record["images"] = [{"image_url": url} for url in rng.sample(image_urls, min(len(image_urls), rng.randint(0, 6)))]
+        yield i, record
+
+def generate_images(count: int, seed: int = 1) -> List[str]:
+    """
+    Draws `count` simple house pictures and stores them like uploads
+    (original + thumb/web variants, named by content hash). Returns web URLs.
+    """
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    images.UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    urls = []
+    for _ in range(count):
+        width, height = 1200, 800
+        img = Image.new("RGB", (width, height), (rng.randint(90, 150), rng.randint(160, 210), 235))
+        draw = ImageDraw.Draw(img)
+        draw.rectangle((0, 560, width, height), fill=(rng.randint(40, 90), rng.randint(120, 170), 50))
+        x0, y0 = rng.randint(150, 450), rng.randint(300, 380)
+        x1 = x0 + rng.randint(400, 600)
+        wall = tuple(rng.randint(150, 240) for _ in range(3))
+        draw.rectangle((x0, y0, x1, 600), fill=wall)
+        draw.polygon([(x0 - 40, y0), ((x0 + x1) // 2, y0 - rng.randint(120, 200)), (x1 + 40, y0)],
+                     fill=(rng.randint(120, 180), 50, 40))
+        for wx in range(x0 + 40, x1 - 60, 120):
+            draw.rectangle((wx, y0 + 60, wx + 60, y0 + 130), fill=(60, 80, 110))
+
+        buffer = io.BytesIO()
+        img.save(buffer, "JPEG", quality=85)
+        data = buffer.getvalue()
+        digest = hashlib.sha256(data).hexdigest()
+        original = images.UPLOAD_DIR / f"{digest}.jpg"
+        if not original.exists():
+            original.write_bytes(data)
+        images.build_variants(str(original), digest, str(images.UPLOAD_DIR))
+        urls.append(f"{images.UPLOAD_URL_PREFIX}/{digest}_web.jpg")
+    return urls
+
+def create_sellers(count: int) -> List[int]:
+    """Agent accounts to own the listings (password: password123)."""
+    hashed = get_password_hash("password123")  # bcrypt once, not per user
+    with database.engine.begin() as connection:
+        existing = {email for (email,) in connection.execute(text("SELECT email FROM users"))}
+        new = [{"email": f"agent{i}@bench.smartestate.co.zw", "hashed_password": hashed, "full_name": f"Agent {i}", "role": "agent"}
+               for i in range(count) if f"agent{i}@bench.smartestate.co.zw" not in existing]
+        if new:
+            connection.execute(models.User.__table__.insert(), new)
+        return [row[0] for row in connection.execute(text("SELECT id FROM users WHERE email LIKE 'agent%@bench.smartestate.co.zw' ORDER BY id"))]
+
+def populate(rows: int, image_count: int = 40, sellers: int = 50, seed: int = 1, score: bool = True) -> dict:
+    """Creates the tables and adds `rows` synthetic listings spread over `sellers` agents."""
+    database.init_db()
+    started = time.perf_counter()
+    urls = generate_images(image_count, seed) if image_count else None
+    seller_ids = create_sellers(sellers)
+    with database.engine.connect() as connection:
+        first_id = (connection.execute(text("SELECT coalesce(max(id), 0) FROM properties")).scalar() or 0) + 1
+
+    result = bulk_import.import_records(generate_listings(rows, seed, urls))
+    # Spread the new listings over the agents in one statement
+    with database.engine.begin() as connection:
+        connection.execute(
+            text("UPDATE properties SET owner_id = :first_seller + (id % :sellers) WHERE id >= :first_id"),
+            {"first_seller": seller_ids[0], "sellers": len(seller_ids), "first_id": first_id},
+        )
+    scored = risk.rescore() if score else None
+    return {**result, "images": len(urls or ()), "sellers": len(seller_ids),
+            "risk_scored": scored and scored["scored"], "total_seconds": round(time.perf_counter() - started, 1)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill the database with synthetic Zimbabwe listings")
+    parser.add_argument("--rows", type=int, default=10_000, help="Listings to add (10k-1M is the tested range)")
+    parser.add_argument("--images", type=int, default=40, help="Size of the photo pool (0 = no photos)")
+    parser.add_argument("--sellers", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-risk", action="store_true", help="Skip the risk scoring pass")
+    args = parser.parse_args()
+
+    print(f"🏗️ Generating {args.rows} listings ({args.images} photos, {args.sellers} sellers)...")
+    result = populate(args.rows, args.images, args.sellers, args.seed, score=not args.no_risk)
+    print(f"✅ Inserted {result['inserted']} listings ({result['rows_per_second']} rows/s), "
+          f"{result['failed']} failed, {result['total_seconds']}s total")
@@ -1,6 +1,7 @@
 import React from 'react';
 import { Link } from 'react-router-dom';
 import { MapPin, BedDouble, Bath, ShieldCheck, AlertTriangle } from 'lucide-react';
+import { API_URL } from '../config';
 
 const PropertyCard = ({ property }) => {
 
@@ -27,9 +28,11 @@ const PropertyCard = ({ property }) => {
     );
   };
 
-  // Safe image fallback: Use the first uploaded image, or a placeholder if none exist
-  const imageUrl = property.images && property.images.length > 0
-    ? property.images[0].image_url
+  // Safe image fallback: Use the first uploaded image, or a placeholder if none exist.
+  // Uploaded photos come back as /uploads/... paths on the API's origin
+  const rawUrl = property.images && property.images.length > 0 ? property.images[0].image_url : null;
+  const imageUrl = rawUrl
+    ? (rawUrl.startsWith('http') ? rawUrl : `${API_URL}${rawUrl}`)
     : "https://images.unsplash.com/photo-1600596542815-27b88e35eabd?ixlib=rb-4.0.3&auto=format&fit=crop&w=1000&q=80";
 
   return (
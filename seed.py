@@ -1,4 +1,4 @@
-from app.db.database import SessionLocal, engine
+from app.db.database import SessionLocal, drop_db, init_db
 from app.db import models
 from app.core.security import get_password_hash
 from datetime import datetime
@@ -7,10 +7,10 @@ def seed():
     # 1. FORCE RESET THE DATABASE
     # This deletes the tables entirely so they can be rebuilt with new columns
     print("🔥 Dropping old database tables...")
-    models.Base.metadata.drop_all(bind=engine)
+    drop_db()
 
     print("🏗️ Creating new database tables...")
-    models.Base.metadata.create_all(bind=engine)
+    init_db()
 
     db = SessionLocal()
 
@@ -33,6 +33,8 @@ def seed():
             price=450000.0,
             location="Borrowdale Brooke",
             city="Harare",
+            latitude=-17.7431,
+            longitude=31.1465,
             suburb="Borrowdale",
             bedrooms=5,
             bathrooms=4.5,
@@ -53,6 +55,8 @@ def seed():
             price=85000.0,
             location="Avondale West",
             city="Harare",
+            latitude=-17.7965,
+            longitude=31.0263,
             suburb="Avondale",
             bedrooms=2,
             bathrooms=1.0,
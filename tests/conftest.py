@@ -0,0 +1,21 @@
+# tests/conftest.py
+"""
+Settings are read when the app is first imported, so the test environment is
+set here, before any test module imports it: a temporary SQLite database and
+spool files, strict SQL budgets, no rate limits and no OpenAI key.
+"""
+import os
+import tempfile
+
+TMP = tempfile.mkdtemp(prefix="smartestate-tests-")
+os.environ.update({
+    "SQL_QUERY_BUDGET": "strict",
+    "DATABASE_URL": f"sqlite:///{TMP}/test.db",
+    "DATABASE_READ_URL": "",
+    "RATE_LIMIT_ENABLED": "false",
+    "RATE_LIMIT_FILE": f"{TMP}/ratelimit.bin",
+    "OUTBOX_FILE": f"{TMP}/inquiries.ndjson",
+    "ALERTS_FILE": f"{TMP}/search_alerts.ndjson",
+    "SIMILARITY_DIR": f"{TMP}/similar",
+    "OPENAI_API_KEY": "",
+})
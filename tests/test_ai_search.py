@@ -0,0 +1,132 @@
+# tests/test_ai_search.py
+"""
+Search parsing with a stub in place of the model (set_llm_parser): the rules
+answer what they understand, the model only the rest, answers are cached,
+and concurrent identical queries share one model call.
+"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+from app.core import ai_search, cache
+
+QUERY = "something cozy near good schools with a pool"
+MODEL_FILTERS = {"min_price": None, "max_price": 150000, "bedrooms": 3, "suburb": None, "city": "Harare", "property_type": "House"}
+
+class Model:
+    """Records each call; the async side waits on `gate` when one is set."""
+    def __init__(self, filters=MODEL_FILTERS, error: Exception = None):
+        self.filters, self.error = filters, error
+        self.calls = []
+        self.gate = None
+
+    def parse(self, query: str) -> dict:
+        self.calls.append(query)
+        if self.error is not None:
+            raise self.error
+        return dict(self.filters)
+
+    async def parse_async(self, query: str) -> dict:
+        self.calls.append(query)
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.error is not None:
+            raise self.error
+        return dict(self.filters)
+
+@pytest.fixture
+def model():
+    model = Model()
+    ai_search.set_llm_parser(model.parse, model.parse_async)  # also clears the cache
+    yield model
+    ai_search.set_llm_parser(ai_search._ask_openai, ai_search._ask_openai_async)
+
+# --- 1. RULES, MODEL, CACHE ---
+def test_rules_answer_without_the_model(model):
+    filters = ai_search.interpret_search_query("3 bed house in Avondale under 200k")
+    assert filters == {"min_price": None, "max_price": 200000, "bedrooms": 3,
+                       "suburb": "Avondale", "city": "Harare", "property_type": "House"}
+    assert model.calls == []
+
+def test_model_answers_what_the_rules_dont(model):
+    assert ai_search.interpret_search_query(QUERY) == MODEL_FILTERS
+    # Cached by normalized query: case, spacing and trailing punctuation don't matter
+    assert ai_search.interpret_search_query("  Something cozy near good schools  with a POOL!") == MODEL_FILTERS
+    assert model.calls == [QUERY]
+
+def test_cache_entries_expire(model, monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(cache, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    ai_search.interpret_search_query(QUERY)
+    clock.now += ai_search.query_cache.ttl - 1
+    ai_search.interpret_search_query(QUERY)
+    assert len(model.calls) == 1
+    clock.now += 2
+    ai_search.interpret_search_query(QUERY)
+    assert len(model.calls) == 2
+
+def test_model_failure_falls_back_to_the_rules_uncached(model):
+    model.error = RuntimeError("model down")
+    # The rules got the bedrooms but not enough to skip the model
+    query = "2 bed place near good schools with a pool and a view"
+    assert ai_search.interpret_search_query(query)["bedrooms"] == 2
+    assert ai_search.interpret_search_query(QUERY) == {}
+    model.error = None
+    assert ai_search.interpret_search_query(QUERY) == MODEL_FILTERS
+    assert len(model.calls) == 3
+
+def test_model_output_is_coerced_and_checked(model):
+    model.filters = {"bedrooms": "three", "min_price": "100000", "max_price": -1, "city": " Harare ", "garage": True}
+    assert ai_search.interpret_search_query(QUERY) == {
+        "min_price": 100000.0, "max_price": None, "city": "Harare", "suburb": None, "bedrooms": None, "property_type": None,
+    }
+
+def test_without_a_key_the_model_is_skipped():
+    assert not ai_search.settings.OPENAI_API_KEY
+    assert ai_search.interpret_search_query(QUERY) == {}
+    assert ai_search.interpret_search_query("2 bedroom flat")["property_type"] == "Flat"
+
+# --- 2. SINGLE-FLIGHT ---
+def test_concurrent_identical_queries_share_one_call(model):
+    async def run():
+        model.gate = asyncio.Event()
+        spellings = [QUERY, QUERY.upper(), f"  {QUERY}!  "] * 4
+        tasks = [asyncio.ensure_future(ai_search.interpret_search_query_async(q)) for q in spellings]
+        other = asyncio.ensure_future(ai_search.interpret_search_query_async("a quiet home by the river"))
+        await asyncio.sleep(0.01)
+        assert len(model.calls) == 2  # one per distinct query, all still waiting
+        model.gate.set()
+        return await asyncio.gather(*tasks), await other
+
+    results, other = asyncio.run(run())
+    assert results == [MODEL_FILTERS] * 12 and other == MODEL_FILTERS
+    assert sorted(model.calls) == sorted([QUERY, "a quiet home by the river"])
+    assert ai_search._inflight == {}
+    # ...and the answer is cached for later callers
+    asyncio.run(ai_search.interpret_search_query_async(QUERY))
+    assert len(model.calls) == 2
+
+def test_a_cancelled_caller_doesnt_cancel_the_shared_call(model):
+    async def run():
+        model.gate = asyncio.Event()
+        first = asyncio.ensure_future(ai_search.interpret_search_query_async(QUERY))
+        second = asyncio.ensure_future(ai_search.interpret_search_query_async(QUERY))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        model.gate.set()
+        return await second
+
+    assert asyncio.run(run()) == MODEL_FILTERS
+    assert model.calls == [QUERY]
+
+def test_a_failed_shared_call_falls_back_for_every_caller(model):
+    model.error = RuntimeError("model down")
+
+    async def run():
+        model.gate = asyncio.Event()
+        tasks = [asyncio.ensure_future(ai_search.interpret_search_query_async(QUERY)) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        model.gate.set()
+        return await asyncio.gather(*tasks)
+
+    assert asyncio.run(run()) == [{}] * 5
+    assert model.calls == [QUERY]
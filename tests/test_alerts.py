@@ -0,0 +1,140 @@
+# tests/test_alerts.py
+"""
+Saved-search alerts: the predicate index against a brute-force check, the
+queuing of matches (searches deleted through another worker are dropped),
+and the token that guards a saved search.
+"""
+import random
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, delete, insert, select
+from app.core import alerts
+from app.db import database, models
+from app.main import app
+
+def _search(search_id, city=None, suburb=None, property_type=None, min_price=None, max_price=None, bedrooms=None):
+    return {"id": search_id, "city": city, "suburb": suburb, "property_type": property_type,
+            "min_price": min_price, "max_price": max_price, "bedrooms": bedrooms}
+
+def _listing(price, bedrooms=None, city=None, suburb=None, property_type=None, listing_id=1):
+    return {"id": listing_id, "price": price, "bedrooms": bedrooms, "city": city, "suburb": suburb, "property_type": property_type}
+
+def _satisfies(search: dict, listing: dict) -> bool:
+    """The definition the index has to agree with, one search at a time."""
+    return (
+        all(not search[name] or search[name] == listing[name] for name in ("city", "suburb", "property_type"))
+        and (search["min_price"] is None or listing["price"] >= search["min_price"])
+        and (search["max_price"] is None or listing["price"] <= search["max_price"])
+        and (listing["bedrooms"] or 0) >= (search["bedrooms"] or 0)
+    )
+
+# --- 1. PREDICATE INDEX ---
+def test_match_uses_none_as_any():
+    index = alerts.SavedSearchIndex()
+    index.add(_search(1, city="Harare"))
+    index.add(_search(2, city="Harare", suburb="Avondale"))
+    index.add(_search(3, suburb="Avondale", property_type="House"))
+    index.add(_search(4))
+    index.add(_search(5, city="Bulawayo"))
+    assert index.match(_listing(100_000, city="Harare", suburb="Avondale", property_type="House")) == [1, 2, 3, 4]
+    assert index.match(_listing(100_000, city="Harare", suburb="Borrowdale", property_type="House")) == [1, 4]
+    # A listing without a city only meets the searches that don't ask for one
+    assert index.match(_listing(100_000, suburb="Avondale")) == [4]
+
+def test_match_price_and_bedroom_bounds():
+    index = alerts.SavedSearchIndex()
+    index.add(_search(1, min_price=100_000))
+    index.add(_search(2, min_price=200_000))
+    index.add(_search(3, max_price=150_000))
+    index.add(_search(4, min_price=50_000, max_price=100_000))
+    index.add(_search(5, bedrooms=3))
+    # Bounds are inclusive; min_price above the price is past the sorted prefix
+    assert index.match(_listing(100_000)) == [1, 3, 4]
+    assert index.match(_listing(200_000, bedrooms=3)) == [1, 2, 5]
+    assert index.match(_listing(10_000, bedrooms=2)) == [3]
+
+def test_match_follows_updates_and_removals():
+    index = alerts.SavedSearchIndex()
+    index.add(_search(1, city="Harare"))
+    assert index.match(_listing(1, city="Harare")) == [1]
+    index.add(_search(1, city="Bulawayo"))  # edited: moves to another bucket
+    assert index.match(_listing(1, city="Harare")) == []
+    assert index.match(_listing(1, city="Bulawayo")) == [1]
+    index.remove(1)
+    assert index.match(_listing(1, city="Bulawayo")) == []
+    assert len(index) == 0
+
+def test_match_agrees_with_brute_force():
+    rng = random.Random(24)
+    cities, suburbs, types = ["Harare", "Bulawayo", None], ["Avondale", "Hillside", None], ["House", "Flat", None]
+    prices = [None, 50_000, 100_000, 150_000, 200_000]
+
+    def bounds():
+        low, high = rng.choice(prices), rng.choice(prices)
+        return (low, high) if low is None or high is None or low <= high else (high, low)
+
+    searches = [
+        _search(i, rng.choice(cities), rng.choice(suburbs), rng.choice(types), *bounds(), rng.choice([None, 0, 1, 2, 3, 4]))
+        for i in range(1, 2001)
+    ]
+    index = alerts.SavedSearchIndex()
+    for search in searches:
+        index.add(search)
+    for _ in range(300):
+        listing = _listing(rng.choice([10_000, 50_000, 75_000, 100_000, 150_000, 250_000]), rng.choice([None, 1, 2, 3, 5]),
+                           rng.choice(cities), rng.choice(suburbs), rng.choice(types))
+        assert index.match(listing) == [s["id"] for s in searches if _satisfies(s, listing)], listing
+
+# --- 2. QUEUING ---
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'alerts.db'}")
+    database.init_db(engine)
+    yield engine
+    engine.dispose()
+
+def test_enqueue_drops_searches_deleted_elsewhere(engine, monkeypatch):
+    with engine.begin() as connection:
+        connection.execute(insert(models.SavedSearch.__table__), [
+            {"email": f"buyer{i}@example.com", "token": "t", "city": "Harare"} for i in range(3)
+        ])
+        property_ids = connection.execute(
+            insert(models.Property.__table__).returning(models.Property.__table__.c.id),
+            [{"title": f"House {i}", "price": 100_000 + i, "city": "Harare", "bedrooms": 3} for i in range(2)],
+        ).scalars().all()
+    index = alerts.SavedSearchIndex(bind=engine)
+    index.refresh(force=True)
+    monkeypatch.setattr(alerts, "index", index)
+
+    # Search 2 goes through "another worker": still in this worker's index
+    with engine.begin() as connection:
+        connection.execute(delete(models.SavedSearch).where(models.SavedSearch.id == 2))
+    assert index.match(_listing(100_000, city="Harare")) == [1, 2, 3]
+
+    assert alerts.enqueue_ids(property_ids, bind=engine) == 4
+    with engine.connect() as connection:
+        queued = connection.execute(
+            select(models.SearchAlert.saved_search_id, models.SearchAlert.property_id).order_by(models.SearchAlert.id)
+        ).all()
+    assert sorted(queued) == [(1, property_ids[0]), (1, property_ids[1]), (3, property_ids[0]), (3, property_ids[1])]
+    assert index.match(_listing(100_000, city="Harare")) == [1, 3]
+
+# --- 3. TOKEN ---
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+def test_saved_search_needs_its_token(client):
+    created = client.post("/api/v1/searches/", json={"email": "buyer@example.com", "city": "Harare", "bedrooms": 3})
+    assert created.status_code == 200, created.text
+    search_id, token = created.json()["id"], created.json()["token"]
+    url = f"/api/v1/searches/{search_id}"
+
+    assert client.get(url, params={"token": "wrong"}).status_code == 404
+    assert client.delete(url, params={"token": "wrong"}).status_code == 404
+    assert client.get(url, params={"token": token}).json()["city"] == "Harare"
+    assert client.delete(url, params={"token": token}).status_code == 200
+    assert client.get(url, params={"token": token}).status_code == 404
+    # Unknown ids look the same as a wrong token
+    assert client.get("/api/v1/searches/999999", params={"token": token}).status_code == 404
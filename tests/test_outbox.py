@@ -0,0 +1,186 @@
+# tests/test_outbox.py
+"""
+Inquiry outbox: claims and their lease, the retry schedule, delivery through
+FileSender into a tmp_path file, and contact_seller storing a repeated
+inquiry once.
+"""
+import json
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, delete, insert, select
+from app.core import outbox
+from app.db import database, models
+from app.main import app
+
+CONTACT = {"name": "Buyer", "email": "buyer@example.com", "phone": "0771234567", "message": "Is it still available?"}
+
+class Clock:
+    def __init__(self):
+        self.now = datetime(2026, 1, 1, 12, 0)
+
+    def utcnow(self) -> datetime:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(models, "utcnow", clock.utcnow)
+    return clock
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'outbox.db'}")
+    database.init_db(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def sender(tmp_path):
+    return outbox.FileSender(str(tmp_path / "sent" / "inquiries.ndjson"))
+
+def _sent(sender) -> list:
+    try:
+        with open(sender.path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+    except FileNotFoundError:
+        return []
+
+def _enqueue(engine, count: int = 1) -> list:
+    with engine.begin() as connection:
+        property_id = connection.execute(
+            insert(models.Property).returning(models.Property.id),
+            {"title": "House", "price": 100_000, "city": "Harare"},
+        ).scalar_one()
+        return [
+            connection.execute(outbox.enqueue_statement(property_id, f"{property_id}:{i}", CONTACT)).scalar_one()
+            for i in range(count)
+        ]
+
+def _row(engine, inquiry_id: int):
+    with engine.connect() as connection:
+        return connection.execute(select(models.Inquiry).where(models.Inquiry.id == inquiry_id)).one()
+
+class Failing(outbox.Sender):
+    def __init__(self):
+        self.batches = 0
+
+    def send(self, messages):
+        self.batches += 1
+        raise ConnectionError("smtp down")
+
+# --- 1. CLAIMS ---
+def test_enqueue_needs_the_listing(engine, clock):
+    with engine.begin() as connection:
+        assert connection.execute(outbox.enqueue_statement(999, "999:x", CONTACT)).scalar_one_or_none() is None
+    assert outbox.pending_count(engine) == 0
+
+def test_claimed_rows_are_leased_until_expiry(engine, clock, sender):
+    ids = _enqueue(engine, 3)
+    token, claimed = outbox._claim(engine, batch_size=2)
+    assert [message.id for message in claimed] == ids[:2]
+    # Held rows aren't claimed again while the lease runs
+    assert [message.id for message in outbox._claim(engine, batch_size=10)[1]] == ids[2:]
+    clock.now += timedelta(seconds=outbox.settings.OUTBOX_LEASE_SECONDS - 1)
+    assert outbox._claim(engine, batch_size=10)[1] == []
+
+    # The first worker "died": once its lease is up another one takes the rows
+    clock.now += timedelta(seconds=2)
+    assert outbox.deliver_batch(sender, engine, batch_size=10) == {"claimed": 3, "sent": 3, "retrying": 0, "failed": 0}
+    assert sorted(line["id"] for line in _sent(sender)) == ids
+    # ...and the first worker's late result no longer touches them
+    outbox._record(engine, token, claimed, {message.id: "late failure" for message in claimed})
+    assert {_row(engine, i).status for i in ids} == {"sent"}
+    assert _row(engine, ids[0]).last_error is None
+
+def test_file_sender_writes_one_line_per_message(engine, clock, sender):
+    ids = _enqueue(engine, 2)
+    assert outbox.drain(sender, engine, batch_size=1) == {"claimed": 2, "sent": 2, "retrying": 0, "failed": 0}
+    lines = _sent(sender)
+    assert [line["id"] for line in lines] == ids
+    assert lines[0]["idempotency_key"].endswith(":0") and lines[0]["property_title"] == "House"
+    assert lines[0]["created_at"] == clock.now.isoformat()
+    row = _row(engine, ids[0])
+    assert (row.status, row.attempts, row.sent_at, row.claimed_by) == ("sent", 1, clock.now, None)
+
+# --- 2. RETRIES ---
+def test_backoff_doubles_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(outbox.settings, "OUTBOX_RETRY_BASE_SECONDS", 10)
+    monkeypatch.setattr(outbox.settings, "OUTBOX_RETRY_MAX_SECONDS", 300)
+    monkeypatch.setattr(outbox.random, "uniform", lambda low, high: high)
+    assert [outbox.backoff_seconds(n) for n in range(1, 8)] == [10, 20, 40, 80, 160, 300, 300]
+    # "Equal jitter": never less than half the delay
+    monkeypatch.setattr(outbox.random, "uniform", lambda low, high: low)
+    assert [outbox.backoff_seconds(n) for n in range(1, 4)] == [5, 10, 20]
+
+def test_failures_retry_on_schedule_then_give_up(engine, clock, monkeypatch):
+    monkeypatch.setattr(outbox.settings, "OUTBOX_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(outbox, "backoff_seconds", lambda attempts: 60 * attempts)
+    (inquiry_id,) = _enqueue(engine)
+    failing = Failing()
+
+    assert outbox.deliver_batch(failing, engine) == {"claimed": 1, "sent": 0, "retrying": 1, "failed": 0}
+    row = _row(engine, inquiry_id)
+    assert (row.status, row.attempts, row.claimed_by) == ("pending", 1, None)
+    assert row.next_attempt_at == clock.now + timedelta(seconds=60)
+    assert row.last_error == "ConnectionError: smtp down"
+
+    # Not due before its time
+    clock.now += timedelta(seconds=59)
+    assert outbox.deliver_batch(failing, engine)["claimed"] == 0
+    clock.now += timedelta(seconds=1)
+    assert outbox.deliver_batch(failing, engine)["retrying"] == 1
+    assert _row(engine, inquiry_id).next_attempt_at == clock.now + timedelta(seconds=120)
+
+    clock.now += timedelta(seconds=120)
+    assert outbox.deliver_batch(failing, engine) == {"claimed": 1, "sent": 0, "retrying": 0, "failed": 1}
+    clock.now += timedelta(days=1)
+    assert outbox.deliver_batch(failing, engine)["claimed"] == 0
+    assert (_row(engine, inquiry_id).status, failing.batches) == ("failed", 3)
+
+def test_inquiry_for_a_deleted_listing_fails_without_sending(engine, clock, sender):
+    (inquiry_id,) = _enqueue(engine)
+    with engine.begin() as connection:
+        connection.execute(delete(models.Property))
+    assert outbox.deliver_batch(sender, engine) == {"claimed": 1, "sent": 0, "retrying": 0, "failed": 1}
+    assert _row(engine, inquiry_id).last_error == "listing no longer exists"
+    assert _sent(sender) == []
+
+# --- 3. CONTACT ENDPOINT ---
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+def listing_id(client):
+    listing = {"title": "Contact house", "price": 90_000, "location": "1 Main St", "city": "Harare", "suburb": "Avondale",
+               "bedrooms": 2, "bathrooms": 1, "land_size": 500, "listing_status": "For Sale", "property_type": "House"}
+    response = client.post("/api/v1/properties/", json=listing)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+def test_repeated_inquiry_reports_the_queued_one(client, listing_id, monkeypatch):
+    monkeypatch.setattr(outbox.worker, "wake", lambda: None)
+    url = f"/api/v1/properties/{listing_id}/contact"
+
+    first = client.post(url, json=CONTACT, headers={"Idempotency-Key": "form-1"})
+    assert first.status_code == 200, first.text
+    again = client.post(url, json={**CONTACT, "message": "edited"}, headers={"Idempotency-Key": "form-1"})
+    assert again.status_code == 200, again.text
+    assert again.json()["inquiry_id"] == first.json()["inquiry_id"]
+
+    # Without a key, the same message on the same day is the same inquiry
+    plain = [client.post(url, json=CONTACT).json()["inquiry_id"] for _ in range(2)]
+    assert plain[0] == plain[1] != first.json()["inquiry_id"]
+    assert client.post(url, json={**CONTACT, "message": "Another question"}).json()["inquiry_id"] not in plain
+
+    with database.engine.connect() as connection:
+        keys = connection.execute(
+            select(models.Inquiry.idempotency_key).where(models.Inquiry.property_id == listing_id)
+        ).scalars().all()
+    assert len(keys) == 3 and f"{listing_id}:form-1" in keys
+
+def test_inquiry_for_a_missing_listing_is_404(client, monkeypatch):
+    monkeypatch.setattr(outbox.worker, "wake", lambda: None)
+    assert client.post("/api/v1/properties/999999/contact", json=CONTACT).status_code == 404
@@ -0,0 +1,66 @@
+# tests/test_query_budgets.py
+"""
+Locks in the SQL statement budgets of the hot routes: each one runs on a
+temporary SQLite database with SQL_QUERY_BUDGET=strict (see conftest.py),
+where a route over its budget raises QueryBudgetExceeded instead of answering.
+
+    python -m pytest -q tests
+"""
+import pytest
+from fastapi.testclient import TestClient
+from app.db import database, models
+from app.main import app
+
+API = "/api/v1/properties"
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:  # the lifespan creates the schema
+        with database.SessionLocal() as db:
+            owner = models.User(email="seller@example.com", hashed_password="x")
+            db.add(owner)
+            db.flush()
+            for i in range(30):
+                db.add(models.Property(
+                    title=f"{i + 2} Bed House", description="Borehole, solar, close to schools.",
+                    price=50_000 + i * 10_000, location="Avondale West", city="Harare", suburb="Avondale",
+                    latitude=-17.79, longitude=31.03, bedrooms=2 + i % 4, bathrooms=1 + i % 2, land_size=500,
+                    property_type="House", listing_status="For Sale", owner_id=owner.id,
+                    images=[models.PropertyImage(image_url=f"/uploads/{i}-{n}.jpg") for n in range(3)],
+                ))
+            db.commit()
+        yield client
+
+def _assert_within(response, budget: int) -> None:
+    assert response.status_code == 200, response.text
+    count = int(response.headers["x-sql-query-count"])
+    assert 0 < count <= budget, f"ran {count} SQL statements (budget {budget})"
+
+# Each request has parameters of its own, so none is answered from the response cache
+@pytest.mark.parametrize("params", [
+    {},
+    {"limit": 10, "sort": "price_desc"},
+    {"city": "Harare", "bedrooms": 3, "fields": "id,title,price,thumbnail"},
+    {"q": "borehole"},
+    {"lat": -17.8, "lng": 31.0, "radius_km": 20},
+])
+def test_list(client, params):
+    _assert_within(client.get(f"{API}/", params=params), 2)
+
+def test_detail(client):
+    for property_id in (1, 2, 3):
+        _assert_within(client.get(f"{API}/{property_id}"), 2)
+
+@pytest.mark.parametrize("params", [{}, {"city": "Harare", "bedrooms": 3}, {"min_price": 100_000}])
+def test_facets(client, params):
+    _assert_within(client.get(f"{API}/facets", params=params), 1)
+
+@pytest.mark.parametrize("params", [{}, {"since": 10, "limit": 5}, {"owner_id": 1}])
+def test_changes(client, params):
+    _assert_within(client.get(f"{API}/changes", params=params), 3)
+
+def test_contact(client):
+    inquiry = {"name": "Buyer", "email": "buyer@example.com", "phone": "+263 77 000 0000", "message": "Still available?"}
+    _assert_within(client.post(f"{API}/1/contact", json=inquiry), 2)
+    # The same inquiry again is answered with the one already queued
+    _assert_within(client.post(f"{API}/1/contact", json=inquiry), 2)
@@ -0,0 +1,184 @@
+# tests/test_ratelimit.py
+"""
+Admission control: the shared token buckets (on a tmp_path file, with a fake
+clock), the client address behind trusted proxies, and the middleware's
+order of checks.
+"""
+import asyncio
+import ipaddress
+from types import SimpleNamespace
+import pytest
+from app.core import ratelimit
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+@pytest.fixture
+def buckets(tmp_path):
+    store = ratelimit.SharedBuckets(str(tmp_path / "ratelimit.bin"), slots=64)
+    yield store
+    store.close()
+
+# --- 1. BUCKETS ---
+def test_take_refills_and_reports_the_wait(buckets, clock):
+    charge = [("ip:1.2.3.4", 5, 10, 2)]  # cost 5, burst 10, 2 tokens/s
+    assert buckets.take(charge) == 0
+    assert buckets.take(charge) == 0
+    assert buckets.take(charge) == pytest.approx(2.5)  # empty: 5 tokens at 2/s
+    clock.now += 1
+    assert buckets.take(charge) == pytest.approx(1.5)  # refused takes cost nothing
+    clock.now += 1.5
+    assert buckets.take(charge) == 0
+
+def test_take_is_all_or_nothing(buckets, clock):
+    ip, user = ("ip:1.2.3.4", 10, 10, 1), ("user:7", 10, 10, 1)
+    assert buckets.take([user]) == 0  # the user's bucket is empty now
+    assert buckets.take([ip, user]) == pytest.approx(10)
+    # ...and the IP's was left untouched by the refused request
+    assert buckets.take([ip]) == 0
+
+def test_cost_above_burst_is_capped(buckets, clock):
+    assert buckets.take([("ip:1.2.3.4", 500, 300, 50)]) == 0
+
+def test_full_probe_window_evicts_the_longest_idle(tmp_path, clock):
+    # 8 slots, all in every key's probe window
+    store = ratelimit.SharedBuckets(str(tmp_path / "small.bin"), slots=ratelimit.SharedBuckets.PROBE)
+    try:
+        for i in range(8):
+            assert store.take([(f"ip:{i}", 1, 1, 0.001)]) == 0  # drains key i at t0 + i
+            clock.now += 1
+        assert store.take([("ip:1", 1, 1, 0.001)]) > 0  # still empty
+        assert store.take([("ip:new", 1, 1, 0.001)]) == 0  # takes ip:0's slot
+        assert store.take([("ip:0", 1, 1, 0.001)]) == 0  # gone, so it starts full again (evicting ip:1)
+        assert store.take([("ip:2", 1, 1, 0.001)]) > 0  # untouched
+    finally:
+        store.close()
+
+def test_buckets_are_shared_through_the_file(tmp_path, clock):
+    path = str(tmp_path / "shared.bin")
+    first, second = ratelimit.SharedBuckets(path, slots=64), ratelimit.SharedBuckets(path, slots=64)
+    try:
+        assert first.take([("ip:1.2.3.4", 10, 10, 1)]) == 0
+        assert second.take([("ip:1.2.3.4", 1, 10, 1)]) == pytest.approx(1)
+    finally:
+        first.close()
+        second.close()
+
+# --- 2. CLIENT ADDRESS ---
+def _scope(peer, *forwarded):
+    return {"client": (peer, 50000), "headers": [(b"x-forwarded-for", value.encode()) for value in forwarded]}
+
+@pytest.fixture
+def trusted(monkeypatch):
+    monkeypatch.setattr(ratelimit, "_TRUSTED_PROXIES", [ipaddress.ip_network("10.0.0.0/8"), ipaddress.ip_network("127.0.0.1")])
+
+@pytest.mark.parametrize("scope, expected", [
+    (_scope("10.1.2.3", "203.0.113.9"), "203.0.113.9"),
+    # Whatever the client sent is left of the hop the proxy appended
+    (_scope("10.1.2.3", "198.51.100.1, 203.0.113.9"), "203.0.113.9"),
+    (_scope("10.1.2.3", "10.9.9.9, 203.0.113.9"), "203.0.113.9"),
+    # Chained proxies are walked past, across repeated headers too
+    (_scope("10.1.2.3", "203.0.113.9, 10.9.9.9"), "203.0.113.9"),
+    (_scope("10.1.2.3", "203.0.113.9", "127.0.0.1"), "203.0.113.9"),
+    # Only trusted hops: the leftmost one
+    (_scope("10.1.2.3", "10.9.9.9"), "10.9.9.9"),
+    (_scope("10.1.2.3"), "10.1.2.3"),
+    # An untrusted peer's header is ignored
+    (_scope("198.51.100.1", "203.0.113.9"), "198.51.100.1"),
+])
+def test_client_ip_behind_trusted_proxies(trusted, scope, expected):
+    assert ratelimit.client_ip(scope) == expected
+
+def test_client_ip_without_trusted_proxies():
+    assert ratelimit._TRUSTED_PROXIES == []
+    assert ratelimit.client_ip(_scope("10.1.2.3", "203.0.113.9")) == "10.1.2.3"
+    assert ratelimit.client_ip({"headers": []}) == "unknown"
+
+# --- 3. MIDDLEWARE ---
+class Store:
+    def __init__(self, wait: float = 0.0):
+        self.wait = wait
+        self.charges = []
+
+    def take(self, charges):
+        self.charges.append(charges)
+        return self.wait
+
+def _middleware(store):
+    """-> (middleware in front of an app that records what reached it, that record)"""
+    called = []
+
+    async def app(scope, receive, send):
+        called.append((scope["method"], scope["path"]))
+
+    return ratelimit.AdmissionMiddleware(app, store=store), called
+
+def _call(middleware, method: str, path: str):
+    """-> (status, headers) of the response the middleware sent itself, or (None, {})"""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "headers": [], "client": ("203.0.113.9", 50000)}
+    asyncio.run(middleware(scope, receive, send))
+    start = next((m for m in sent if m["type"] == "http.response.start"), None)
+    return (start["status"], dict(start["headers"])) if start else (None, {})
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(ratelimit.settings, "RATE_LIMIT_ENABLED", True)
+
+def test_over_capacity_is_shed_before_charging(enabled):
+    store = Store()
+    middleware, called = _middleware(store)
+    rule = ratelimit.rule_for("POST", "/api/v1/auth/token")
+    middleware.in_flight[rule.name] = rule.max_concurrency
+    status, headers = _call(middleware, "POST", "/api/v1/auth/token")
+    assert (status, headers[b"retry-after"]) == (503, b"1")
+    assert store.charges == [] and called == []
+
+def test_rate_limited_answers_429_with_retry_after(enabled):
+    store = Store(wait=2.2)
+    middleware, called = _middleware(store)
+    status, headers = _call(middleware, "GET", "/api/v1/properties/")
+    assert (status, headers[b"retry-after"]) == (429, b"3")
+    assert store.charges == [[("ip:203.0.113.9", 1, ratelimit.settings.RATE_LIMIT_IP_BURST,
+                               ratelimit.settings.RATE_LIMIT_IP_PER_SECOND)]]
+    assert called == []
+
+def test_admitted_requests_hold_a_slot_while_running(enabled):
+    middleware, _ = _middleware(Store())
+    in_flight = []
+
+    async def app(scope, receive, send):
+        in_flight.append(middleware.in_flight["auth"])
+
+    middleware.app = app
+    assert _call(middleware, "POST", "/api/v1/auth/token") == (None, {})
+    assert in_flight == [1] and middleware.in_flight["auth"] == 0
+
+def test_exempt_paths_are_never_charged(enabled):
+    store = Store(wait=5)
+    middleware, called = _middleware(store)
+    requests = [("GET", "/health/ready"), ("GET", "/metrics"), ("GET", "/uploads/a_web.jpg"), ("OPTIONS", "/api/v1/properties/")]
+    for method, path in requests:
+        assert _call(middleware, method, path) == (None, {})
+    assert store.charges == [] and called == requests
+
+def test_auth_cap_follows_bcrypt_concurrency():
+    rule = ratelimit.rule_for("POST", ratelimit.settings.API_V1_STR + "/auth/signup")
+    assert rule.name == "auth" and rule.max_concurrency == ratelimit.settings.BCRYPT_MAX_CONCURRENCY